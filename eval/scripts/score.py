@@ -13,6 +13,46 @@ RESULTS_DIR = Path(__file__).resolve().parents[1] / "results"
 OUT = RESULTS_DIR / "summary.json"
 
 
+def percentile(values: list[float], q: float) -> float:
+    """Linear-interpolated percentile, q in [0, 100]."""
+    xs = sorted(values)
+    pos = (len(xs) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (pos - lo)
+
+
+def _percentiles(samples: list[dict]) -> dict | None:
+    stages: dict[str, list[float]] = {}
+    for sample in samples:
+        for stage, ms in sample.items():
+            stages.setdefault(stage, []).append(float(ms))
+    if not stages:
+        return None
+    return {
+        stage: {f"p{q}": round(percentile(ms, q), 2) for q in (50, 95, 99)} | {"n": len(ms)}
+        for stage, ms in sorted(stages.items())
+    }
+
+
+def latency_summary(rows: list[dict]) -> dict | None:
+    """p50/p95/p99 per stage from the eval runner's per-query ``latency_ms`` field."""
+    return _percentiles([r.get("latency_ms") or {} for r in rows])
+
+
+def batch_latency_summary(rows: list[dict]) -> dict | None:
+    """p50/p95/p99 per stage over batches (each counted once, not once per row), client-side
+    and, when the app sent its timing header, server-side."""
+    batches = {b["id"]: b for r in rows if (b := r.get("batch"))}
+    if not batches:
+        return None
+    return {
+        "batches": len(batches),
+        "latency_ms": _percentiles([b.get("latency_ms") or {} for b in batches.values()]),
+        "server_ms": _percentiles([b.get("server_ms") or {} for b in batches.values()]),
+    }
+
+
 def main() -> None:
     systems = ["s0_pure_llm", "s1_plain_rag", "s2_rag_verify"]
     summary = {}
@@ -34,6 +74,8 @@ def main() -> None:
             "mean_citation_precision": round(mean(citp), 4) if citp else None,
             "overclaim_rate": round(sum(overclaim) / len(overclaim), 4) if overclaim else None,
             "abstention_correct_rate": round(sum(abst_ok) / len(abst_ok), 4) if abst_ok else None,
+            "latency_ms": latency_summary(rows),
+            "batch_latency_ms": batch_latency_summary(rows),
         }
 
     RESULTS_DIR.mkdir(parents=True, exist_ok=True)
@@ -1,15 +1,78 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import sys
+import time
+from contextlib import asynccontextmanager
 
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from . import db, metrics, warmup
 from .config import CONFIG
-from .grounding import answer_with_grounding, verify_grounded_answer
-from .models import QARequest, SearchRequest, VerifyRequest
-from .retrieval import search
+from .grounding import (
+    answer_cache_stats,
+    answer_with_grounding_async,
+    finalize_answer,
+    stream_grounded_answer,
+    verify_grounded_answer,
+    verify_many,
+    verify_memo_stats,
+)
+from .indexing import ensure_db
+from .models import (
+    QABatchRequest,
+    QARequest,
+    SearchBatchRequest,
+    SearchRequest,
+    VerifyBatchRequest,
+    VerifyRequest,
+)
+from .retrieval import search, search_cache_stats, search_many
 from .web import router as web_router
 
-app = FastAPI(title="MathFoundry", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Run pending schema migrations once, so request-path readers can stay read-only.
+    if db.db_path().exists():
+        ensure_db().close()
+    # Serve /health right away; /ready reports 503 until the caches are warm.
+    if CONFIG.warmup_enabled:
+        warmup.reset()
+        # Keep a reference: the event loop only holds tasks weakly.
+        _app.state.warmup = asyncio.create_task(asyncio.to_thread(warmup.warm_up))
+    else:
+        warmup.mark_ready()
+    yield
+    # The LLM client module is imported lazily; only close it if a request loaded it.
+    llm = sys.modules.get(f"{__package__}.openai_client")
+    if llm is not None:
+        await llm.aclose_clients()
+    db.close_all()
+
+
+app = FastAPI(title="MathFoundry", version="0.1.0", lifespan=lifespan)
 app.include_router(web_router)
 
 
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    t0 = time.perf_counter()
+    with metrics.timed_request() as timings:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - t0
+    route = request.scope.get("route")
+    metrics.REQUEST_SECONDS.observe(elapsed, route=getattr(route, "path", "unmatched"), method=request.method)
+    if CONFIG.timing_header:
+        response.headers["X-MathFoundry-Timing"] = metrics.timing_header(timings, elapsed)
+    return response
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @app.get("/health")
 def health() -> dict:
     return {
@@ -22,37 +85,92 @@ def health() -> dict:
         "data_dir": CONFIG.data_dir,
         "openai_model": CONFIG.openai_model,
         "openai_configured": bool(CONFIG.openai_api_key),
+        "answer_cache": answer_cache_stats(),
+        "search_cache": search_cache_stats(),
+        "verify_memo": verify_memo_stats(),
     }
 
 
+@app.get("/ready")
+def ready() -> JSONResponse:
+    """Readiness probe: 200 once the startup warm-up is done (see ``mathfoundry.warmup``)."""
+    state = warmup.readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+@app.get("/metrics")
+def metrics_endpoint() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/search")
 def search_endpoint(req: SearchRequest) -> dict:
     results = search(req)
     return {"query": req.query, "count": len(results), "results": results}
 
 
+@app.post("/search/batch")
+def search_batch_endpoint(req: SearchBatchRequest) -> dict:
+    batches = search_many(req.queries)
+    return {
+        "count": len(batches),
+        "results": [
+            {"query": q.query, "count": len(results), "results": results} for q, results in zip(req.queries, batches)
+        ],
+    }
+
+
 @app.post("/qa")
-def qa_endpoint(req: QARequest) -> dict:
-    candidates = search(SearchRequest(query=req.query, limit=10))
-    grounded = answer_with_grounding(req.query, candidates)
-
-    verification = verify_grounded_answer(grounded)
-    if verification.must_abstain:
-        grounded.confidence = "insufficient_evidence"
-        if "Verification threshold not met." not in grounded.limitations:
-            grounded.limitations.append("Verification threshold not met.")
-        if not grounded.query_refinements:
-            grounded.query_refinements = [
-                "Add a specific theorem/object or author name.",
-                "Narrow scope by subtopic and timeframe.",
-            ]
-
-    payload = grounded.model_dump()
-    payload["verification"] = verification.model_dump()
-    return payload
+async def qa_endpoint(req: QARequest) -> dict:
+    # SQLite search runs in the threadpool; the LLM round trip is awaited, holding no thread.
+    candidates = await run_in_threadpool(search, SearchRequest(query=req.query, limit=10))
+    grounded = await answer_with_grounding_async(req.query, candidates)
+
+    return finalize_answer(grounded)
+
+
+@app.post("/qa/batch")
+async def qa_batch_endpoint(req: QABatchRequest) -> dict:
+    """Answer many queries; retrieval is one batch, LLM calls run concurrently up to
+    ``CONFIG.qa_batch_concurrency``."""
+    batches = await run_in_threadpool(search_many, [SearchRequest(query=q.query, limit=10) for q in req.queries])
+    gate = asyncio.Semaphore(max(1, CONFIG.qa_batch_concurrency))
+
+    async def answer(query: str, candidates: list[dict]) -> dict:
+        async with gate:
+            grounded = await answer_with_grounding_async(query, candidates)
+        return {"query": query, **finalize_answer(grounded)}
+
+    answers = await asyncio.gather(*(answer(q.query, c) for q, c in zip(req.queries, batches)))
+    return {"count": len(answers), "results": answers}
+
+
+@app.post("/qa/stream")
+async def qa_stream_endpoint(req: QARequest) -> StreamingResponse:
+    """Server-sent events: ``candidates`` once retrieval is done, then ``token``/``claim``
+    events while the model streams, then ``final`` (the ``/qa`` payload). A ``reset`` before
+    the final claims means the streamed ones are superseded."""
+
+    async def events():
+        candidates = await run_in_threadpool(search, SearchRequest(query=req.query, limit=10))
+        yield _sse("candidates", {"query": req.query, "count": len(candidates), "results": candidates})
+        async for event, data in stream_grounded_answer(req.query, candidates):
+            yield _sse(event, data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/qa/verify")
 def qa_verify_endpoint(req: VerifyRequest) -> dict:
     result = verify_grounded_answer(req.answer)
     return result.model_dump()
+
+
+@app.post("/qa/verify/batch")
+def qa_verify_batch_endpoint(req: VerifyBatchRequest) -> dict:
+    results = verify_many(req.answers, req.reference_ids)
+    return {"count": len(results), "results": [r.model_dump() for r in results]}
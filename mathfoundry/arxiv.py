@@ -2,11 +2,17 @@
 
 from __future__ import annotations
 
+import asyncio
+import io
 import json
 import random
 import time
 import urllib.parse
 import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import IO, Callable, Iterable, Iterator
 
 import httpx
 
@@ -119,56 +125,300 @@ def fetch_feed(
     raise RuntimeError(f"fetch failed after {max_retries} retries (start={start}, page_size={page_size})")
 
 
+# ---------------------------------------------------------------------------
+# Async harvesting: one keep-alive AsyncClient, a global token bucket and
+# several date slices fetched concurrently.
+# ---------------------------------------------------------------------------
+
+# ArXiv API terms of use: no more than one request every three seconds.
+ARXIV_RATE_PER_SEC = 1 / 3
+
+
+class TokenBucket:
+    """Asyncio token bucket: *rate* tokens/second, holding at most *capacity* tokens."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+def async_client(timeout: float = 90.0) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=timeout,
+        follow_redirects=True,
+        headers={"User-Agent": _USER_AGENT},
+        limits=httpx.Limits(max_keepalive_connections=8, keepalive_expiry=60.0),
+    )
+
+
+async def fetch_feed_async(
+    client: httpx.AsyncClient,
+    limiter: TokenBucket,
+    query: str,
+    start: int,
+    page_size: int,
+    *,
+    sort_by: str = "submittedDate",
+    sort_order: str = "descending",
+    max_retries: int = 40,
+    initial_delay: float = 5.0,
+    verbose: bool = False,
+) -> str:
+    """Async ``fetch_feed``: same retry/backoff policy, every attempt pays a limiter token."""
+    params = {
+        "search_query": query,
+        "start": start,
+        "max_results": page_size,
+        "sortBy": sort_by,
+        "sortOrder": sort_order,
+    }
+    url = f"{ARXIV_API}?{urllib.parse.urlencode(params)}"
+
+    delay = initial_delay
+    for attempt in range(1, max_retries + 1):
+        await limiter.acquire()
+        try:
+            r = await client.get(url)
+        except httpx.HTTPError as e:
+            reason = repr(e)
+        else:
+            if not (r.status_code == 429 or 500 <= r.status_code <= 599):
+                r.raise_for_status()
+                return r.text
+            reason = f"status {r.status_code}"
+        if verbose:
+            print(
+                json.dumps(
+                    {
+                        "event": "fetch_retry",
+                        "attempt": attempt,
+                        "start": start,
+                        "page_size": page_size,
+                        "reason": reason,
+                        "sleep_sec": round(delay, 2),
+                    }
+                ),
+                flush=True,
+            )
+        await asyncio.sleep(delay + random.uniform(0.0, min(2.0, delay)))
+        delay = min(delay * 1.5, 240)
+
+    raise RuntimeError(f"fetch failed after {max_retries} retries (start={start}, page_size={page_size})")
+
+
+@dataclass
+class SliceWindow:
+    """One submittedDate window and its pagination state."""
+
+    start: date
+    end: date
+    next_start: int = 0
+    total: int = 0
+    page_size: int = 200
+    pages: int = 0
+    min_page_failures: int = 0
+    error: str = ""
+
+    def query(self, base_query: str) -> str:
+        return (
+            f"{base_query} AND submittedDate:[{self.start.strftime('%Y%m%d')}0000 "
+            f"TO {self.end.strftime('%Y%m%d')}2359]"
+        )
+
+
+async def harvest_slices(
+    query: str,
+    windows: Iterable[SliceWindow],
+    *,
+    on_page: Callable[[SliceWindow, list[dict]], None],
+    on_slice_done: Callable[[SliceWindow], None],
+    should_stop: Callable[[], bool] = lambda: False,
+    concurrency: int = 4,
+    rate_per_sec: float = ARXIV_RATE_PER_SEC,
+    max_page_size: int = 200,
+    min_page_size: int = 10,
+    max_min_page_failures: int = 6,
+    cooldown_on_error_sec: float = 20.0,
+    max_retries: int = 8,
+    timeout: float = 60.0,
+    client: httpx.AsyncClient | None = None,
+    verbose: bool = False,
+) -> None:
+    """Fetch several date slices concurrently, sharing one client and one rate limiter.
+
+    Each slice pages from ``next_start`` until ``total`` is reached or a page comes back
+    empty, halving its page size on fetch failures (down to *min_page_size*) and doubling
+    it back every 10 good pages, as the sequential harvester does. A slice that exhausts
+    its retries, gets a 4xx or returns an unparseable feed stops with ``error`` set and is
+    reported through *on_slice_done*; the other slices keep running. Callbacks run on the
+    event loop thread, so they can write output and checkpoints without locking.
+    """
+    limiter = TokenBucket(rate_per_sec)
+    window_iter = iter(windows)
+    own_client = client is None
+    client = client or async_client(timeout)
+
+    async def run_slice(w: SliceWindow) -> None:
+        while not should_stop():
+            try:
+                xml = await fetch_feed_async(
+                    client, limiter, w.query(query), w.next_start, w.page_size, max_retries=max_retries, verbose=verbose
+                )
+            except RuntimeError as e:
+                w.error = str(e)
+                if w.page_size > min_page_size:
+                    w.page_size = max(min_page_size, w.page_size // 2)
+                else:
+                    w.min_page_failures += 1
+                    if w.min_page_failures >= max_min_page_failures:
+                        break  # give up on this slice; reported via on_slice_done with w.error
+                await asyncio.sleep(cooldown_on_error_sec)
+                continue
+            except httpx.HTTPStatusError as e:
+                # A 4xx is not retried; fail this slice only, the others keep running.
+                w.error = f"status {e.response.status_code}: {e}"
+                break
+
+            stream = iter_entries(xml.encode("utf-8"))
+            try:
+                entries = list(stream)
+            except ET.ParseError as e:
+                w.error = f"unparseable feed at start={w.next_start}: {e}"
+                break
+            w.total = max(w.total, stream.total_results or 0)
+            w.min_page_failures = 0
+            w.error = ""
+            if not entries:
+                break
+            w.next_start += len(entries)
+            w.pages += 1
+            on_page(w, entries)
+            if w.page_size < max_page_size and w.pages % 10 == 0:
+                w.page_size = min(max_page_size, w.page_size * 2)
+            if w.total and w.next_start >= w.total:
+                break
+        if not should_stop():
+            on_slice_done(w)
+
+    async def worker() -> None:
+        # Shared iterator: each window is taken by exactly one worker.
+        while not should_stop():
+            w = next(window_iter, None)
+            if w is None:
+                return
+            await run_slice(w)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        if own_client:
+            await client.aclose()
+
+
+_ATOM = "{%s}" % ATOM_NS["atom"]
+_TOTAL_TAG = "{%s}totalResults" % ATOM_NS["opensearch"]
+
+
+def _normalise_entry(entry: ET.Element, default_category: str) -> dict | None:
+    raw_id = (entry.findtext("atom:id", default="", namespaces=ATOM_NS) or "").strip()
+    title = " ".join((entry.findtext("atom:title", default="", namespaces=ATOM_NS) or "").split())
+    summary = " ".join((entry.findtext("atom:summary", default="", namespaces=ATOM_NS) or "").split())
+    updated = (entry.findtext("atom:updated", default="", namespaces=ATOM_NS) or "").strip()
+    published = (entry.findtext("atom:published", default="", namespaces=ATOM_NS) or "").strip()
+
+    work_id = raw_id.replace("http://arxiv.org/abs/", "arxiv:").replace("https://arxiv.org/abs/", "arxiv:")
+
+    # Try to detect the primary math category from the feed entry.
+    category = default_category
+    for cat_el in entry.findall("atom:category", ATOM_NS):
+        term = cat_el.attrib.get("term", "")
+        if term.startswith("math."):
+            category = term
+            break
+
+    if not (work_id and title):
+        return None
+    return {
+        "work_id": work_id,
+        "title": title,
+        "summary": summary,
+        "updated": updated,
+        "published": published,
+        "category": category,
+    }
+
+
+class EntryStream:
+    """Single-pass iterator over the normalised entries of an Atom feed.
+
+    Parsed incrementally with ``iterparse``; each entry is cleared once yielded, so memory
+    is bounded per entry. ``total_results`` (opensearch:totalResults) is set as soon as the
+    parser reaches it, which in ArXiv feeds is before the first entry.
+    """
+
+    def __init__(self, source: "str | Path | bytes | IO[bytes]", default_category: str = "math.AG"):
+        self._source = source
+        self._default_category = default_category
+        self.total_results: int | None = None
+
+    def __iter__(self) -> Iterator[dict]:
+        source = self._source
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        root = None
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+            if elem.tag == _TOTAL_TAG:
+                try:
+                    self.total_results = int((elem.text or "0").strip())
+                except ValueError:
+                    self.total_results = 0
+            elif elem.tag == _ATOM + "entry":
+                row = _normalise_entry(elem, self._default_category)
+                root.clear()
+                if row is not None:
+                    yield row
+
+
+def iter_entries(source: "str | Path | bytes | IO[bytes]", default_category: str = "math.AG") -> EntryStream:
+    """Stream entries from a feed given as a path, raw bytes or a binary file object."""
+    return EntryStream(source, default_category)
+
+
 def parse_total(xml_text: str) -> int:
     """Extract opensearch:totalResults from an Atom feed."""
-    root = ET.fromstring(xml_text)
-    t = root.findtext("opensearch:totalResults", default="0", namespaces=ATOM_NS)
-    try:
-        return int(t)
-    except (ValueError, TypeError):
-        return 0
+    stream = iter_entries(xml_text.encode("utf-8"))
+    for _ in stream:
+        if stream.total_results is not None:
+            break
+    return stream.total_results or 0
 
 
 def parse_entries(xml_text: str, default_category: str = "math.AG") -> list[dict]:
     """Parse Atom entries into normalised dicts."""
-    root = ET.fromstring(xml_text)
-    out: list[dict] = []
-    for entry in root.findall("atom:entry", ATOM_NS):
-        raw_id = (entry.findtext("atom:id", default="", namespaces=ATOM_NS) or "").strip()
-        title = " ".join((entry.findtext("atom:title", default="", namespaces=ATOM_NS) or "").split())
-        summary = " ".join((entry.findtext("atom:summary", default="", namespaces=ATOM_NS) or "").split())
-        updated = (entry.findtext("atom:updated", default="", namespaces=ATOM_NS) or "").strip()
-        published = (entry.findtext("atom:published", default="", namespaces=ATOM_NS) or "").strip()
-
-        work_id = raw_id.replace("http://arxiv.org/abs/", "arxiv:").replace("https://arxiv.org/abs/", "arxiv:")
-
-        # Try to detect the primary math category from the feed entry.
-        category = default_category
-        for cat_el in entry.findall("atom:category", ATOM_NS):
-            term = cat_el.attrib.get("term", "")
-            if term.startswith("math."):
-                category = term
-                break
-
-        if work_id and title:
-            out.append(
-                {
-                    "work_id": work_id,
-                    "title": title,
-                    "summary": summary,
-                    "updated": updated,
-                    "published": published,
-                    "category": category,
-                }
-            )
-    return out
-
+    return list(iter_entries(xml_text.encode("utf-8"), default_category))
 
-def dir_size_bytes(path: "Path") -> int:  # noqa: F821 – Path imported by callers
-    """Total bytes of all files under *path* (non-recursive import to avoid circular deps)."""
-    from pathlib import Path as _Path
 
-    p = _Path(path)
+def dir_size_bytes(path: Path) -> int:
+    """Total bytes of all files under *path*."""
+    p = Path(path)
     if not p.exists():
         return 0
     return sum(f.stat().st_size for f in p.rglob("*") if f.is_file())
@@ -0,0 +1,202 @@
+"""Frontend assets served from memory with content hashes, ETags and pre-compressed bodies.
+
+``mathfoundry/static/`` holds the page (``index.html``) and the files it links. Each linked
+file is published under a content-hashed name (``app.<hash>.css``) so it can be cached
+forever (``Cache-Control: immutable``); ``index.html`` is rewritten to point at those names
+and is revalidated instead. Every body is read, hashed and compressed (gzip, plus brotli
+when the ``brotli`` package is installed) once per process, so a page load costs a dict
+lookup and, on repeat visits, a 304.
+
+``export_static(out_dir)`` writes the same hashed files and their ``.gz``/``.br`` siblings
+for nginx to serve directly (``gzip_static``); see ``deploy/nginx.mathfoundry.conf``.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # optional: pip install -e .[brotli]
+    brotli = None
+
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+STATIC_PREFIX = "/static/"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Bodies smaller than this are not worth a compressed variant.
+_MIN_COMPRESS_BYTES = 256
+_HASH_CHARS = 12
+
+_MEDIA_TYPES = {".js": "text/javascript; charset=utf-8", ".css": "text/css; charset=utf-8", ".html": "text/html; charset=utf-8"}
+
+
+@dataclass(frozen=True)
+class Asset:
+    body: bytes
+    media_type: str
+    etag: str
+    # Content-Encoding -> compressed body, only for encodings that actually save bytes.
+    encoded: dict[str, bytes] = field(default_factory=dict)
+
+
+def _digest(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def make_asset(body: bytes, media_type: str) -> Asset:
+    encoded: dict[str, bytes] = {}
+    if len(body) >= _MIN_COMPRESS_BYTES:
+        # mtime=0 keeps the gzip bytes (and so the exported files) reproducible.
+        candidates = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            candidates["br"] = brotli.compress(body, quality=11)
+        encoded = {enc: data for enc, data in candidates.items() if len(data) < len(body)}
+    return Asset(body=body, media_type=media_type, etag=f'"{_digest(body)[:32]}"', encoded=encoded)
+
+
+def json_asset(payload: object) -> Asset:
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return make_asset(body, "application/json")
+
+
+def _media_type(path: Path) -> str:
+    return _MEDIA_TYPES.get(path.suffix) or mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+
+def hashed_name(name: str, body: bytes) -> str:
+    stem, dot, suffix = name.rpartition(".")
+    if not dot:
+        return f"{name}.{_digest(body)[:_HASH_CHARS]}"
+    return f"{stem}.{_digest(body)[:_HASH_CHARS]}.{suffix}"
+
+
+@dataclass(frozen=True)
+class Bundle:
+    page: Asset
+    # Hashed file name -> asset, as served under STATIC_PREFIX.
+    files: dict[str, Asset]
+    # Source file name -> hashed file name.
+    names: dict[str, str]
+
+
+_bundle_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _load_bundle(static_dir: Path) -> Bundle:
+    files: dict[str, Asset] = {}
+    names: dict[str, str] = {}
+    for path in sorted(static_dir.iterdir()):
+        if not path.is_file() or path.name == "index.html":
+            continue
+        body = path.read_bytes()
+        name = hashed_name(path.name, body)
+        names[path.name] = name
+        files[name] = make_asset(body, _media_type(path))
+    html = (static_dir / "index.html").read_text(encoding="utf-8")
+    for src, name in names.items():
+        html = html.replace(f'"{STATIC_PREFIX}{src}"', f'"{STATIC_PREFIX}{name}"')
+    return Bundle(page=make_asset(html.encode("utf-8"), _MEDIA_TYPES[".html"]), files=files, names=names)
+
+
+def bundle(static_dir: Path = STATIC_DIR) -> Bundle:
+    with _bundle_lock:
+        return _load_bundle(static_dir)
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    accepted: set[str] = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if token and q > 0:
+            accepted.add(token.lower())
+    return accepted
+
+
+def _negotiate(asset: Asset, accept_encoding: str) -> str | None:
+    if not asset.encoded:
+        return None
+    accepted = _accepted_encodings(accept_encoding)
+    for enc in ("br", "gzip"):
+        if enc in asset.encoded and (enc in accepted or "*" in accepted):
+            return enc
+    return None
+
+
+def _variant_etag(etag: str, encoding: str | None) -> str:
+    # A strong ETag names exact bytes, so each encoding gets its own.
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    base = etag.strip('"')
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/").strip('"')
+        if tag == base or tag.rsplit("-", 1)[0] == base:
+            return True
+    return False
+
+
+def asset_response(request: Request, asset: Asset, cache_control: str) -> Response:
+    """*asset* with caching headers, the best accepted encoding, or a 304 for a matching ETag."""
+    encoding = _negotiate(asset, request.headers.get("accept-encoding", ""))
+    headers = {"ETag": _variant_etag(asset.etag, encoding), "Cache-Control": cache_control}
+    if asset.encoded:
+        headers["Vary"] = "Accept-Encoding"
+    if _etag_matches(request.headers.get("if-none-match", ""), asset.etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        return Response(asset.encoded[encoding], media_type=asset.media_type, headers=headers)
+    return Response(asset.body, media_type=asset.media_type, headers=headers)
+
+
+# ---------------------------------------------------------------------------
+# Export for nginx
+# ---------------------------------------------------------------------------
+
+_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+
+def export_static(out_dir: Path, static_dir: Path = STATIC_DIR) -> dict:
+    """Write the hashed files (with ``.gz``/``.br`` siblings) under *out_dir*/static.
+
+    Files from earlier builds are kept so pages already in browsers can still load the
+    assets they reference. Returns the source -> hashed name manifest.
+    """
+    b = bundle(static_dir)
+    target = out_dir / "static"
+    target.mkdir(parents=True, exist_ok=True)
+    for name, asset in b.files.items():
+        (target / name).write_bytes(asset.body)
+        for enc, data in asset.encoded.items():
+            (target / f"{name}{_SUFFIXES[enc]}").write_bytes(data)
+    (target / "manifest.json").write_text(json.dumps(b.names, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    return dict(b.names)
@@ -0,0 +1,154 @@
+"""Small caches shared by the API hot paths."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+
+class SqliteCache:
+    """Persistent key -> JSON cache in its own SQLite file.
+
+    Entries expire after *ttl_sec*; once more than *max_entries* are stored the least
+    recently used ones are evicted. Hit/miss counters are per process.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 5000, ttl_sec: float = 7 * 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+              key TEXT PRIMARY KEY,
+              value TEXT NOT NULL,
+              created_at REAL NOT NULL,
+              accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Any | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_sec:
+                if row is not None:
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO cache(key, value, created_at, accessed_at) VALUES (?,?,?,?)
+                ON CONFLICT(key) DO UPDATE SET value=excluded.value, created_at=excluded.created_at,
+                  accessed_at=excluded.accessed_at
+                """,
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._conn.execute("DELETE FROM cache WHERE created_at < ?", (now - self.ttl_sec,))
+            over = self._conn.execute("SELECT count(*) FROM cache").fetchone()[0] - self.max_entries
+            if over > 0:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)", (over,)
+                )
+                self.evictions += over
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT count(*) FROM cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_sec": self.ttl_sec,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class LRUCache:
+    """Bounded in-process key -> value cache with least-recently-used eviction.
+
+    Values are stored as given; callers must not mutate what they put in or get out.
+    ``stats()`` reports an approximate memory footprint from each value's JSON size.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[str, tuple[Any, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key: str, value: Any) -> None:
+        size = len(key) + len(json.dumps(value, ensure_ascii=False))
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, approx_bytes = len(self._data), self._bytes
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "approx_bytes": approx_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,274 @@
+"""Optional compressed storage for the large text bodies of the index.
+
+With ``MATHFOUNDRY_STORE_COMPRESSION=zlib`` (or ``zstd``, which needs the ``zstandard``
+package) ``papers.summary`` and ``passages.text`` are written as BLOBs compressed against
+a dictionary trained on the corpus itself; the lower-cased ``*_lc`` copies that search and
+FTS read stay plain text. Readers call ``decode_text`` only on what they return, so
+``/search`` decompresses nothing but the summaries of its top-k results.
+
+Blob layout: one codec byte, the 4-byte ID of the dictionary (0 = none), then the
+compressed body. Dictionaries live in the ``text_dicts`` table keyed by a hash of their
+bytes, so a blob stays decodable after the active dictionary is retrained; plain TEXT
+values (rows written without compression) are returned unchanged.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import struct
+import threading
+import zlib
+from collections import Counter
+from collections.abc import Callable, Iterable
+
+from .config import CONFIG
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install -e .[zstd]
+    zstandard = None
+
+_CODECS = {"zlib": 1, "zstd": 2}
+_HEADER = struct.Struct(">BI")
+
+# Bodies shorter than this are stored as text; compression cannot pay for the header.
+_MIN_COMPRESS_CHARS = 96
+# zlib only looks back 32 KiB, so a larger preset dictionary is wasted.
+_ZLIB_DICT_BYTES = 32 * 1024
+_ZSTD_DICT_BYTES = 112 * 1024
+_ZLIB_LEVEL = 9
+_ZSTD_LEVEL = 12
+# Sample text wanted before a dictionary is trained; smaller corpora compress without one.
+_MIN_TRAIN_BYTES = 64 * 1024
+_MAX_TRAIN_BYTES = 8 * 1024 * 1024
+
+_dicts: dict[int, bytes] = {}
+_dicts_lock = threading.Lock()
+
+Encoder = Callable[[str | None], "str | bytes | None"]
+
+
+def _require_zstd() -> None:
+    if zstandard is None:
+        raise RuntimeError("MATHFOUNDRY_STORE_COMPRESSION=zstd requires zstandard (pip install -e .[zstd])")
+
+
+def compression_mode() -> str:
+    mode = (CONFIG.store_compression or "none").strip().lower()
+    if mode in {"", "0", "off", "false", "none"}:
+        return "none"
+    if mode not in _CODECS:
+        raise ValueError(f"unknown MATHFOUNDRY_STORE_COMPRESSION={mode!r} (expected none, zlib or zstd)")
+    if mode == "zstd":
+        _require_zstd()
+    return mode
+
+
+# ---------------------------------------------------------------------------
+# Dictionaries
+# ---------------------------------------------------------------------------
+
+
+def _dict_id(data: bytes) -> int:
+    return int.from_bytes(hashlib.sha256(data).digest()[:4], "big") or 1
+
+
+def train_zlib_dict(samples: Iterable[str], size: int = _ZLIB_DICT_BYTES) -> bytes:
+    """A preset dictionary of the phrases that save the most bytes across *samples*.
+
+    Word 1- to 4-grams seen at least twice are ranked by ``count * length``; the best
+    are placed last, where deflate can reach them with the shortest distances.
+    """
+    counts: Counter[str] = Counter()
+    for text in samples:
+        words = re.findall(r"\S+\s*", text)
+        for n in range(1, 5):
+            for i in range(len(words) - n + 1):
+                counts["".join(words[i : i + n])] += 1
+    ranked = sorted(
+        ((c * len(s.encode("utf-8")), s) for s, c in counts.items() if c > 1 and len(s) > 3), reverse=True
+    )
+    chosen: list[bytes] = []
+    used = 0
+    for _, phrase in ranked:
+        data = phrase.encode("utf-8")
+        if used + len(data) > size:
+            continue
+        chosen.append(data)
+        used += len(data)
+        if used >= size - 8:
+            break
+    return b"".join(reversed(chosen))
+
+
+def _train(codec: str, samples: list[str]) -> bytes:
+    if codec == "zstd":
+        return zstandard.train_dictionary(_ZSTD_DICT_BYTES, [s.encode("utf-8") for s in samples]).as_bytes()
+    return train_zlib_dict(samples)
+
+
+def _load_dict(conn: sqlite3.Connection, dict_id: int) -> bytes:
+    with _dicts_lock:
+        data = _dicts.get(dict_id)
+    if data is None:
+        row = conn.execute("SELECT data FROM text_dicts WHERE dict_id = ?", (dict_id,)).fetchone()
+        if row is None:
+            raise LookupError(f"compression dictionary {dict_id:#010x} missing from the index")
+        data = bytes(row[0])
+        with _dicts_lock:
+            _dicts[dict_id] = data
+    return data
+
+
+def _active_dict(conn: sqlite3.Connection, codec: str) -> int | None:
+    row = conn.execute(
+        "SELECT d.dict_id FROM index_meta m JOIN text_dicts d ON d.dict_id = m.value "
+        "WHERE m.key = 'text_dict' AND d.codec = ?",
+        (codec,),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _store_dict(conn: sqlite3.Connection, codec: str, data: bytes) -> int:
+    dict_id = _dict_id(data)
+    conn.execute(
+        "INSERT OR IGNORE INTO text_dicts(dict_id, codec, data, created_at) VALUES(?,?,?,datetime('now'))",
+        (dict_id, codec, data),
+    )
+    conn.execute(
+        "INSERT INTO index_meta(key, value) VALUES('text_dict', ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (dict_id,),
+    )
+    return dict_id
+
+
+def _corpus_samples(conn: sqlite3.Connection, extra: Iterable[str]) -> list[str]:
+    """Up to ``_MAX_TRAIN_BYTES`` of body text: *extra* first, then rows already stored."""
+    samples: list[str] = []
+    total = 0
+
+    def take(texts: Iterable[str | None]) -> bool:
+        nonlocal total
+        for t in texts:
+            if t and len(t) >= _MIN_COMPRESS_CHARS:
+                samples.append(t)
+                total += len(t)
+                if total >= _MAX_TRAIN_BYTES:
+                    return False
+        return True
+
+    if take(extra):
+        stored = conn.execute(
+            "SELECT text FROM passages WHERE typeof(text) = 'text' "
+            "UNION ALL SELECT summary FROM papers WHERE typeof(summary) = 'text'"
+        )
+        take(t for (t,) in stored)
+    return samples
+
+
+# ---------------------------------------------------------------------------
+# Encoding / decoding
+# ---------------------------------------------------------------------------
+
+
+def _compressor(codec: str, zdict: bytes | None) -> Callable[[bytes], bytes]:
+    if codec == "zstd":
+        cctx = zstandard.ZstdCompressor(
+            level=_ZSTD_LEVEL,
+            dict_data=zstandard.ZstdCompressionDict(zdict) if zdict else None,
+            write_content_size=True,
+            write_checksum=False,
+        )
+        return cctx.compress
+
+    def compress(data: bytes) -> bytes:
+        # Raw deflate: the zlib header and checksum would cost 6 bytes per row.
+        c = zlib.compressobj(_ZLIB_LEVEL, zlib.DEFLATED, -15, 9, **({"zdict": zdict} if zdict else {}))
+        return c.compress(data) + c.flush()
+
+    return compress
+
+
+def text_encoder(conn: sqlite3.Connection, pending: Iterable[str] = ()) -> Encoder | None:
+    """Encoder for bodies written on *conn* (the writer), or None when storing plain text.
+
+    Trains and activates a dictionary first when the codec has none and enough text
+    (*pending* plus the rows already stored) is available to learn from.
+    """
+    codec = compression_mode()
+    if codec == "none":
+        return None
+    dict_id = _active_dict(conn, codec)
+    if dict_id is None:
+        samples = _corpus_samples(conn, pending)
+        if sum(map(len, samples)) >= _MIN_TRAIN_BYTES:
+            dict_id = _store_dict(conn, codec, _train(codec, samples))
+    zdict = _load_dict(conn, dict_id) if dict_id else None
+    compress = _compressor(codec, zdict)
+    header = _HEADER.pack(_CODECS[codec], dict_id or 0)
+
+    def encode(text: str | None) -> str | bytes | None:
+        if text is None or len(text) < _MIN_COMPRESS_CHARS:
+            return text
+        raw = text.encode("utf-8")
+        blob = header + compress(raw)
+        return blob if len(blob) < len(raw) else text
+
+    return encode
+
+
+def decode_text(conn: sqlite3.Connection, value: str | bytes | None) -> str | None:
+    """The original text of a stored body (plain TEXT is returned as is)."""
+    if value is None or isinstance(value, str):
+        return value
+    codec, dict_id = _HEADER.unpack_from(value)
+    zdict = _load_dict(conn, dict_id) if dict_id else None
+    body = memoryview(value)[_HEADER.size :]
+    if codec == _CODECS["zlib"]:
+        d = zlib.decompressobj(-15, **({"zdict": zdict} if zdict else {}))
+        raw = d.decompress(body) + d.flush()
+    elif codec == _CODECS["zstd"]:
+        _require_zstd()
+        dctx = zstandard.ZstdDecompressor(dict_data=zstandard.ZstdCompressionDict(zdict) if zdict else None)
+        raw = dctx.decompress(body)
+    else:
+        raise ValueError(f"unknown compressed body codec {codec}")
+    return raw.decode("utf-8")
+
+
+_RECOMPRESS_BATCH = 2000
+
+
+def recompress_texts(conn: sqlite3.Connection) -> dict:
+    """Re-encode every stored body with the configured mode and a freshly trained dictionary.
+
+    Used to convert an existing index (or to decompress one with mode ``none``). Rows are
+    rewritten in ``_RECOMPRESS_BATCH``-row transactions; run ``VACUUM`` afterwards to
+    return the freed pages to the filesystem.
+    """
+    codec = compression_mode()
+    if codec != "none":
+        samples = [decode_text(conn, t) for (t,) in conn.execute("SELECT text FROM passages ORDER BY random() LIMIT 20000")]
+        _store_dict(conn, codec, _train(codec, _corpus_samples(conn, samples)))
+        conn.commit()
+    encode = text_encoder(conn) or (lambda t: t)
+    stats = {"codec": codec, "papers": 0, "passages": 0}
+    for table, column, key in (("papers", "summary", "papers"), ("passages", "text", "passages")):
+        last = 0
+        while True:
+            rows = conn.execute(
+                f"SELECT rowid, {column} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last, _RECOMPRESS_BATCH),
+            ).fetchall()
+            if not rows:
+                break
+            last = rows[-1][0]
+            updates = [(encode(decode_text(conn, v)), rowid) for rowid, v in rows]
+            # Only the body column changes, so the FTS triggers (on the *_lc columns) stay quiet.
+            conn.executemany(f"UPDATE {table} SET {column} = ? WHERE rowid = ?", updates)
+            conn.commit()
+            stats[key] += len(rows)
+    return stats
@@ -16,9 +16,29 @@ class ProjectConfig:
     max_raw_files: int = int(os.getenv("MATHFOUNDRY_MAX_RAW_FILES", "200"))
     max_results_per_ingest: int = int(os.getenv("MATHFOUNDRY_MAX_RESULTS_PER_INGEST", "100"))
     data_dir: str = os.getenv("MATHFOUNDRY_DATA_DIR", "./data")
+    index_workers: int = int(os.getenv("MATHFOUNDRY_INDEX_WORKERS", "1"))
+    search_backend: str = os.getenv("MATHFOUNDRY_SEARCH_BACKEND", "sqlite").strip().lower()
+    dense_enabled: bool = _as_bool(os.getenv("MATHFOUNDRY_DENSE"), False)
+    dense_model: str = os.getenv("MATHFOUNDRY_DENSE_MODEL", "hashing:384")
+    store_compression: str = os.getenv("MATHFOUNDRY_STORE_COMPRESSION", "none")
+    warmup_enabled: bool = _as_bool(os.getenv("MATHFOUNDRY_WARMUP"), True)
+    warmup_budget_sec: float = float(os.getenv("MATHFOUNDRY_WARMUP_BUDGET_SEC", "60"))
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     openai_model: str = os.getenv("MATHFOUNDRY_OPENAI_MODEL", "gpt-4.1")
     openai_base_url: str = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+    openai_max_connections: int = int(os.getenv("MATHFOUNDRY_OPENAI_MAX_CONNECTIONS", "20"))
+    openai_max_keepalive: int = int(os.getenv("MATHFOUNDRY_OPENAI_MAX_KEEPALIVE", "10"))
+    openai_max_retries: int = int(os.getenv("MATHFOUNDRY_OPENAI_MAX_RETRIES", "3"))
+    openai_read_timeout_sec: float = float(os.getenv("MATHFOUNDRY_OPENAI_READ_TIMEOUT_SEC", "120"))
+    qa_batch_concurrency: int = int(os.getenv("MATHFOUNDRY_QA_BATCH_CONCURRENCY", "8"))
+    timing_header: bool = _as_bool(os.getenv("MATHFOUNDRY_TIMING_HEADER"), False)
+    search_cache_enabled: bool = _as_bool(os.getenv("MATHFOUNDRY_SEARCH_CACHE"), True)
+    search_cache_max_entries: int = int(os.getenv("MATHFOUNDRY_SEARCH_CACHE_MAX_ENTRIES", "2048"))
+    search_cache_disk: bool = _as_bool(os.getenv("MATHFOUNDRY_SEARCH_CACHE_DISK"), False)
+    verify_memo_max_entries: int = int(os.getenv("MATHFOUNDRY_VERIFY_MEMO_MAX_ENTRIES", "4096"))
+    answer_cache_enabled: bool = _as_bool(os.getenv("MATHFOUNDRY_ANSWER_CACHE"), True)
+    answer_cache_max_entries: int = int(os.getenv("MATHFOUNDRY_ANSWER_CACHE_MAX_ENTRIES", "5000"))
+    answer_cache_ttl_sec: float = float(os.getenv("MATHFOUNDRY_ANSWER_CACHE_TTL_SEC", str(7 * 86400)))
 
 
 CONFIG = ProjectConfig()
@@ -0,0 +1,101 @@
+"""SQLite connection management for the local index.
+
+- ``reader()``: one read-only connection per thread (URI ``mode=ro``) with a large
+  ``mmap_size`` and a statement cache, reused across requests by the FastAPI threadpool.
+  Page sharing across connections/processes comes from the mmap'd file, not SQLite's
+  deprecated shared-cache mode.
+- ``writer()``: a single process-wide writer in WAL mode, so readers never block on (or
+  block) the worker while it re-indexes. Schema migration runs once, when it is opened.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from .config import CONFIG
+
+_MMAP_BYTES = int(os.getenv("MATHFOUNDRY_SQLITE_MMAP_MB", "256")) * 1024 * 1024
+_CACHED_STATEMENTS = 256
+_BUSY_TIMEOUT_MS = 5000
+
+_local = threading.local()
+_readers: set[sqlite3.Connection] = set()  # every open reader, for close_all()
+_writer: sqlite3.Connection | None = None
+_writer_key: tuple | None = None
+_writer_lock = threading.Lock()
+_epoch = 0  # bumped by close_all() so every thread drops its cached reader
+
+
+def db_path() -> Path:
+    return Path(CONFIG.data_dir) / "index" / "mathfoundry.db"
+
+
+def _file_key(path: Path) -> tuple | None:
+    try:
+        return (str(path), path.stat().st_ino, _epoch)
+    except FileNotFoundError:
+        return None
+
+
+def reader() -> sqlite3.Connection | None:
+    """Return this thread's read-only connection, or None while the index does not exist.
+
+    The connection is reopened if the DB file was replaced (different inode).
+    """
+    path = db_path()
+    key = _file_key(path)
+    if key is None:
+        return None
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.key == key:
+        return conn
+    if conn is not None:
+        conn.close()
+        _readers.discard(conn)
+
+    conn = sqlite3.connect(
+        f"{path.resolve().as_uri()}?mode=ro",
+        uri=True,
+        check_same_thread=False,  # closed from the shutdown hook, used by one thread only
+        cached_statements=_CACHED_STATEMENTS,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA mmap_size={_MMAP_BYTES}")
+    conn.execute(f"PRAGMA busy_timeout={_BUSY_TIMEOUT_MS}")
+    _local.conn, _local.key = conn, key
+    _readers.add(conn)
+    return conn
+
+
+def writer() -> sqlite3.Connection:
+    """Return the process-wide writer connection, migrating the schema on first open."""
+    global _writer, _writer_key
+    path = db_path()
+    with _writer_lock:
+        if _writer is None or _writer_key != _file_key(path):
+            if _writer is not None:
+                _writer.close()
+            from .indexing import ensure_db
+
+            _writer = ensure_db(check_same_thread=False)  # closed from the shutdown hook
+            _writer.execute("PRAGMA synchronous=NORMAL")
+            _writer.execute(f"PRAGMA busy_timeout={_BUSY_TIMEOUT_MS}")
+            _writer_key = _file_key(path)
+        return _writer
+
+
+def close_all() -> None:
+    """Close pooled connections (app shutdown, tests)."""
+    global _writer, _writer_key, _epoch
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+        _writer = None
+        _writer_key = None
+        _epoch += 1
+    for conn in list(_readers):
+        conn.close()
+    _readers.clear()
@@ -0,0 +1,331 @@
+"""Optional dense (embedding) retrieval over passages, fused with lexical search.
+
+Passage embeddings are computed in batches from the ``papers``/``passages`` tables (title
++ passage text) by a pluggable local embedder and written to ``data/index/dense/``:
+
+- ``vectors.npy``: float16 ``(passages, dim)`` matrix of L2-normalised embeddings;
+- ``ids.jsonl`` + ``id_offsets.npy``: the passage_id / work_id / text hash of each row.
+
+Arrays are opened with ``mmap_mode="r"``; top-k is a chunked brute-force dot product in
+NumPy, so everything runs offline on CPU. Rebuilds reuse the vectors of passages whose
+text is unchanged, so only new or edited passages are embedded again.
+
+Embedders are selected by ``MATHFOUNDRY_DENSE_MODEL``:
+
+- ``hashing[:dim]`` (default): signed feature hashing of word uni/bigrams and character
+  4-grams; no model download, deterministic.
+- ``sentence-transformers:<name-or-path>``: a local sentence-transformers model (must be
+  installed and available offline).
+
+Requires NumPy (``pip install -e .[dense]``).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import mmap
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Protocol
+
+from .compression import decode_text
+from .config import CONFIG
+from .db import reader
+from .indexing import index_generation
+from .mathtext import NORMALISE_VERSION
+from .metrics import span
+from .retrieval import _tokenize
+
+try:  # optional dependency
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+# Rows converted + scored per step; small enough that the float32 copy stays in cache.
+_CHUNK_ROWS = 256
+
+
+def dense_dir() -> Path:
+    return Path(CONFIG.data_dir) / "index" / "dense"
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("dense retrieval requires numpy (pip install -e .[dense])")
+
+
+# ---------------------------------------------------------------------------
+# Embedders
+# ---------------------------------------------------------------------------
+
+
+class Embedder(Protocol):
+    spec: str
+    dim: int
+
+    def embed(self, texts: list[str]) -> "np.ndarray":
+        """Return a float32 ``(len(texts), dim)`` array of L2-normalised rows."""
+        ...
+
+
+class HashingEmbedder:
+    """Signed feature hashing of word uni/bigrams and character 4-grams (sublinear tf)."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.spec = f"hashing:{dim}"
+
+    def _features(self, text: str) -> Counter:
+        words = _tokenize(text)
+        feats = Counter(words)
+        feats.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+        for w in words:
+            padded = f"<{w}>"
+            feats.update(f"#{padded[i:i + 4]}" for i in range(max(1, len(padded) - 3)))
+        return feats
+
+    def embed(self, texts: list[str]) -> "np.ndarray":
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feat, tf in self._features(text).items():
+                h = zlib.crc32(feat.encode("utf-8"))
+                out[row, h % self.dim] += (1.0 + math.log(tf)) * (1.0 if h & 0x80000000 else -1.0)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEmbedder:
+    """A local sentence-transformers model (loaded once; never downloads when offline)."""
+
+    def __init__(self, name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.spec = f"sentence-transformers:{name}"
+        self._model = SentenceTransformer(name, device="cpu")
+        self.dim = int(self._model.get_sentence_embedding_dimension())
+
+    def embed(self, texts: list[str]) -> "np.ndarray":
+        vecs = self._model.encode(texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True)
+        return vecs.astype(np.float32)
+
+
+_EMBEDDERS: dict[str, Embedder] = {}
+_EMBEDDERS_LOCK = threading.Lock()
+
+
+def get_embedder(spec: str | None = None) -> Embedder:
+    """Return the (cached) embedder for *spec*, defaulting to ``CONFIG.dense_model``."""
+    _require_numpy()
+    spec = spec or CONFIG.dense_model
+    with _EMBEDDERS_LOCK:
+        if spec not in _EMBEDDERS:
+            kind, _, arg = spec.partition(":")
+            if kind == "hashing":
+                _EMBEDDERS[spec] = HashingEmbedder(int(arg) if arg else 384)
+            elif kind == "sentence-transformers" and arg:
+                _EMBEDDERS[spec] = SentenceTransformerEmbedder(arg)
+            else:
+                raise ValueError(f"unknown dense model {spec!r}")
+        return _EMBEDDERS[spec]
+
+
+# ---------------------------------------------------------------------------
+# Index build
+# ---------------------------------------------------------------------------
+
+
+def _iter_passages(conn: sqlite3.Connection | None):
+    if conn is None:
+        return iter(())
+    return conn.execute(
+        """
+        SELECT ps.passage_id, ps.work_id, p.title, ps.text
+        FROM passages ps JOIN papers p ON p.work_id = ps.work_id
+        ORDER BY ps.rowid
+        """
+    )
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _previous_vectors(index_dir: Path, spec: str) -> tuple[dict[str, tuple[int, str]], "np.ndarray | None"]:
+    """passage_id -> (row, text hash) and the vectors of an existing index built by *spec*."""
+    try:
+        manifest = json.loads((index_dir / "manifest.json").read_text(encoding="utf-8"))
+        # The hashing embedder tokenises with retrieval._tokenize, so its vectors go stale
+        # when the text normalisation changes.
+        if manifest.get("model") != spec or (
+            spec.startswith("hashing:") and manifest.get("normalise_version") != NORMALISE_VERSION
+        ):
+            return {}, None
+        vectors = np.load(index_dir / "vectors.npy", mmap_mode="r")
+        rows = {}
+        with (index_dir / "ids.jsonl").open("rb") as f:
+            for row, line in enumerate(f):
+                entry = json.loads(line)
+                rows[entry["p"]] = (row, entry["h"])
+        return rows, vectors
+    except (FileNotFoundError, ValueError, KeyError):
+        return {}, None
+
+
+def build_dense_index(out_dir: Path | None = None, spec: str | None = None, batch_size: int = 256) -> dict:
+    """Embed every passage in batches and atomically swap the vector index into place."""
+    _require_numpy()
+    out_dir = out_dir or dense_dir()
+    embedder = get_embedder(spec)
+    previous, prev_vectors = _previous_vectors(out_dir, embedder.spec)
+
+    conn = reader()
+    n_rows = generation = 0
+    if conn is not None:
+        conn.execute("BEGIN")  # count and read the same snapshot
+        n_rows = conn.execute(
+            "SELECT count(*) FROM passages ps JOIN papers p ON p.work_id = ps.work_id"
+        ).fetchone()[0]
+        generation = index_generation(conn)
+
+    tmp_dir = out_dir.with_name(f"{out_dir.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    vectors = np.lib.format.open_memmap(
+        tmp_dir / "vectors.npy", mode="w+", dtype=np.float16, shape=(n_rows, embedder.dim)
+    )
+    offsets = [0]
+    pending: list[tuple[int, str]] = []
+    reused = embedded = 0
+
+    def flush() -> None:
+        nonlocal embedded
+        if pending:
+            rows = [r for r, _ in pending]
+            vectors[rows] = embedder.embed([t for _, t in pending]).astype(np.float16)
+            embedded += len(pending)
+            pending.clear()
+
+    try:
+        with (tmp_dir / "ids.jsonl").open("wb") as ids:
+            for row, (passage_id, work_id, title, text) in enumerate(_iter_passages(conn)):
+                doc = f"{title or ''}\n{decode_text(conn, text) or ''}"
+                digest = _text_hash(doc)
+                prev = previous.get(passage_id)
+                if prev is not None and prev[1] == digest:
+                    vectors[row] = prev_vectors[prev[0]]
+                    reused += 1
+                else:
+                    pending.append((row, doc))
+                    if len(pending) >= batch_size:
+                        flush()
+                line = json.dumps({"p": passage_id, "w": work_id, "h": digest}, ensure_ascii=False).encode("utf-8")
+                ids.write(line + b"\n")
+                offsets.append(offsets[-1] + len(line) + 1)
+            flush()
+    finally:
+        if conn is not None:
+            conn.rollback()
+    vectors.flush()
+    del vectors
+    np.save(tmp_dir / "id_offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+    manifest = {
+        "model": embedder.spec,
+        "dim": embedder.dim,
+        "rows": n_rows,
+        "embedded": embedded,
+        "reused": reused,
+        "index_generation": generation,
+        "normalise_version": NORMALISE_VERSION,
+        "built_at": time.time(),
+    }
+    (tmp_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    # Swap directories; readers holding the old mmaps keep valid (unlinked) pages.
+    old_dir = out_dir.with_name(f"{out_dir.name}.old-{os.getpid()}")
+    if out_dir.exists():
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+# ---------------------------------------------------------------------------
+# Query
+# ---------------------------------------------------------------------------
+
+
+class DenseEngine:
+    """Read-only view over a built dense index directory."""
+
+    def __init__(self, index_dir: Path):
+        _require_numpy()
+        self.index_dir = index_dir
+        self.manifest = json.loads((index_dir / "manifest.json").read_text(encoding="utf-8"))
+        self.embedder = get_embedder(self.manifest["model"])
+        self.vectors = np.load(index_dir / "vectors.npy", mmap_mode="r")
+        self.id_offsets = np.load(index_dir / "id_offsets.npy", mmap_mode="r")
+        with (index_dir / "ids.jsonl").open("rb") as f:
+            self._ids = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def _ids_at(self, row: int) -> dict:
+        lo, hi = int(self.id_offsets[row]), int(self.id_offsets[row + 1])
+        return json.loads(self._ids[lo:hi])
+
+    def _top_rows(self, query_vec: "np.ndarray", k: int) -> tuple["np.ndarray", "np.ndarray"]:
+        scores = np.empty(len(self.vectors), dtype=np.float32)
+        for lo in range(0, len(self.vectors), _CHUNK_ROWS):
+            chunk = self.vectors[lo : lo + _CHUNK_ROWS].astype(np.float32)
+            np.matmul(chunk, query_vec, out=scores[lo : lo + _CHUNK_ROWS])
+        top = np.argpartition(-scores, k - 1)[:k] if scores.size > k else np.arange(scores.size)
+        order = top[np.argsort(-scores[top], kind="stable")]
+        return order, scores[order]
+
+    def search(self, query: str, k: int) -> list[tuple[str, str, float]]:
+        """Top *k* passages as ``(passage_id, work_id, cosine)``, best first."""
+        with span("search.dense"):
+            if not len(self.vectors) or not query.strip():
+                return []
+            query_vec = self.embedder.embed([query])[0]
+            if not query_vec.any():
+                return []
+            rows, scores = self._top_rows(query_vec, max(1, k))
+            out = []
+            for row, score in zip(rows.tolist(), scores.tolist()):
+                ids = self._ids_at(row)
+                out.append((ids["p"], ids["w"], round(float(score), 4)))
+            return out
+
+
+_ENGINE: DenseEngine | None = None
+_ENGINE_STAMP: int | None = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def load_dense_engine() -> DenseEngine | None:
+    """Return the shared engine, reopening it when the index was rebuilt; None if not built."""
+    global _ENGINE, _ENGINE_STAMP
+    manifest = dense_dir() / "manifest.json"
+    try:
+        stamp = manifest.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _ENGINE is None or stamp != _ENGINE_STAMP or _ENGINE.index_dir != dense_dir():
+        with _ENGINE_LOCK:
+            if _ENGINE is None or stamp != _ENGINE_STAMP or _ENGINE.index_dir != dense_dir():
+                try:
+                    _ENGINE = DenseEngine(dense_dir())
+                except FileNotFoundError:
+                    # Caught mid-swap by a concurrent rebuild; keep serving the old index.
+                    return _ENGINE
+                _ENGINE_STAMP = stamp
+    return _ENGINE
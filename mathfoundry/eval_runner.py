@@ -0,0 +1,482 @@
+"""Concurrent, resumable evaluation runner shared by the ``eval/scripts`` entry points.
+
+Queries run in batches on a thread pool (the s2 systems send each batch through
+``/search/batch``, ``/qa/batch`` and ``/qa/verify/batch``). Rows are appended to the output
+JSONL in input order as soon as every earlier batch is written, so an interrupted run
+loses at most the batches in flight. A run starts the output file afresh unless
+``--resume`` is given, in which case IDs that already have a row are skipped (and the file
+is put back in input order at the end).
+
+Latency is recorded at two levels, which ``eval/scripts/score.py`` summarises separately:
+
+- ``latency_ms``: stages timed for this query alone (``llm``, and ``total`` when the query
+  ran by itself), summarised as per-query percentiles;
+- ``batch``: ``{"id", "size", "latency_ms", "server_ms"}`` for calls made for the whole
+  batch (``search``, ``qa``, ``verify``, ``total``). ``server_ms`` is the app's own stage
+  breakdown from ``X-MathFoundry-Timing`` (start it with ``MATHFOUNDRY_TIMING_HEADER=1``),
+  which is where ``s2_rag_verify`` gets its ``verify`` stage.
+
+    python -m mathfoundry.eval_runner --system s2_openai_rag --queries eval/benchmark/ag_queries_v1.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+from .config import CONFIG
+from .io_utils import load_jsonl
+from .openai_client import get_client, output_text, post_responses
+
+logger = logging.getLogger(__name__)
+
+_EVAL_ROOT = Path(__file__).resolve().parents[1] / "eval"
+DEFAULT_QUERIES = _EVAL_ROOT / "benchmark" / "ag_queries_v1.jsonl"
+RESULTS_DIR = _EVAL_ROOT / "results"
+
+
+class StageTimer:
+    """Accumulates wall-clock milliseconds per named stage of one query (or one batch)."""
+
+    def __init__(self) -> None:
+        self.ms: dict[str, float] = {}
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.ms[name] = self.ms.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+
+    def add(self, name: str, ms: float) -> None:
+        self.ms[name] = self.ms.get(name, 0.0) + ms
+
+    def summary(self, total: bool = True) -> dict[str, float]:
+        out = {k: round(v, 2) for k, v in self.ms.items()}
+        if total:
+            out["total"] = round((time.perf_counter() - self._t0) * 1000, 2)
+        return out
+
+
+def parse_timing(header: str) -> dict[str, float]:
+    """``X-MathFoundry-Timing`` (``search.score;dur=1.2, llm.call;dur=900, ...``) as
+    milliseconds per top-level stage (``search``, ``llm``, ``verify``, ``total``)."""
+    out: dict[str, float] = {}
+    for part in header.split(","):
+        name, _, dur = part.strip().partition(";dur=")
+        if name and dur:
+            stage = name.split(".", 1)[0]
+            out[stage] = round(out.get(stage, 0.0) + float(dur), 2)
+    return out
+
+
+@dataclass
+class RunContext:
+    base_url: str = "http://127.0.0.1:8000"
+    model: str = CONFIG.openai_model
+    app_client: httpx.Client = field(default_factory=lambda: httpx.Client(timeout=120))
+    openai_client: httpx.Client | None = None
+
+    def call(self, path: str, payload: dict, server_ms: StageTimer | None = None) -> dict:
+        """POST to the app; its ``X-MathFoundry-Timing`` breakdown, when sent, is added to
+        *server_ms*."""
+        r = self.app_client.post(f"{self.base_url}{path}", json=payload)
+        r.raise_for_status()
+        if server_ms is not None:
+            for stage, ms in parse_timing(r.headers.get("x-mathfoundry-timing", "")).items():
+                server_ms.add(stage, ms)
+        return r.json()
+
+
+def row_key(q: dict) -> str:
+    return str(q.get("id") or q["query"])
+
+
+@dataclass
+class Batch:
+    """Timers handed to a ``BatchRunner``: one per query, plus the batch's own."""
+
+    queries: list[dict]
+    timers: list[StageTimer] = field(default_factory=list)
+    latency: StageTimer = field(default_factory=StageTimer)  # calls made for the whole batch
+    server: StageTimer = field(default_factory=StageTimer)  # the app's breakdown of those calls
+
+    def __post_init__(self) -> None:
+        self.timers = self.timers or [StageTimer() for _ in self.queries]
+
+
+# A system runs one batch and returns its rows in order (None for a query that failed:
+# it is not written, so a resumed run retries it).
+BatchRunner = Callable[[Batch], list["dict | None"]]
+
+
+def per_query(run_one: Callable[[dict, StageTimer], dict]) -> BatchRunner:
+    """A ``BatchRunner`` calling *run_one* for each query of the batch in turn, each timed
+    on its own (so its ``total`` is per query)."""
+
+    def run(batch: Batch) -> list[dict | None]:
+        rows: list[dict | None] = []
+        for q, timer in zip(batch.queries, batch.timers):
+            with timer.stage("total"):
+                rows.append(run_one(q, timer))
+        return rows
+
+    return run
+
+
+def _done_keys(path: Path) -> set[str]:
+    """Keys already written to *path*; drops a trailing partial line left by a crash."""
+    if not path.exists():
+        return set()
+    data = path.read_bytes()
+    if data and not data.endswith(b"\n"):
+        keep = data.rfind(b"\n") + 1
+        with path.open("r+b") as f:
+            f.truncate(keep)
+        data = data[:keep]
+    done = set()
+    for line in data.decode("utf-8").splitlines():
+        if line.strip():
+            done.add(row_key(json.loads(line)))
+    return done
+
+
+def _sort_rows(path: Path, queries: list[dict]) -> None:
+    """Rewrite *path* with its rows in the order of *queries* (unknown IDs last)."""
+    position = {row_key(q): i for i, q in enumerate(queries)}
+    lines = [line for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+    keyed = sorted(lines, key=lambda line: position.get(row_key(json.loads(line)), len(position)))
+    if keyed != lines:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text("".join(line + "\n" for line in keyed), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def run_eval(
+    queries: Iterable[dict],
+    out_path: Path,
+    run_batch: BatchRunner,
+    *,
+    batch_size: int = 1,
+    workers: int = 8,
+    resume: bool = False,
+) -> dict:
+    """Run *run_batch* over *queries* in batches of *batch_size*, *workers* batches at a
+    time, appending rows to *out_path* in input order.
+
+    *out_path* is replaced unless *resume*, which keeps its rows and runs only the
+    missing IDs. Failed queries (a whole batch when its shared call fails) are logged and
+    not written, so a resumed run retries them.
+    """
+    queries = list(queries)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    if not resume:
+        out_path.unlink(missing_ok=True)
+    done = _done_keys(out_path)
+    todo = [q for q in queries if row_key(q) not in done]
+    size = max(1, batch_size)
+    batches = [todo[i : i + size] for i in range(0, len(todo), size)]
+    stats = {"skipped": len(done), "written": 0, "failed": 0}
+
+    def task(queries: list[dict]) -> list[dict | None]:
+        batch = Batch(queries)
+        rows = run_batch(batch)
+        shared = batch.latency.summary(total=True) if batch.latency.ms else None
+        for row, timer in zip(rows, batch.timers):
+            if row is None:
+                continue
+            # A query's own total only exists when nothing was shared with the batch.
+            if timer.ms:
+                row["latency_ms"] = timer.summary(total=False)
+            if shared is not None:
+                row["batch"] = {
+                    "id": row_key(queries[0]),
+                    "size": len(queries),
+                    "latency_ms": shared,
+                    "server_ms": batch.server.summary(total=False),
+                }
+        return rows
+
+    finished: dict[int, list[dict | None] | None] = {}
+    next_index = 0
+    with out_path.open("a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(task, b): i for i, b in enumerate(batches)}
+        for fut in as_completed(futures):
+            i = futures[fut]
+            try:
+                finished[i] = fut.result()
+            except Exception as exc:
+                logger.warning("batch %s..%s failed: %s", row_key(batches[i][0]), row_key(batches[i][-1]), exc)
+                stats["failed"] += len(batches[i])
+                finished[i] = None
+            # Rows go out in input order: flush every batch whose predecessors are written.
+            while next_index in finished:
+                for row in finished.pop(next_index) or ():
+                    if row is None:
+                        stats["failed"] += 1
+                        continue
+                    out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    stats["written"] += 1
+                next_index += 1
+            out.flush()
+    if done and stats["written"]:
+        _sort_rows(out_path, queries)
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Systems
+# ---------------------------------------------------------------------------
+
+_S0_PROMPT = (
+    "You are a mathematical research assistant. Answer the user query concisely. "
+    "If uncertain, say so explicitly. Do not fabricate citations.\n\n"
+    "Query: {query}"
+)
+
+_S2_PROMPT = (
+    "You are a math literature assistant. Use ONLY the provided references. "
+    "Write a concise answer summary (3-6 sentences). If evidence is weak, say so.\n\n"
+    "Query: {query}\n\n"
+    "References:\n{context}\n"
+)
+
+
+def _rubric_fields(abstained: bool | None) -> dict:
+    return {
+        "correctness": None,
+        "citation_precision": None,
+        "overclaim": None,
+        "abstained": abstained,
+        "abstention_correct": None,
+    }
+
+
+def s0_pure_llm(ctx: RunContext) -> Callable[[dict, StageTimer], dict]:
+    """Pure LLM baseline: the model answers with no retrieval."""
+
+    def run(q: dict, timer: StageTimer) -> dict:
+        with timer.stage("llm"):
+            data = post_responses(
+                {"model": ctx.model, "input": _S0_PROMPT.format(query=q["query"])}, client=ctx.openai_client
+            )
+        return {
+            "id": q.get("id"),
+            "query": q["query"],
+            "system": "s0_pure_llm",
+            "model": ctx.model,
+            "answer": output_text(data).strip(),
+            "citations": [],
+            **_rubric_fields(False),
+            "citation_precision": 0.0,
+            "overclaim": True,
+            "notes": "auto-generated via OpenAI API; requires human rubric review",
+        }
+
+    return run
+
+
+def s2_openai_rag(ctx: RunContext) -> BatchRunner:
+    """Local /search/batch for references, OpenAI (concurrently) for the summaries, local
+    /qa/verify/batch to check them."""
+
+    def generate(query: str, refs: list[dict], timer: StageTimer) -> str:
+        context = "\n".join(
+            f"[{i}] work_id={r.get('work_id')} | title={r.get('title')} | summary={r.get('summary')}"
+            for i, r in enumerate(refs[:5], start=1)
+        )
+        with timer.stage("llm"):
+            data = post_responses(
+                {"model": ctx.model, "input": _S2_PROMPT.format(query=query, context=context)},
+                client=ctx.openai_client,
+            )
+        return output_text(data).strip()
+
+    def run(batch: Batch) -> list[dict | None]:
+        queries = batch.queries
+        with batch.latency.stage("search"):
+            searches = ctx.call(
+                "/search/batch", {"queries": [{"query": q["query"], "limit": 8} for q in queries]}, batch.server
+            )["results"]
+
+        # Generation calls share the pooled client and are timed per query; one failing
+        # leaves the others' rows.
+        with batch.latency.stage("llm"), ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            futures = [
+                pool.submit(generate, q["query"], s.get("results", []), t)
+                for q, s, t in zip(queries, searches, batch.timers)
+            ]
+        grounded: dict[int, dict] = {}
+        for i, (q, fut) in enumerate(zip(queries, futures)):
+            try:
+                answer_summary = fut.result()
+            except Exception as exc:
+                logger.warning("query %s failed: %s", row_key(q), exc)
+                continue
+            refs = searches[i].get("results", [])
+            grounded[i] = {
+                "answer_summary": answer_summary,
+                "claims": [
+                    {
+                        "text": "The answer is grounded in top retrieved references for this query.",
+                        "supporting_citations": [{"work_id": refs[0].get("work_id")}],
+                        "support_level": "direct",
+                    }
+                ]
+                if refs
+                else [],
+                "references": refs[:5],
+                "confidence": "low" if refs else "insufficient_evidence",
+                "limitations": ["LLM-generated synthesis; human review recommended."],
+                "query_refinements": [],
+            }
+        if not grounded:
+            return [None] * len(queries)
+
+        with batch.latency.stage("verify"):
+            verified = ctx.call("/qa/verify/batch", {"answers": list(grounded.values())}, batch.server)["results"]
+
+        rows: list[dict | None] = [None] * len(queries)
+        for (i, answer), ver in zip(grounded.items(), verified):
+            q = queries[i]
+            rows[i] = {
+                "id": q.get("id"),
+                "query": q["query"],
+                "system": "s2_rag_verify",
+                "model": ctx.model,
+                "answer": answer["answer_summary"],
+                "confidence": answer["confidence"],
+                "claims": len(answer["claims"]),
+                "references": len(answer["references"]),
+                "search_count": searches[i].get("count", 0),
+                "verify_ok": ver.get("ok"),
+                "coverage_ratio": ver.get("coverage_ratio"),
+                "must_abstain": ver.get("must_abstain"),
+                **_rubric_fields(bool(ver.get("must_abstain"))),
+                "notes": "RAG with OpenAI generation; requires human rubric review",
+            }
+        return rows
+
+    return run
+
+
+def s2_rag_verify(ctx: RunContext) -> BatchRunner:
+    """The app's own pipeline in one /qa/batch call: retrieval, grounded generation and
+    verification (its answers carry their verification)."""
+
+    def run(batch: Batch) -> list[dict | None]:
+        with batch.latency.stage("qa"):
+            answers = ctx.call("/qa/batch", {"queries": [{"query": q["query"]} for q in batch.queries]}, batch.server)[
+                "results"
+            ]
+
+        rows: list[dict | None] = []
+        for q, qa in zip(batch.queries, answers):
+            ver = qa.get("verification", {})
+            rows.append(
+                {
+                    "id": q.get("id"),
+                    "query": q["query"],
+                    "system": "s2_rag_verify",
+                    "answer": qa.get("answer_summary"),
+                    "confidence": qa.get("confidence"),
+                    "claims": len(qa.get("claims", [])),
+                    "references": len(qa.get("references", [])),
+                    "verify_ok": ver.get("ok"),
+                    "coverage_ratio": ver.get("coverage_ratio"),
+                    "must_abstain": ver.get("must_abstain"),
+                    **_rubric_fields(bool(ver.get("must_abstain"))),
+                    "notes": "Fill rubric fields after human review.",
+                }
+            )
+        return rows
+
+    return run
+
+
+SYSTEMS: dict[str, Callable[[RunContext], BatchRunner]] = {
+    "s0_pure_llm": lambda ctx: per_query(s0_pure_llm(ctx)),
+    "s2_openai_rag": s2_openai_rag,
+    "s2_rag_verify": s2_rag_verify,
+}
+_NEEDS_OPENAI = {"s0_pure_llm", "s2_openai_rag"}
+_DEFAULT_OUT = {
+    "s0_pure_llm": "s0_pure_llm.jsonl",
+    "s2_openai_rag": "s2_rag_verify.jsonl",
+    "s2_rag_verify": "s2_rag_verify.jsonl",
+}
+# (queries per batch, batches in flight). The s2 systems go through the batch endpoints;
+# a batch is also the unit that is checkpointed to --out.
+_BATCHING = {
+    "s0_pure_llm": (1, 8),
+    "s2_openai_rag": (8, 2),
+    "s2_rag_verify": (25, 2),
+}
+
+
+def build_parser(system: str | None = None, description: str = "Run an evaluation system") -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description=description)
+    if system is None:
+        p.add_argument("--system", choices=sorted(SYSTEMS), required=True)
+    p.add_argument("--model", default=CONFIG.openai_model)
+    p.add_argument("--base-url", default="http://127.0.0.1:8000")
+    p.add_argument("--queries", default=str(DEFAULT_QUERIES))
+    p.add_argument("--out", default=str(RESULTS_DIR / _DEFAULT_OUT[system]) if system else None)
+    p.add_argument("--limit", type=int, default=0, help="0 means all")
+    batch_size, workers = _BATCHING[system] if system else (None, None)
+    p.add_argument("--batch-size", type=int, default=batch_size, help="queries per batch request")
+    p.add_argument("--workers", type=int, default=workers, help="batches in flight")
+    p.add_argument("--resume", action="store_true", help="keep --out and only run IDs it has no row for yet")
+    return p
+
+
+def main(
+    system: str | None = None,
+    argv: list[str] | None = None,
+    description: str = "Run an evaluation system",
+    defaults: dict | None = None,
+) -> dict:
+    parser = build_parser(system, description)
+    parser.set_defaults(**(defaults or {}))
+    args = parser.parse_args(argv)
+    system = system or args.system
+    if system in _NEEDS_OPENAI and not CONFIG.openai_api_key:
+        raise SystemExit("OPENAI_API_KEY is required")
+
+    queries = load_jsonl(Path(args.queries))
+    if args.limit > 0:
+        queries = queries[: args.limit]
+    out = Path(args.out or RESULTS_DIR / _DEFAULT_OUT[system])
+
+    ctx = RunContext(base_url=args.base_url, model=args.model)
+    with ctx.app_client:
+        if system in _NEEDS_OPENAI:
+            ctx.openai_client = get_client()
+        batch_size, workers = _BATCHING[system]
+        stats = run_eval(
+            queries,
+            out,
+            SYSTEMS[system](ctx),
+            batch_size=args.batch_size or batch_size,
+            workers=args.workers or workers,
+            resume=args.resume,
+        )
+    result = {"system": system, "queries": len(queries), **stats, "queries_file": args.queries, "saved": str(out)}
+    print(json.dumps(result))
+    return result
+
+
+if __name__ == "__main__":
+    main()
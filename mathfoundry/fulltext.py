@@ -0,0 +1,455 @@
+"""Full-text passages from locally stored arXiv LaTeX sources.
+
+Sources live under ``data/src/`` as the files arXiv serves from ``/e-print/<id>``, named
+by arXiv ID (``2401.00001v1.tar.gz``; ``/`` in old-style IDs becomes ``_``): either a
+(gzipped) tarball or a single gzipped ``.tex`` file.
+
+For each source a worker process
+
+1. streams the archive (``tarfile`` ``r|*``, no seeking) keeping only ``.tex`` members,
+   capped per member and per paper so memory stays bounded;
+2. picks the main file (``\\documentclass``), strips comments and inlines
+   ``\\input``/``\\include`` recursively;
+3. writes the flattened document to ``data/fulltext/<id>.tex`` and cuts it into passages
+   on theorem-like / definition / proof / example environments (including aliases
+   declared with ``\\newtheorem``) and ``\\section`` boundaries, recording each
+   passage's UTF-8 byte offsets in that file (``byte_start``/``byte_end``), so
+   ``read_passage`` seeks straight to it.
+
+The single writer (this process) stores them as ``<work_id>#f<n>`` passages next to the
+abstract chunks; unchanged sources are skipped via the ``indexed_files`` manifest.
+"""
+
+from __future__ import annotations
+
+import gzip
+import logging
+import posixpath
+import re
+import tarfile
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+from .compression import text_encoder
+from .config import CONFIG
+from .db import writer
+from .indexing import (
+    _bump_generation,
+    _detect_block_type,
+    _estimate_tokens,
+    _file_hash_path,
+    _manifest_entry,
+    _passage_search_fields,
+    _record_file,
+    _sync_passages,
+)
+
+logger = logging.getLogger(__name__)
+
+# Per .tex member and per paper; larger inputs are generated/data files, not prose.
+_MAX_MEMBER_BYTES = 4 << 20
+_MAX_SOURCE_BYTES = 16 << 20
+_MAX_INPUT_DEPTH = 8
+_MAX_PASSAGE_CHARS = 1200
+
+_SOURCE_SUFFIXES = (".tar.gz", ".tgz", ".tar", ".gz")
+
+# Bumped when the stored offsets change meaning; older sources are re-cut on the next run.
+# 2: byte offsets of the stripped passage (were character offsets of the raw span).
+OFFSETS_VERSION = 2
+
+# Environment name -> block type; ``\newtheorem`` declarations extend this per paper.
+_ENV_BLOCKS = {
+    **dict.fromkeys(
+        ["theorem", "lemma", "proposition", "corollary", "conjecture", "claim", "thm", "lem", "prop", "cor"],
+        "theorem",
+    ),
+    **dict.fromkeys(["definition", "defn", "defi", "notation"], "definition"),
+    "proof": "proof",
+    **dict.fromkeys(["example", "examples", "counterexample", "exa"], "example"),
+    **dict.fromkeys(["remark", "rem", "note"], "paragraph"),
+}
+_SKIP_ENVS = {"abstract"}  # indexed from the metadata already
+
+_COMMENT_RE = re.compile(r"(?<!\\)%[^\n]*")
+_INPUT_RE = re.compile(r"\\(?:input|include)\s*(?:\{([^}]*)\}|([^\s{}\\]+))")
+_NEWTHEOREM_RE = re.compile(r"\\newtheorem\*?\s*\{([^}]+)\}\s*(?:\[[^\]]*\]\s*)?\{([^}]+)\}")
+_STRUCTURE_RE = re.compile(
+    r"\\(begin|end)\s*\{([A-Za-z@]+)\*?\}|\\(section|subsection|subsubsection)\*?\s*(?:\[[^\]]*\]\s*)?\{"
+)
+
+
+def src_dir() -> Path:
+    return Path(CONFIG.data_dir) / "src"
+
+
+def fulltext_dir() -> Path:
+    return Path(CONFIG.data_dir) / "fulltext"
+
+
+def arxiv_id_for(path: Path) -> str:
+    name = path.name
+    for suffix in _SOURCE_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+            break
+    return name.replace("_", "/")
+
+
+def flat_path(arxiv_id: str) -> Path:
+    return fulltext_dir() / f"{arxiv_id.replace('/', '_')}.tex"
+
+
+# ---------------------------------------------------------------------------
+# Source extraction
+# ---------------------------------------------------------------------------
+
+
+def _decode(data: bytes) -> str:
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+def _read_capped(f, limit: int) -> bytes | None:
+    data = f.read(limit + 1)
+    return None if len(data) > limit else data
+
+
+def read_tex_files(path: Path) -> dict[str, str]:
+    """Stream ``.tex`` members out of a source archive (or a single gzipped file)."""
+    files: dict[str, str] = {}
+    budget = _MAX_SOURCE_BYTES
+    try:
+        with tarfile.open(path, mode="r|*") as tar:
+            for member in tar:
+                if not member.isfile() or not member.name.lower().endswith(".tex"):
+                    continue
+                if member.size > min(_MAX_MEMBER_BYTES, budget):
+                    continue
+                f = tar.extractfile(member)
+                if f is None:
+                    continue
+                budget -= member.size
+                files[posixpath.normpath(member.name)] = _decode(f.read())
+        return files
+    except tarfile.ReadError:
+        pass
+    # Not a tarball: arXiv serves single-file submissions as a gzipped .tex.
+    opener = gzip.open if path.name.endswith(".gz") else open
+    try:
+        with opener(path, "rb") as f:
+            data = _read_capped(f, _MAX_MEMBER_BYTES)
+    except (OSError, EOFError):
+        return {}
+    return {"main.tex": _decode(data)} if data else {}
+
+
+def _main_file(files: dict[str, str]) -> str | None:
+    roots = [name for name, text in files.items() if "\\documentclass" in text]
+    if not roots:
+        return max(files, key=lambda n: len(files[n]), default=None)
+    return max(roots, key=lambda n: ("\\begin{document}" in files[n], len(files[n])))
+
+
+def _resolve(name: str, base: str, files: dict[str, str]) -> str | None:
+    name = name.strip().strip('"')
+    for cand in (posixpath.join(base, name), name):
+        cand = posixpath.normpath(cand)
+        for key in (cand, cand + ".tex"):
+            if key in files:
+                return key
+    return None
+
+
+def flatten(files: dict[str, str], main: str) -> str:
+    """Comment-stripped *main* with ``\\input``/``\\include`` inlined (cycle- and depth-safe)."""
+    stripped: dict[str, str] = {}
+
+    def text_of(name: str) -> str:
+        if name not in stripped:
+            stripped[name] = _COMMENT_RE.sub("", files[name])
+        return stripped[name]
+
+    def expand(name: str, depth: int, stack: tuple[str, ...]) -> str:
+        base = posixpath.dirname(main)
+
+        def sub(m: re.Match) -> str:
+            target = _resolve(m.group(1) or m.group(2), base, files)
+            if target is None or target in stack or depth >= _MAX_INPUT_DEPTH:
+                return ""
+            return expand(target, depth + 1, stack + (target,))
+
+        return _INPUT_RE.sub(sub, text_of(name))
+
+    return expand(main, 0, (main,))
+
+
+# ---------------------------------------------------------------------------
+# Passage cutting
+# ---------------------------------------------------------------------------
+
+
+def _balanced(doc: str, open_at: int) -> int:
+    """Index just past the ``}`` closing the brace group whose ``{`` precedes *open_at*."""
+    depth = 1
+    i = open_at
+    while i < len(doc) and depth:
+        ch = doc[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+        i += 1
+    return i
+
+
+def _env_blocks(doc: str) -> dict[str, str]:
+    blocks = dict(_ENV_BLOCKS)
+    for name, title in _NEWTHEOREM_RE.findall(doc):
+        blocks.setdefault(name.strip(), _detect_block_type(title))
+    return blocks
+
+
+def _paragraph_spans(doc: str, start: int, end: int) -> Iterator[tuple[int, int]]:
+    """Greedy chunks of blank-line-separated paragraphs, each at most ~_MAX_PASSAGE_CHARS."""
+    chunk_start = chunk_end = None
+    for m in re.finditer(r"\S(?:.*?\S)?(?=\s*\n\s*\n|\s*$)", doc[start:end], flags=re.S):
+        s, e = start + m.start(), start + m.end()
+        if chunk_start is not None and e - chunk_start > _MAX_PASSAGE_CHARS:
+            yield chunk_start, chunk_end
+            chunk_start = None
+        if chunk_start is None:
+            chunk_start = s
+        chunk_end = e
+    if chunk_start is not None:
+        yield chunk_start, chunk_end
+
+
+def _byte_offsets(doc: str, positions: Iterable[int]) -> dict[int, int]:
+    """UTF-8 byte offset of each character offset in *positions*, in one pass over *doc*."""
+    out: dict[int, int] = {}
+    char = byte = 0
+    for pos in sorted(set(positions)):
+        byte += len(doc[char:pos].encode("utf-8"))
+        out[pos] = byte
+        char = pos
+    return out
+
+
+def cut_passages(doc: str) -> list[dict]:
+    """Split a flattened LaTeX document into passages.
+
+    ``byte_start``/``byte_end`` are the UTF-8 byte offsets of each (stripped) passage
+    text in the document as ``_prepare_source`` writes it.
+    """
+    blocks = _env_blocks(doc)
+    body_start = doc.find("\\begin{document}")
+    body_start = 0 if body_start < 0 else body_start + len("\\begin{document}")
+    body_end = doc.find("\\end{document}", body_start)
+    body_end = len(doc) if body_end < 0 else body_end
+
+    spans: list[tuple[int, int, str, str]] = []  # start, end, block_type, section
+    section = "body"
+    last = body_start
+    open_env: str | None = None
+    open_at = 0
+    nesting = 0
+
+    def flush_text(end: int) -> None:
+        for s, e in _paragraph_spans(doc, last, end):
+            spans.append((s, e, "paragraph", section))
+
+    for m in _STRUCTURE_RE.finditer(doc, body_start, body_end):
+        kind, env, heading = m.group(1), m.group(2), m.group(3)
+        if open_env is not None:
+            if env == open_env:
+                nesting += 1 if kind == "begin" else -1
+                if nesting == 0:
+                    if open_env not in _SKIP_ENVS:
+                        spans.append((open_at, m.end(), blocks[open_env], section))
+                    open_env, last = None, m.end()
+            continue
+        if heading:
+            flush_text(m.start())
+            close = _balanced(doc, m.end())
+            section = " ".join(doc[m.end() : close - 1].split())[:120] or heading
+            last = close
+        elif kind == "begin" and (env in blocks or env in _SKIP_ENVS):
+            flush_text(m.start())
+            open_env, open_at, nesting = env, m.start(), 1
+    if open_env is not None and open_env not in _SKIP_ENVS:  # unterminated environment
+        spans.append((open_at, body_end, blocks[open_env], section))
+    elif open_env is None:
+        flush_text(body_end)
+
+    passages = []
+    char_spans: list[tuple[int, int]] = []
+    for start, end, block, label in spans:
+        # Long environments (proofs) are cut further on paragraph boundaries.
+        pieces = [(start, end)] if end - start <= _MAX_PASSAGE_CHARS else list(_paragraph_spans(doc, start, end))
+        for s, e in pieces:
+            raw = doc[s:e]
+            text = raw.strip()
+            if text:
+                s += len(raw) - len(raw.lstrip())
+                char_spans.append((s, s + len(text)))
+                passages.append(
+                    {
+                        "section_label": label,
+                        "block_type": block,
+                        "text": text,
+                        "token_est": _estimate_tokens(text),
+                        **_passage_search_fields(text),
+                    }
+                )
+    offsets = _byte_offsets(doc, (o for span in char_spans for o in span))
+    for p, (s, e) in zip(passages, char_spans):
+        p["byte_start"], p["byte_end"] = offsets[s], offsets[e]
+    return passages
+
+
+def read_passage(arxiv_id: str, byte_start: int, byte_end: int) -> str:
+    """Re-read a passage (by its stored byte offsets) from the flattened source."""
+    with flat_path(arxiv_id).open("rb") as f:
+        f.seek(byte_start)
+        return f.read(byte_end - byte_start).decode("utf-8")
+
+
+# ---------------------------------------------------------------------------
+# Indexing
+# ---------------------------------------------------------------------------
+
+
+# A truncated or corrupted download surfaces as any of these, mid-stream as often as on open.
+_EXTRACT_ERRORS = (tarfile.TarError, zlib.error, EOFError, OSError, ValueError)
+
+
+def _prepare_source(path: str) -> dict:
+    """Pool worker: extract, flatten, store and cut one source. Never touches the database.
+
+    A source that cannot be extracted comes back with ``error`` set instead of raising, so
+    one bad download does not stop (and roll back) the whole run.
+    """
+    p = Path(path)
+    st = p.stat()
+    arxiv_id = arxiv_id_for(p)
+    out = {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": _file_hash_path(p)}
+    out.update(arxiv_id=arxiv_id, passages=[], error=None)
+    try:
+        files = read_tex_files(p)
+    except _EXTRACT_ERRORS as e:
+        out["error"] = f"{type(e).__name__}: {e}"
+        return out
+    main = _main_file(files)
+    if main is None:
+        return out
+    doc = flatten(files, main)
+    target = flat_path(arxiv_id)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8", newline="") as f:
+        f.write(doc)
+    tmp.replace(target)
+    out["passages"] = cut_passages(doc)
+    return out
+
+
+def _bounded_map(fn: Callable[[str], dict], items: Iterable[str], workers: int) -> Iterator[dict]:
+    """``map`` over a process pool with at most ``4 * workers`` results in flight."""
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: list[Future] = []
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= 4 * workers:
+                yield pending.pop(0).result()
+        for fut in pending:
+            yield fut.result()
+
+
+def _work_id_for(conn, arxiv_id: str) -> str | None:
+    """The indexed work for *arxiv_id* (latest version when the source name has none)."""
+    work_id = f"arxiv:{arxiv_id}"
+    # Versions compare numerically (v10 after v9); the bare ID, if indexed, ranks as v0.
+    row = conn.execute(
+        "SELECT work_id FROM papers WHERE work_id = ? OR (work_id > ? AND work_id < ?) "
+        "ORDER BY CAST(substr(work_id, ?) AS INTEGER) DESC LIMIT 1",
+        (work_id, work_id + "v", work_id + "w", len(work_id) + 2),
+    ).fetchone()
+    return row[0] if row else None
+
+
+# Passages written per transaction.
+_WRITE_BATCH = 20000
+
+
+def index_all_fulltext(force: bool = False, workers: int = 1) -> dict:
+    """Index every source under ``data/src/``; returns counts of papers and passages.
+
+    Sources whose paper is not in the index yet are left unrecorded, so a later run picks
+    them up once the metadata has been harvested. So are sources that fail to extract
+    (counted as ``failed``), to be retried once they have been downloaded again.
+    """
+    root = src_dir()
+    if not root.exists():
+        return {"papers": 0, "passages": 0, "unmatched": 0, "failed": 0}
+    conn = writer()
+    row = conn.execute("SELECT value FROM index_meta WHERE key = 'fulltext_offsets'").fetchone()
+    if row is None or row[0] != OFFSETS_VERSION:
+        # Passages cut by an older version carry offsets in the old unit: re-cut them all.
+        force = force or conn.execute("SELECT 1 FROM passages WHERE byte_start IS NOT NULL LIMIT 1").fetchone() is not None
+    pending = []
+    for f in sorted(p for p in root.iterdir() if p.name.endswith(_SOURCE_SUFFIXES)):
+        prev = _manifest_entry(conn, str(f))
+        st = f.stat()
+        if force or not prev or prev[:2] != (st.st_size, st.st_mtime_ns):
+            pending.append(str(f))
+
+    stats = {"papers": 0, "passages": 0, "unmatched": 0, "failed": 0}
+    in_batch = 0
+    try:
+        for res in _bounded_map(_prepare_source, pending, workers):
+            if res["error"]:
+                logger.warning("skipping unreadable source %s: %s", res["path"], res["error"])
+                stats["failed"] += 1
+                continue
+            prev = _manifest_entry(conn, res["path"])
+            if not force and prev and prev[2] == res["hash"]:
+                _record_file(conn, res["path"], res["size"], res["mtime_ns"], res["hash"])
+                continue
+            work_id = _work_id_for(conn, res["arxiv_id"])
+            if work_id is None:
+                stats["unmatched"] += 1
+                continue
+            passages = [
+                {**p, "passage_id": f"{work_id}#f{i}", "work_id": work_id, "chunk_index": i}
+                for i, p in enumerate(res["passages"])
+            ]
+            encode = text_encoder(conn, (p["text"] for p in passages))
+            _sync_passages(conn, work_id, passages, scope="#f", encode=encode)
+            _bump_generation(conn)
+            _record_file(conn, res["path"], res["size"], res["mtime_ns"], res["hash"])
+            stats["papers"] += 1
+            stats["passages"] += len(passages)
+            in_batch += len(passages) + 1
+            if in_batch >= _WRITE_BATCH:
+                conn.commit()
+                in_batch = 0
+        conn.execute(
+            "INSERT INTO index_meta(key, value) VALUES('fulltext_offsets', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (OFFSETS_VERSION,),
+        )
+        conn.commit()
+    finally:
+        conn.rollback()
+    return stats
@@ -2,13 +2,19 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import logging
 import re
+import threading
+import time
+from collections.abc import AsyncIterator, Iterable
+from pathlib import Path
 
-import httpx
-
+from .cache import LRUCache, SqliteCache
 from .config import CONFIG
+from .metrics import observe_stage, span
 from .models import Claim, Citation, GroundedAnswer, VerifyResponse
 
 logger = logging.getLogger(__name__)
@@ -47,6 +53,48 @@ JSON schema:
 """
 
 
+# Changes whenever the system prompt is edited, invalidating cached answers.
+_PROMPT_VERSION = hashlib.sha256(_SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:12]
+
+# ---------------------------------------------------------------------------
+# Persistent answer cache
+# ---------------------------------------------------------------------------
+
+_answer_cache: SqliteCache | None = None
+_answer_cache_lock = threading.Lock()
+
+
+def answer_cache() -> SqliteCache | None:
+    """Shared answer cache under ``data/cache/``; None when disabled."""
+    global _answer_cache
+    if not CONFIG.answer_cache_enabled:
+        return None
+    path = Path(CONFIG.data_dir) / "cache" / "answers.db"
+    with _answer_cache_lock:
+        if _answer_cache is None or _answer_cache.path != path:
+            _answer_cache = SqliteCache(
+                path, max_entries=CONFIG.answer_cache_max_entries, ttl_sec=CONFIG.answer_cache_ttl_sec
+            )
+        return _answer_cache
+
+
+def _answer_cache_key(query: str, context: str) -> str:
+    """Key on what determines the model output: query, model, prompt and the evidence."""
+    normalised = " ".join(query.lower().split())
+    context_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()
+    raw = json.dumps([normalised, CONFIG.openai_model, _PROMPT_VERSION, context_hash])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def answer_cache_stats() -> dict:
+    # Report without opening the cache file; it is created on the first /qa call.
+    if not CONFIG.answer_cache_enabled:
+        return {"enabled": False}
+    if _answer_cache is None:
+        return {"enabled": True, "entries": None, "hits": 0, "misses": 0}
+    return {"enabled": True, **_answer_cache.stats()}
+
+
 def _build_context(candidates: list[dict], max_refs: int = 8) -> str:
     """Format retrieved candidates into a numbered reference block."""
     lines = []
@@ -112,46 +160,42 @@ def _load_model_json(raw: str) -> dict:
             return json.loads(repaired)
 
 
+def _responses_payload(query: str, context: str) -> dict:
+    return {
+        "model": CONFIG.openai_model,
+        "instructions": _SYSTEM_PROMPT,
+        "input": f"Query: {query}\n\nReferences:\n{context}",
+    }
+
+
+def _llm():
+    # Imported on first use: httpx is a large share of the app's import time and /health,
+    # /search and the cached or abstaining answers never need it.
+    from . import openai_client
+
+    return openai_client
+
+
 def _call_openai(query: str, context: str) -> dict:
-    """Call OpenAI Responses API and parse the JSON output."""
-    user_msg = f"Query: {query}\n\nReferences:\n{context}"
-
-    with httpx.Client(
-        headers={
-            "Authorization": f"Bearer {CONFIG.openai_api_key}",
-            "Content-Type": "application/json",
-        },
-        timeout=httpx.Timeout(connect=10.0, read=120.0, write=30.0, pool=10.0),
-    ) as client:
-        base_url = CONFIG.openai_base_url.rstrip("/")
-        r = client.post(
-            f"{base_url}/responses",
-            json={
-                "model": CONFIG.openai_model,
-                "instructions": _SYSTEM_PROMPT,
-                "input": user_msg,
-            },
-        )
-        r.raise_for_status()
-        data = r.json()
-
-    # Extract text from Responses API structure:
-    # output -> [message] -> content -> [output_text] -> text
-    raw = ""
-    for msg in data.get("output", []):
-        for block in msg.get("content", []):
-            if block.get("type") == "output_text":
-                raw = block.get("text", "")
-                break
-        if raw:
-            break
+    """Call OpenAI Responses API (shared pooled client) and parse the JSON output."""
+    llm = _llm()
+    with span("llm.call"):
+        data = llm.post_responses(_responses_payload(query, context))
+    with span("llm.parse"):
+        return _load_model_json(llm.output_text(data))
 
-    return _load_model_json(raw)
 
+async def _call_openai_async(query: str, context: str) -> dict:
+    """Async ``_call_openai`` on the shared AsyncClient."""
+    llm = _llm()
+    with span("llm.call"):
+        data = await llm.apost_responses(_responses_payload(query, context))
+    with span("llm.parse"):
+        return _load_model_json(llm.output_text(data))
 
-def answer_with_grounding(query: str, candidates: list[dict]) -> GroundedAnswer:
-    """Generate a citation-grounded answer for *query* given retrieved *candidates*."""
 
+def _early_answer(candidates: list[dict]) -> GroundedAnswer | None:
+    """Answers that need no LLM call: abstain without candidates, scaffold without a key."""
     # No candidates → abstain immediately
     if not candidates:
         return GroundedAnswer(
@@ -179,43 +223,42 @@ def answer_with_grounding(query: str, candidates: list[dict]) -> GroundedAnswer:
             confidence="low",
             limitations=["Scaffold answer; set OPENAI_API_KEY for full LLM-powered grounding."],
         )
+    return None
 
-    # Full LLM-grounded answer
-    context = _build_context(candidates)
-    ref_lookup = {c["work_id"]: c for c in candidates}
 
-    try:
-        parsed = _call_openai(query, context)
-    except Exception as exc:
-        logger.warning("OpenAI call failed: %s — falling back to scaffold", exc)
-        top = candidates[0]
-        claim = Claim(
-            text=f"A likely relevant starting reference is '{top['title']}'.",
-            supporting_citations=[Citation(work_id=top["work_id"])],
-            support_level="direct",
-        )
-        return GroundedAnswer(
-            answer_summary=f"OpenAI call failed ({type(exc).__name__}); showing top retrieval result instead.",
-            claims=[claim],
-            references=[top],
-            confidence="low",
-            limitations=[f"LLM call failed: {exc}"],
-        )
+def _failed_answer(candidates: list[dict], exc: Exception) -> GroundedAnswer:
+    logger.warning("OpenAI call failed: %s — falling back to scaffold", exc)
+    top = candidates[0]
+    claim = Claim(
+        text=f"A likely relevant starting reference is '{top['title']}'.",
+        supporting_citations=[Citation(work_id=top["work_id"])],
+        support_level="direct",
+    )
+    return GroundedAnswer(
+        answer_summary=f"OpenAI call failed ({type(exc).__name__}); showing top retrieval result instead.",
+        claims=[claim],
+        references=[top],
+        confidence="low",
+        limitations=[f"LLM call failed: {exc}"],
+    )
 
-    # Parse claims
-    claims: list[Claim] = []
-    for raw_claim in parsed.get("claims", []):
-        cits = [
-            Citation(work_id=c.get("work_id", ""), passage_id=c.get("passage_id"))
-            for c in raw_claim.get("supporting_citations", [])
-        ]
-        claims.append(
-            Claim(
-                text=raw_claim.get("text", ""),
-                supporting_citations=cits,
-                support_level=raw_claim.get("support_level", "direct"),
-            )
-        )
+
+def _claim_from_model(raw_claim: dict) -> Claim:
+    cits = [
+        Citation(work_id=c.get("work_id", ""), passage_id=c.get("passage_id"))
+        for c in raw_claim.get("supporting_citations", [])
+    ]
+    return Claim(
+        text=raw_claim.get("text", ""),
+        supporting_citations=cits,
+        support_level=raw_claim.get("support_level", "direct"),
+    )
+
+
+def _answer_from_model(parsed: dict, candidates: list[dict]) -> GroundedAnswer:
+    ref_lookup = {c["work_id"]: c for c in candidates}
+
+    claims = [_claim_from_model(raw_claim) for raw_claim in parsed.get("claims", [])]
 
     # Collect cited references
     cited_ids = set()
@@ -243,6 +286,172 @@ def answer_with_grounding(query: str, candidates: list[dict]) -> GroundedAnswer:
     )
 
 
+def answer_with_grounding(query: str, candidates: list[dict]) -> GroundedAnswer:
+    """Generate a citation-grounded answer for *query* given retrieved *candidates*."""
+    early = _early_answer(candidates)
+    if early is not None:
+        return early
+
+    # Full LLM-grounded answer
+    context = _build_context(candidates)
+    cache = answer_cache()
+    cache_key = _answer_cache_key(query, context)
+    parsed = cache.get(cache_key) if cache is not None else None
+    try:
+        if parsed is None:
+            parsed = _call_openai(query, context)
+            if cache is not None:
+                cache.set(cache_key, parsed)
+    except Exception as exc:
+        return _failed_answer(candidates, exc)
+    return _answer_from_model(parsed, candidates)
+
+
+async def answer_with_grounding_async(query: str, candidates: list[dict]) -> GroundedAnswer:
+    """``answer_with_grounding`` that awaits the LLM instead of blocking a worker thread."""
+    early = _early_answer(candidates)
+    if early is not None:
+        return early
+
+    context = _build_context(candidates)
+    # The answer cache is SQLite: its I/O runs in a worker thread, off the event loop.
+    cache = await asyncio.to_thread(answer_cache)
+    cache_key = _answer_cache_key(query, context)
+    parsed = await asyncio.to_thread(cache.get, cache_key) if cache is not None else None
+    try:
+        if parsed is None:
+            parsed = await _call_openai_async(query, context)
+            if cache is not None:
+                await asyncio.to_thread(cache.set, cache_key, parsed)
+    except Exception as exc:
+        return _failed_answer(candidates, exc)
+    return _answer_from_model(parsed, candidates)
+
+
+# ---------------------------------------------------------------------------
+# Streaming
+# ---------------------------------------------------------------------------
+
+_CLAIMS_START_RE = re.compile(r'"claims"\s*:\s*\[')
+
+
+class _ClaimScanner:
+    """Incrementally pull complete objects out of the ``"claims": [...]`` array of the
+    model's JSON output while it is still being streamed."""
+
+    def __init__(self) -> None:
+        self.buf = ""
+        self.pos = -1  # next index to scan; -1 until the claims array has started
+        self.done = False
+        self.depth = 0
+        self.start = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, delta: str) -> list[str]:
+        self.buf += delta
+        if self.done:
+            return []
+        if self.pos < 0:
+            m = _CLAIMS_START_RE.search(self.buf)
+            if m is None:
+                return []
+            self.pos = m.end()
+
+        out: list[str] = []
+        for i in range(self.pos, len(self.buf)):
+            ch = self.buf[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+            if ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                if self.depth == 0:
+                    self.start = i
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    out.append(self.buf[self.start : i + 1])
+            elif ch == "]" and self.depth == 0:
+                self.done = True
+                break
+        self.pos = len(self.buf)
+        return out
+
+
+def _claim_event(i: int, claim: Claim, reference_ids: set[str]) -> dict:
+    invalid, reasons = _check_claim(i, claim, reference_ids)
+    return {"index": i, "claim": claim.model_dump(), "verified": not invalid, "reasons": reasons}
+
+
+async def stream_grounded_answer(query: str, candidates: list[dict]) -> AsyncIterator[tuple[str, dict]]:
+    """Async ``answer_with_grounding`` as ``(event, data)`` pairs for ``/qa/stream``.
+
+    Yields ``token`` events with the raw model output deltas, a ``claim`` event as soon as
+    each claim has been parsed and checked against the candidates (``index`` is its position
+    in the model's claims array), then one ``final`` event with the same payload ``/qa``
+    returns. The final answer is authoritative: if it does not keep every streamed claim
+    as it was sent (the full parse disagrees, or the call failed and fell back to the
+    scaffold), a ``reset`` event tells the client to drop the streamed claims and all final
+    claims are sent again from index 0.
+    """
+    emitted: dict[int, dict] = {}
+    reason = "reparsed"
+    grounded = _early_answer(candidates)
+    if grounded is None:
+        context = _build_context(candidates)
+        cache = await asyncio.to_thread(answer_cache)
+        cache_key = _answer_cache_key(query, context)
+        parsed = await asyncio.to_thread(cache.get, cache_key) if cache is not None else None
+        if parsed is None:
+            # Every candidate ends up in references[] when cited, so these are the valid ids.
+            reference_ids = {str(c.get("work_id", "")).strip() for c in candidates}
+            scanner = _ClaimScanner()
+            chunks: list[str] = []
+            seen = 0
+            try:
+                t0 = time.perf_counter()
+                async for delta in _llm().astream_responses(_responses_payload(query, context)):
+                    chunks.append(delta)
+                    yield "token", {"text": delta}
+                    for raw_claim in scanner.feed(delta):
+                        i, seen = seen, seen + 1
+                        try:
+                            claim = _claim_from_model(_load_model_json(raw_claim))
+                        except (ValueError, AttributeError):
+                            continue  # the full parse below decides
+                        emitted[i] = _claim_event(i, claim, reference_ids)
+                        yield "claim", emitted[i]
+                observe_stage("llm.call", time.perf_counter() - t0)
+                with span("llm.parse"):
+                    parsed = _load_model_json("".join(chunks))
+                if cache is not None:
+                    await asyncio.to_thread(cache.set, cache_key, parsed)
+            except Exception as exc:
+                grounded = _failed_answer(candidates, exc)
+                reason = "fallback"
+        if grounded is None:
+            grounded = _answer_from_model(parsed, candidates)
+
+    reference_ids = {str(r.get("work_id", "")).strip() for r in grounded.references if isinstance(r, dict)}
+    final = [_claim_event(i, c, reference_ids) for i, c in enumerate(grounded.claims)]
+    if any(i >= len(final) or final[i] != event for i, event in emitted.items()):
+        yield "reset", {"reason": reason}
+        emitted = {}
+    # Cached, scaffold and fallback answers (and claims the scanner could not parse) go out here.
+    for event in final:
+        if event["index"] not in emitted:
+            yield "claim", event
+    yield "final", finalize_answer(grounded)
+
+
 # ---------------------------------------------------------------------------
 # Verification (unchanged logic)
 # ---------------------------------------------------------------------------
@@ -258,11 +467,111 @@ def _confidence_from_ratio(ratio: float) -> str:
     return "insufficient_evidence"
 
 
+def _check_claim(i: int, c: Claim, reference_ids: set[str]) -> tuple[bool, list[str]]:
+    """Check one claim against *reference_ids*; returns (invalid, reasons)."""
+    claim_invalid = False
+    reasons: list[str] = []
+
+    if c.support_level not in _ALLOWED_SUPPORT_LEVELS:
+        claim_invalid = True
+        reasons.append(f"claim[{i}] has invalid support_level '{c.support_level}'")
+
+    if not c.supporting_citations:
+        claim_invalid = True
+        reasons.append(f"claim[{i}] has no supporting citations")
+    else:
+        seen = set()
+        for cit in c.supporting_citations:
+            wid = (cit.work_id or "").strip()
+            if not wid:
+                claim_invalid = True
+                reasons.append(f"claim[{i}] has empty citation work_id")
+                continue
+            if wid in seen:
+                reasons.append(f"claim[{i}] contains duplicate citation '{wid}'")
+            seen.add(wid)
+
+            if reference_ids and wid not in reference_ids:
+                claim_invalid = True
+                reasons.append(f"claim[{i}] cites work_id '{wid}' not present in references[]")
+
+    return claim_invalid, reasons
+
+
+# ---------------------------------------------------------------------------
+# Verification memo
+# ---------------------------------------------------------------------------
+
+# Verification is a pure function of the claims' support levels and citation work_ids,
+# the declared confidence and the reference IDs, so results are memoised on a hash of
+# exactly those fields (the same answer is verified by /qa, /qa/verify and the evals).
+_verify_memo = LRUCache(CONFIG.verify_memo_max_entries)
+
+
+def _reference_ids(answer: GroundedAnswer) -> set[str]:
+    return set(str(r.get("work_id", "")).strip() for r in answer.references if isinstance(r, dict))
+
+
+def _references_digest(reference_ids: set[str]) -> str:
+    return hashlib.sha256("\n".join(sorted(reference_ids)).encode("utf-8")).hexdigest()
+
+
+def _verify_key(answer: GroundedAnswer, references_digest: str) -> str:
+    claims = [[c.support_level, [cit.work_id for cit in c.supporting_citations]] for c in answer.claims]
+    raw = json.dumps([references_digest, answer.confidence, claims], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def verify_memo_stats() -> dict:
+    if CONFIG.verify_memo_max_entries <= 0:
+        return {"enabled": False}
+    return {"enabled": True, **_verify_memo.stats()}
+
+
+def _verify_memoised(answer: GroundedAnswer, reference_ids: set[str], digest: str) -> VerifyResponse:
+    if CONFIG.verify_memo_max_entries <= 0:
+        return _verify(answer, reference_ids)
+    key = _verify_key(answer, digest)
+    hit = _verify_memo.get(key)
+    if hit is None:
+        hit = _verify(answer, reference_ids)
+        _verify_memo.set(key, hit.model_dump())
+        return hit
+    return VerifyResponse.model_construct(
+        **{**hit, "invalid_claim_indices": list(hit["invalid_claim_indices"]), "reasons": list(hit["reasons"])}
+    )
+
+
 def verify_grounded_answer(answer: GroundedAnswer) -> VerifyResponse:
+    with span("verify"):
+        reference_ids = _reference_ids(answer)
+        return _verify_memoised(answer, reference_ids, _references_digest(reference_ids))
+
+
+def verify_many(
+    answers: list[GroundedAnswer], reference_ids: Iterable[str] | None = None
+) -> list[VerifyResponse]:
+    """Verify a batch of answers in one pass.
+
+    With *reference_ids*, every answer's citations are checked against that shared set
+    (normalised and hashed once) instead of its own ``references``.
+    """
+    with span("verify"):
+        if reference_ids is None:
+            out = []
+            for answer in answers:
+                ids = _reference_ids(answer)
+                out.append(_verify_memoised(answer, ids, _references_digest(ids)))
+            return out
+        shared = {str(r).strip() for r in reference_ids}
+        digest = _references_digest(shared)
+        return [_verify_memoised(answer, shared, digest) for answer in answers]
+
+
+def _verify(answer: GroundedAnswer, reference_ids: set[str]) -> VerifyResponse:
     invalid: list[int] = []
     reasons: list[str] = []
 
-    reference_ids = {str(r.get("work_id", "")).strip() for r in answer.references if isinstance(r, dict)}
     if answer.claims and not reference_ids:
         reasons.append("claims exist but references list is empty")
 
@@ -270,31 +579,8 @@ def verify_grounded_answer(answer: GroundedAnswer) -> VerifyResponse:
         reasons.append(f"confidence '{answer.confidence}' is invalid")
 
     for i, c in enumerate(answer.claims):
-        claim_invalid = False
-
-        if c.support_level not in _ALLOWED_SUPPORT_LEVELS:
-            claim_invalid = True
-            reasons.append(f"claim[{i}] has invalid support_level '{c.support_level}'")
-
-        if not c.supporting_citations:
-            claim_invalid = True
-            reasons.append(f"claim[{i}] has no supporting citations")
-        else:
-            seen = set()
-            for cit in c.supporting_citations:
-                wid = (cit.work_id or "").strip()
-                if not wid:
-                    claim_invalid = True
-                    reasons.append(f"claim[{i}] has empty citation work_id")
-                    continue
-                if wid in seen:
-                    reasons.append(f"claim[{i}] contains duplicate citation '{wid}'")
-                seen.add(wid)
-
-                if reference_ids and wid not in reference_ids:
-                    claim_invalid = True
-                    reasons.append(f"claim[{i}] cites work_id '{wid}' not present in references[]")
-
+        claim_invalid, claim_reasons = _check_claim(i, c, reference_ids)
+        reasons.extend(claim_reasons)
         if claim_invalid:
             invalid.append(i)
 
@@ -320,3 +606,21 @@ def verify_grounded_answer(answer: GroundedAnswer) -> VerifyResponse:
         suggested_confidence=suggested_confidence,
         must_abstain=must_abstain,
     )
+
+
+def finalize_answer(grounded: GroundedAnswer) -> dict:
+    """Verify *grounded*, downgrade it to an abstention if needed, and build the /qa payload."""
+    verification = verify_grounded_answer(grounded)
+    if verification.must_abstain:
+        grounded.confidence = "insufficient_evidence"
+        if "Verification threshold not met." not in grounded.limitations:
+            grounded.limitations.append("Verification threshold not met.")
+        if not grounded.query_refinements:
+            grounded.query_refinements = [
+                "Add a specific theorem/object or author name.",
+                "Narrow scope by subtopic and timeframe.",
+            ]
+
+    payload = grounded.model_dump()
+    payload["verification"] = verification.model_dump()
+    return payload
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import re
 import sqlite3
 from pathlib import Path
 
-from .arxiv import parse_entries as _parse_arxiv_entries
+from .compression import Encoder, decode_text, recompress_texts, text_encoder
 from .config import CONFIG
-from .subareas import detect_ag_subareas
+from .db import db_path, writer
+from .mathtext import NORMALISE_VERSION, analyse_text, fold_text, normalise_text
+from .subareas import detect_ag_subareas_many
+
 _BLOCK_MARKERS = {
     "theorem": ["theorem", "lemma", "proposition", "corollary"],
     "definition": ["definition", "notion", "denote"],
@@ -15,14 +20,31 @@ _BLOCK_MARKERS = {
 }
 
 
-def db_path() -> Path:
-    return Path(CONFIG.data_dir) / "index" / "mathfoundry.db"
+# Indexes not needed while loading; a fresh bulk build creates them after the load.
+_DEFERRABLE_INDEXES = {
+    "idx_papers_category": "CREATE INDEX IF NOT EXISTS idx_papers_category ON papers(category)",
+    "idx_passages_block": "CREATE INDEX IF NOT EXISTS idx_passages_block ON passages(block_type)",
+}
+
+# (path, inode) of databases already migrated by this process.
+_MIGRATED: set[tuple[str, int]] = set()
 
 
-def ensure_db() -> sqlite3.Connection:
+def ensure_db(check_same_thread: bool = True) -> sqlite3.Connection:
+    """Open a new connection to the index, creating/migrating the schema once per process."""
     path = db_path()
     path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(path)
+    conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+    key = (str(path), path.stat().st_ino)
+    if key not in _MIGRATED:
+        _migrate(conn)
+        _MIGRATED.add(key)
+    return conn
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    # WAL lets the API's read-only connections keep reading while the worker writes.
+    conn.execute("PRAGMA journal_mode=WAL")
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS papers (
@@ -37,12 +59,9 @@ def ensure_db() -> sqlite3.Connection:
         )
         """
     )
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_category ON papers(category)")
     # lightweight migration for existing local DBs
-    try:
-        conn.execute("ALTER TABLE papers ADD COLUMN ag_subareas TEXT")
-    except sqlite3.OperationalError:
-        pass
+    _add_column(conn, "papers", "ag_subareas", "TEXT")
+    _add_column(conn, "papers", "content_hash", "TEXT")
 
     conn.execute(
         """
@@ -60,14 +79,330 @@ def ensure_db() -> sqlite3.Connection:
         """
     )
     conn.execute("CREATE INDEX IF NOT EXISTS idx_passages_work ON passages(work_id)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_passages_block ON passages(block_type)")
+    for ddl in _DEFERRABLE_INDEXES.values():
+        conn.execute(ddl)
+
+    # Manifest of raw inputs already indexed; lets rebuilds skip unchanged files.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS indexed_files (
+          path TEXT PRIMARY KEY,
+          size INTEGER NOT NULL,
+          mtime_ns INTEGER NOT NULL,
+          content_hash TEXT NOT NULL,
+          indexed_at TEXT NOT NULL
+        )
+        """
+    )
+    _add_column(conn, "indexed_files", "byte_offset", "INTEGER NOT NULL DEFAULT 0")
+    # Normalised lower-cased copies scored in SQL by retrieval (and indexed by FTS) so no
+    # query has to lower-case or ship the original text; math_terms is the formula field
+    # (mathtext.formula_terms, space-delimited).
+    _add_column(conn, "papers", "title_lc", "TEXT")
+    _add_column(conn, "papers", "summary_lc", "TEXT")
+    _add_column(conn, "passages", "text_lc", "TEXT")
+    _add_column(conn, "papers", "math_terms", "TEXT")
+    _add_column(conn, "passages", "math_terms", "TEXT")
+    # UTF-8 byte offsets of full-text passages in their flattened source (data/fulltext/);
+    # NULL for abstract chunks. Named char_start/char_end before they held bytes.
+    _rename_column(conn, "passages", "char_start", "byte_start")
+    _rename_column(conn, "passages", "char_end", "byte_end")
+    _add_column(conn, "passages", "byte_start", "INTEGER")
+    _add_column(conn, "passages", "byte_end", "INTEGER")
+    # Bumped in every transaction that changes papers/passages; result caches key on it.
+    conn.execute("CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    _backfill_search_columns(conn)
+    # Dictionaries of compressed summary/text bodies (see compression.py).
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS text_dicts "
+        "(dict_id INTEGER PRIMARY KEY, codec TEXT NOT NULL, data BLOB NOT NULL, created_at TEXT NOT NULL)"
+    )
+    _ensure_fts(conn)
+    conn.commit()
+
+
+def index_generation(conn: sqlite3.Connection) -> int:
+    """Current index generation (0 for an index that predates the counter)."""
+    try:
+        row = conn.execute("SELECT value FROM index_meta WHERE key = 'generation'").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return int(row[0]) if row else 0
+
+
+def _bump_generation(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        INSERT INTO index_meta(key, value) VALUES('generation', 1)
+        ON CONFLICT(key) DO UPDATE SET value = value + 1
+        """
+    )
+
+
+def _stored_terms(terms: list[str]) -> str:
+    """Formula terms as stored: space-delimited with a space at both ends, so scoring can
+    test ``instr(math_terms, ' term ')``."""
+    return f" {' '.join(dict.fromkeys(terms))} " if terms else ""
+
+
+def _paper_search_fields(title: str | None, summary: str | None, passages: list[dict] | None = None) -> dict:
+    """Search columns of a paper; the summary's formula terms come from its *passages*
+    (abstract chunks) when they have been analysed already."""
+    t = analyse_text(title)
+    if passages is None:
+        s = analyse_text(summary)
+        summary_lc, summary_terms = fold_text(s.normalised), s.terms
+    else:
+        summary_lc = fold_text(normalise_text(summary))
+        summary_terms = [m for p in passages for m in p["math_terms"].split()]
+    return {"title_lc": fold_text(t.normalised), "summary_lc": summary_lc, "math_terms": _stored_terms(t.terms + summary_terms)}
+
+
+def _passage_search_fields(text: str) -> dict:
+    """Search columns of a passage body, plus its math density (same analysis pass)."""
+    a = analyse_text(text)
+    return {"text_lc": fold_text(a.normalised), "math_terms": _stored_terms(a.terms), "math_density": a.density}
+
+
+_BACKFILL_BATCH = 5000
+
+
+def _backfill_search_columns(conn: sqlite3.Connection) -> None:
+    """Derive the search columns (``*_lc``, ``math_terms``) where missing, or of every row
+    when ``mathtext.NORMALISE_VERSION`` changed since they were stored."""
+    row = conn.execute("SELECT value FROM index_meta WHERE key = 'normalise_version'").fetchone()
+    stale = row is None or row[0] != NORMALISE_VERSION
+    jobs = {
+        "papers": ("title, summary", "title_lc IS NULL OR math_terms IS NULL"),
+        "passages": ("text", "text_lc IS NULL OR math_terms IS NULL"),
+    }
+    pending = {
+        table: (cols, "1" if stale else missing)
+        for table, (cols, missing) in jobs.items()
+        if conn.execute(f"SELECT 1 FROM {table} WHERE {'1' if stale else missing} LIMIT 1").fetchone()
+    }
+    if pending:
+        # Rewriting rows through the FTS triggers is slow, and preparing the UPDATE fails
+        # while an FTS table is missing; _ensure_fts rebuilds the tables afterwards.
+        _drop_fts_triggers(conn)
+    for table, (cols, where) in pending.items():
+        last = 0
+        while True:
+            rows = conn.execute(
+                f"SELECT rowid, {cols} FROM {table} WHERE rowid > ? AND ({where}) ORDER BY rowid LIMIT ?",
+                (last, _BACKFILL_BATCH),
+            ).fetchall()
+            if not rows:
+                break
+            last = rows[-1][0]
+            if table == "papers":
+                # Folded in Python (fold_text) rather than by SQLite's lower(), which only folds ASCII.
+                fields = [
+                    (rowid, _paper_search_fields(t, decode_text(conn, s))) for rowid, t, s in rows
+                ]
+                conn.executemany(
+                    "UPDATE papers SET title_lc = ?, summary_lc = ?, math_terms = ? WHERE rowid = ?",
+                    [(f["title_lc"], f["summary_lc"], f["math_terms"], rowid) for rowid, f in fields],
+                )
+            else:
+                fields = [(rowid, _passage_search_fields(decode_text(conn, t))) for rowid, t in rows]
+                conn.executemany(
+                    "UPDATE passages SET text_lc = ?, math_terms = ? WHERE rowid = ?",
+                    [(f["text_lc"], f["math_terms"], rowid) for rowid, f in fields],
+                )
+    conn.execute(
+        "INSERT INTO index_meta(key, value) VALUES('normalise_version', ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (NORMALISE_VERSION,),
+    )
+
+
+def _add_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> None:
+    cols = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in cols:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _rename_column(conn: sqlite3.Connection, table: str, old: str, new: str) -> None:
+    cols = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+    if old in cols and new not in cols:
+        conn.execute(f"ALTER TABLE {table} RENAME COLUMN {old} TO {new}")
+
+
+def _substring_fts(table: str, cols: tuple[str, ...]) -> tuple[str, list[str]]:
+    name = f"{table}_sub_fts"
+    names = ", ".join(cols)
+    new = ", ".join(f"new.{c}" for c in cols)
+    old = ", ".join(f"old.{c}" for c in cols)
+    return (
+        f"CREATE VIRTUAL TABLE {name} USING fts5("
+        f"{names}, content='{table}', content_rowid='rowid', tokenize='trigram', detail='none')",
+        [
+            f"""
+            CREATE TRIGGER {name}_ai AFTER INSERT ON {table} BEGIN
+              INSERT INTO {name}(rowid, {names}) VALUES (new.rowid, {new});
+            END
+            """,
+            f"""
+            CREATE TRIGGER {name}_ad AFTER DELETE ON {table} BEGIN
+              INSERT INTO {name}({name}, rowid, {names}) VALUES ('delete', old.rowid, {old});
+            END
+            """,
+            f"""
+            CREATE TRIGGER {name}_au AFTER UPDATE OF {names} ON {table} BEGIN
+              INSERT INTO {name}({name}, rowid, {names}) VALUES ('delete', old.rowid, {old});
+              INSERT INTO {name}(rowid, {names}) VALUES (new.rowid, {new});
+            END
+            """,
+        ],
+    )
+
+
+# FTS5 inverted indexes over the searchable text. Both are external-content tables over
+# the lower-cased columns (the text lives only in papers/passages) kept in sync by the
+# triggers below, so every write path that touches papers/passages updates the index in
+# the same transaction.
+# NOTE: they key on the implicit rowid, so never VACUUM without a 'rebuild' afterwards.
+_FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+# Formula terms join canonical atoms with "_" (h_sup_1), so "_" must not split tokens.
+_MATH_FTS_TOKENIZER = "unicode61 tokenchars '_'"
+
+_FTS_TABLES: dict[str, tuple[str, list[str]]] = {
+    "papers_fts": (
+        "CREATE VIRTUAL TABLE papers_fts USING fts5("
+        f"title_lc, summary_lc, content='papers', content_rowid='rowid', tokenize='{_FTS_TOKENIZER}')",
+        [
+            """
+            CREATE TRIGGER papers_fts_ai AFTER INSERT ON papers BEGIN
+              INSERT INTO papers_fts(rowid, title_lc, summary_lc) VALUES (new.rowid, new.title_lc, new.summary_lc);
+            END
+            """,
+            """
+            CREATE TRIGGER papers_fts_ad AFTER DELETE ON papers BEGIN
+              INSERT INTO papers_fts(papers_fts, rowid, title_lc, summary_lc) VALUES ('delete', old.rowid, old.title_lc, old.summary_lc);
+            END
+            """,
+            """
+            CREATE TRIGGER papers_fts_au AFTER UPDATE OF title_lc, summary_lc ON papers BEGIN
+              INSERT INTO papers_fts(papers_fts, rowid, title_lc, summary_lc) VALUES ('delete', old.rowid, old.title_lc, old.summary_lc);
+              INSERT INTO papers_fts(rowid, title_lc, summary_lc) VALUES (new.rowid, new.title_lc, new.summary_lc);
+            END
+            """,
+        ],
+    ),
+    "passages_fts": (
+        "CREATE VIRTUAL TABLE passages_fts USING fts5("
+        f"text_lc, content='passages', content_rowid='rowid', tokenize='{_FTS_TOKENIZER}')",
+        [
+            """
+            CREATE TRIGGER passages_fts_ai AFTER INSERT ON passages BEGIN
+              INSERT INTO passages_fts(rowid, text_lc) VALUES (new.rowid, new.text_lc);
+            END
+            """,
+            """
+            CREATE TRIGGER passages_fts_ad AFTER DELETE ON passages BEGIN
+              INSERT INTO passages_fts(passages_fts, rowid, text_lc) VALUES ('delete', old.rowid, old.text_lc);
+            END
+            """,
+            """
+            CREATE TRIGGER passages_fts_au AFTER UPDATE OF text_lc ON passages BEGIN
+              INSERT INTO passages_fts(passages_fts, rowid, text_lc) VALUES ('delete', old.rowid, old.text_lc);
+              INSERT INTO passages_fts(rowid, text_lc) VALUES (new.rowid, new.text_lc);
+            END
+            """,
+        ],
+    ),
+    **{
+        f"{table}_math_fts": (
+            f"CREATE VIRTUAL TABLE {table}_math_fts USING fts5("
+            f"""math_terms, content='{table}', content_rowid='rowid', tokenize="{_MATH_FTS_TOKENIZER}")""",
+            [
+                f"""
+                CREATE TRIGGER {table}_math_fts_ai AFTER INSERT ON {table} BEGIN
+                  INSERT INTO {table}_math_fts(rowid, math_terms) VALUES (new.rowid, new.math_terms);
+                END
+                """,
+                f"""
+                CREATE TRIGGER {table}_math_fts_ad AFTER DELETE ON {table} BEGIN
+                  INSERT INTO {table}_math_fts({table}_math_fts, rowid, math_terms) VALUES ('delete', old.rowid, old.math_terms);
+                END
+                """,
+                f"""
+                CREATE TRIGGER {table}_math_fts_au AFTER UPDATE OF math_terms ON {table} BEGIN
+                  INSERT INTO {table}_math_fts({table}_math_fts, rowid, math_terms) VALUES ('delete', old.rowid, old.math_terms);
+                  INSERT INTO {table}_math_fts(rowid, math_terms) VALUES (new.rowid, new.math_terms);
+                END
+                """,
+            ],
+        )
+        for table in ("papers", "passages")
+    },
+    # Trigram indexes over the same columns answer substring queries ("morphism" in
+    # "isomorphisms"), which the word tables only match as prefixes. detail=none keeps them
+    # small; a query ANDs a word's trigrams and the scoring's instr() drops false hits.
+    **{
+        f"{table}_sub_fts": _substring_fts(table, cols)
+        for table, cols in (("papers", ("title_lc", "summary_lc")), ("passages", ("text_lc",)))
+    },
+}
+
+
+def _trigger_name(ddl: str) -> str:
+    return ddl.split()[2]
+
+
+def _ensure_fts(conn: sqlite3.Connection) -> None:
+    """Create (or recreate, when the definition changed) the FTS tables and backfill them."""
+    existing_triggers = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='trigger'")}
+    for name, (ddl, triggers) in _FTS_TABLES.items():
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone()
+        if row is not None and row[0] == ddl:
+            if all(_trigger_name(t) in existing_triggers for t in triggers):
+                continue
+            # Triggers missing (e.g. an interrupted bulk build): resync from the content table.
+            _resume_fts(conn, name)
+            continue
+        for trig in triggers:
+            conn.execute(f"DROP TRIGGER IF EXISTS {_trigger_name(trig)}")
+        conn.execute(f"DROP TABLE IF EXISTS {name}")
+        conn.execute(ddl)
+        _resume_fts(conn, name)
+
+
+def _drop_fts_triggers(conn: sqlite3.Connection) -> None:
+    for _name, (_ddl, triggers) in _FTS_TABLES.items():
+        for trig in triggers:
+            conn.execute(f"DROP TRIGGER IF EXISTS {_trigger_name(trig)}")
+
+
+def _suspend_fts(conn: sqlite3.Connection) -> None:
+    """Drop the FTS sync triggers and deferrable indexes ahead of a bulk load."""
+    _drop_fts_triggers(conn)
+    for name in _DEFERRABLE_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+
+
+def _resume_fts(conn: sqlite3.Connection, name: str | None = None) -> None:
+    """Rebuild FTS table(s) from their content tables and reinstall the sync triggers."""
+    for fts_name, (_ddl, triggers) in _FTS_TABLES.items():
+        if name is not None and fts_name != name:
+            continue
+        conn.execute(f"INSERT INTO {fts_name}({fts_name}) VALUES ('rebuild')")
+        for trig in triggers:
+            conn.execute(f"DROP TRIGGER IF EXISTS {_trigger_name(trig)}")
+            conn.execute(trig)
+    if name is None:
+        for ddl in _DEFERRABLE_INDEXES.values():
+            conn.execute(ddl)
     conn.commit()
-    return conn
 
 
 def parse_arxiv_atom(xml_text: str) -> list[dict]:
     """Parse ArXiv Atom XML into normalised dicts (delegates to shared parser)."""
-    return _parse_arxiv_entries(xml_text)
+    from .arxiv import parse_entries
+
+    return parse_entries(xml_text)
 
 
 def _estimate_tokens(text: str) -> int:
@@ -75,10 +410,7 @@ def _estimate_tokens(text: str) -> int:
 
 
 def _math_density(text: str) -> float:
-    if not text:
-        return 0.0
-    mathish = re.findall(r"[\\$^_{}]|\\[a-zA-Z]+|\b[A-Z][a-zA-Z]?\b", text)
-    return round(min(1.0, len(mathish) / max(1, len(text))), 4)
+    return analyse_text(text).density
 
 
 def _detect_block_type(text: str) -> str:
@@ -109,8 +441,8 @@ def _split_passages(summary: str, work_id: str) -> list[dict]:
                     "section_label": "abstract",
                     "block_type": _detect_block_type(text),
                     "text": text,
-                    "math_density": _math_density(text),
                     "token_est": _estimate_tokens(text),
+                    **_passage_search_fields(text),
                 }
             )
             chunk_index += 1
@@ -128,63 +460,405 @@ def _split_passages(summary: str, work_id: str) -> list[dict]:
                 "section_label": "abstract",
                 "block_type": _detect_block_type(text),
                 "text": text,
-                "math_density": _math_density(text),
                 "token_est": _estimate_tokens(text),
+                **_passage_search_fields(text),
             }
         )
     return chunks
 
 
-def index_raw_file(xml_file: Path) -> int:
-    text = xml_file.read_text(encoding="utf-8")
-    rows = parse_arxiv_atom(text)
-    if not rows:
-        return 0
+# Bump when tagging/chunking rules change so unchanged inputs are re-derived once.
+_INDEX_VERSION = 3
 
-    conn = ensure_db()
-    with conn:
-        payload_rows = []
-        for r in rows:
-            tags = detect_ag_subareas(f"{r.get('title','')} {r.get('summary','')}") if r.get("category") == "math.AG" else []
-            payload_rows.append({**r, "source_file": str(xml_file), "ag_subareas": ",".join(tags)})
+_PASSAGE_COLUMNS = (
+    "chunk_index", "section_label", "block_type", "text", "math_density", "token_est", "byte_start", "byte_end"
+)
 
+
+def _paper_hash(r: dict) -> str:
+    fields = [_INDEX_VERSION] + [r.get(k) or "" for k in ("title", "summary", "category", "published", "updated")]
+    return hashlib.sha1(json.dumps(fields, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _file_hash(data: bytes) -> str:
+    return hashlib.sha256(f"v{_INDEX_VERSION}:".encode() + data).hexdigest()
+
+
+def _file_hash_path(path: Path) -> str:
+    """``_file_hash`` of a file's bytes, read in 1 MiB chunks."""
+    h = hashlib.sha256(f"v{_INDEX_VERSION}:".encode())
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# Parsed entries handed to the writer at a time; bounds memory per file.
+_ENTRY_BATCH = 500
+
+
+def _batched(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _existing_hashes(conn: sqlite3.Connection, work_ids: list[str]) -> dict[str, str]:
+    out: dict[str, str] = {}
+    for i in range(0, len(work_ids), 500):
+        chunk = work_ids[i : i + 500]
+        marks = ",".join("?" * len(chunk))
+        out.update(conn.execute(f"SELECT work_id, content_hash FROM papers WHERE work_id IN ({marks})", chunk).fetchall())
+    return out
+
+
+_TEXT_COLUMN = _PASSAGE_COLUMNS.index("text")
+
+
+def _sync_passages(
+    conn: sqlite3.Connection, work_id: str, passages: list[dict], scope: str = "#p", encode: Encoder | None = None
+) -> None:
+    """Rewrite only the passages of *work_id* that were added, changed or removed.
+
+    Only passages whose ID starts with ``work_id + scope`` are considered, so abstract
+    chunks (``#p``) and full-text passages (``#f``) are synced independently. *encode*
+    (``compression.text_encoder``) compresses the bodies written.
+    """
+    prefix = work_id + scope
+    old = {
+        r[0]: tuple(decode_text(conn, v) if i == _TEXT_COLUMN else v for i, v in enumerate(r[1:]))
+        for r in conn.execute(
+            f"SELECT passage_id, {', '.join(_PASSAGE_COLUMNS)} FROM passages "
+            "WHERE work_id = ? AND substr(passage_id, 1, length(?)) = ?",
+            (work_id, prefix, prefix),
+        )
+    }
+    stale = old.keys() - {p["passage_id"] for p in passages}
+    if stale:
+        conn.executemany("DELETE FROM passages WHERE passage_id = ?", [(pid,) for pid in stale])
+    changed = [p for p in passages if old.get(p["passage_id"]) != tuple(p.get(c) for c in _PASSAGE_COLUMNS)]
+    if changed:
         conn.executemany(
             """
-            INSERT INTO papers(work_id, title, summary, category, ag_subareas, published, updated, source_file)
-            VALUES(:work_id,:title,:summary,:category,:ag_subareas,:published,:updated,:source_file)
-            ON CONFLICT(work_id) DO UPDATE SET
-              title=excluded.title,
-              summary=excluded.summary,
-              category=excluded.category,
-              ag_subareas=excluded.ag_subareas,
-              published=excluded.published,
-              updated=excluded.updated,
-              source_file=excluded.source_file
+            INSERT INTO passages(passage_id, work_id, chunk_index, section_label, block_type, text, text_lc,
+                                 math_terms, math_density, token_est, byte_start, byte_end)
+            VALUES(:passage_id,:work_id,:chunk_index,:section_label,:block_type,:text,:text_lc,
+                   :math_terms,:math_density,:token_est,:byte_start,:byte_end)
+            ON CONFLICT(passage_id) DO UPDATE SET
+              chunk_index=excluded.chunk_index,
+              section_label=excluded.section_label,
+              block_type=excluded.block_type,
+              text=excluded.text,
+              text_lc=excluded.text_lc,
+              math_terms=excluded.math_terms,
+              math_density=excluded.math_density,
+              token_est=excluded.token_est,
+              byte_start=excluded.byte_start,
+              byte_end=excluded.byte_end
             """,
-            payload_rows,
+            [
+                {
+                    "byte_start": None,
+                    "byte_end": None,
+                    **({} if "text_lc" in p else _passage_search_fields(p["text"])),
+                    **p,
+                    "text": encode(p["text"]) if encode else p["text"],
+                }
+                for p in changed
+            ],
         )
 
-        for r in rows:
-            conn.execute("DELETE FROM passages WHERE work_id = ?", (r["work_id"],))
-            passages = _split_passages(r.get("summary", ""), r["work_id"])
-            if passages:
-                conn.executemany(
-                    """
-                    INSERT INTO passages(passage_id, work_id, chunk_index, section_label, block_type, text, math_density, token_est)
-                    VALUES(:passage_id,:work_id,:chunk_index,:section_label,:block_type,:text,:math_density,:token_est)
-                    """,
-                    passages,
-                )
 
-    conn.close()
-    return len(rows)
+def _prepare_paper(r: dict, source_file: str, content_hash: str | None = None, tags: list[str] | None = None) -> dict:
+    """Derive everything stored for a paper: subarea tags, hash and passages."""
+    if tags is None:
+        tags = _tag_papers([r])[0]
+    passages = _split_passages(r.get("summary", ""), r["work_id"])
+    return {
+        **r,
+        "source_file": source_file,
+        "ag_subareas": ",".join(tags),
+        "content_hash": content_hash or _paper_hash(r),
+        "passages": passages,
+        **_paper_search_fields(r.get("title"), r.get("summary"), passages),
+    }
+
 
+def _tag_papers(rows: list[dict]) -> list[list[str]]:
+    """Subarea tags for each row (math.AG papers only), tagged as one batch."""
+    ag = [i for i, r in enumerate(rows) if r.get("category") == "math.AG"]
+    tags: list[list[str]] = [[] for _ in rows]
+    texts = (f"{rows[i].get('title','')} {rows[i].get('summary','')}" for i in ag)
+    for i, t in zip(ag, detect_ag_subareas_many(texts)):
+        tags[i] = t
+    return tags
+
+
+def _write_papers(conn: sqlite3.Connection, rows: list[dict], source_file: str) -> int:
+    """Upsert papers whose content hash changed (and their passages); returns how many.
+
+    *rows* are parsed entries or already ``_prepare_paper``-ed ones (parallel builds).
+    """
+    rows = list({r["work_id"]: r for r in rows}.values())
+    existing = _existing_hashes(conn, [r["work_id"] for r in rows])
+
+    payload_rows, pending, hashes = [], [], []
+    for r in rows:
+        content_hash = r.get("content_hash") or _paper_hash(r)
+        if existing.get(r["work_id"]) == content_hash:
+            continue
+        if "passages" in r:
+            payload_rows.append(r)
+        else:
+            pending.append(r)
+            hashes.append(content_hash)
+    for r, content_hash, tags in zip(pending, hashes, _tag_papers(pending)):
+        payload_rows.append(_prepare_paper(r, source_file, content_hash, tags))
+    if not payload_rows:
+        return 0
+
+    encode = text_encoder(
+        conn, (t for r in payload_rows for t in [r.get("summary")] + [p["text"] for p in r["passages"]])
+    )
+    conn.executemany(
+        """
+        INSERT INTO papers(work_id, title, summary, title_lc, summary_lc, math_terms, category, ag_subareas,
+                           published, updated, source_file, content_hash)
+        VALUES(:work_id,:title,:summary,:title_lc,:summary_lc,:math_terms,:category,:ag_subareas,
+               :published,:updated,:source_file,:content_hash)
+        ON CONFLICT(work_id) DO UPDATE SET
+          title=excluded.title,
+          summary=excluded.summary,
+          title_lc=excluded.title_lc,
+          summary_lc=excluded.summary_lc,
+          math_terms=excluded.math_terms,
+          category=excluded.category,
+          ag_subareas=excluded.ag_subareas,
+          published=excluded.published,
+          updated=excluded.updated,
+          source_file=excluded.source_file,
+          content_hash=excluded.content_hash
+        """,
+        [{**r, "summary": encode(r.get("summary")) if encode else r.get("summary")} for r in payload_rows],
+    )
+    for r in payload_rows:
+        _sync_passages(conn, r["work_id"], r["passages"], encode=encode)
+    _bump_generation(conn)
+    return len(payload_rows)
+
+
+def _record_file(conn: sqlite3.Connection, path: str, size: int, mtime_ns: int, content_hash: str) -> None:
+    conn.execute(
+        """
+        INSERT INTO indexed_files(path, size, mtime_ns, content_hash, indexed_at)
+        VALUES(?,?,?,?,datetime('now'))
+        ON CONFLICT(path) DO UPDATE SET
+          size=excluded.size, mtime_ns=excluded.mtime_ns,
+          content_hash=excluded.content_hash, indexed_at=excluded.indexed_at
+        """,
+        (path, size, mtime_ns, content_hash),
+    )
+
+
+def _manifest_entry(conn: sqlite3.Connection, path: str) -> tuple | None:
+    return conn.execute("SELECT size, mtime_ns, content_hash FROM indexed_files WHERE path = ?", (path,)).fetchone()
+
+
+def index_raw_file(xml_file: Path, force: bool = False) -> int:
+    """Index one raw Atom file; returns the number of papers added or changed.
+
+    Files whose size/mtime (or, failing that, content hash) match ``indexed_files`` are
+    skipped without parsing, and papers whose content hash is unchanged are not rewritten.
+    """
+    conn = writer()
+    path = str(xml_file)
+    st = xml_file.stat()
+    prev = _manifest_entry(conn, path)
+    if not force and prev and prev[:2] == (st.st_size, st.st_mtime_ns):
+        return 0
 
-def index_all_raw() -> int:
+    content_hash = _file_hash_path(xml_file)
+    if not force and prev and prev[2] == content_hash:
+        with conn:
+            _record_file(conn, path, st.st_size, st.st_mtime_ns, content_hash)
+        return 0
+
+    # The feed parser (and the httpx client it shares a module with) only loads for builds.
+    from .arxiv import iter_entries
+
+    changed = 0
+    with conn:
+        for rows in _batched(iter_entries(xml_file), _ENTRY_BATCH):
+            changed += _write_papers(conn, rows, path)
+        _record_file(conn, path, st.st_size, st.st_mtime_ns, content_hash)
+    return changed
+
+
+def _prepare_file(path: str) -> tuple[str, int, int, str, list[dict]]:
+    """Pool worker: parse, tag and chunk one raw file. Never touches the database."""
+    from .arxiv import iter_entries
+
+    p = Path(path)
+    st = p.stat()
+    entries = list(iter_entries(p))
+    papers = [_prepare_paper(r, path, tags=tags) for r, tags in zip(entries, _tag_papers(entries))]
+    return path, st.st_size, st.st_mtime_ns, _file_hash_path(p), papers
+
+
+# Papers written per transaction by the parallel writer.
+_WRITE_BATCH = 5000
+
+
+def _index_files_parallel(files: list[Path], workers: int, force: bool) -> int:
+    from concurrent.futures import ProcessPoolExecutor
+
+    conn = writer()
+    pending = []
+    for f in files:
+        prev = _manifest_entry(conn, str(f))
+        st = f.stat()
+        if force or not prev or prev[:2] != (st.st_size, st.st_mtime_ns):
+            pending.append(str(f))
+    if not pending:
+        return 0
+
+    # On a fresh build, maintain FTS and secondary indexes once at the end, not per row.
+    fresh = conn.execute("SELECT 1 FROM papers LIMIT 1").fetchone() is None
+    if fresh:
+        _suspend_fts(conn)
+    conn.execute("PRAGMA cache_size=-262144")  # 256 MiB
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+    total = 0
+    in_batch = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, size, mtime_ns, content_hash, papers in pool.map(_prepare_file, pending, chunksize=4):
+                prev = _manifest_entry(conn, path)
+                if force or not prev or prev[2] != content_hash:
+                    total += _write_papers(conn, papers, path)
+                    in_batch += len(papers)
+                _record_file(conn, path, size, mtime_ns, content_hash)
+                if in_batch >= _WRITE_BATCH:
+                    conn.commit()
+                    in_batch = 0
+        conn.commit()
+    finally:
+        conn.rollback()
+        if fresh:
+            _resume_fts(conn)
+    return total
+
+
+_JSONL_BATCH = 2000
+
+
+def _head_hash(path: Path) -> str:
+    # Harvest files are append-only, so the first line identifies a file across appends;
+    # a different first line means it was rewritten and must be re-read from the start.
+    with path.open("rb") as f:
+        return _file_hash(f.readline())
+
+
+def _normalize_entry(row: dict) -> dict:
+    """Coerce a harvested entry to the parse_arxiv_atom shape (missing fields -> defaults)."""
+    out = {k: str(row.get(k) or "") for k in ("work_id", "title", "summary", "updated", "published")}
+    out["category"] = str(row.get("category") or CONFIG.arxiv_primary_category)
+    return out
+
+
+def _save_offset(conn: sqlite3.Connection, path: str, size: int, mtime_ns: int, head_hash: str, offset: int) -> None:
+    _record_file(conn, path, size, mtime_ns, head_hash)
+    conn.execute("UPDATE indexed_files SET byte_offset = ? WHERE path = ?", (offset, path))
+
+
+def index_jsonl_file(jsonl_file: Path, batch_size: int = _JSONL_BATCH, force: bool = False) -> int:
+    """Stream a harvested JSONL file (one parsed entry per line) into the index.
+
+    Reads line by line from the byte offset checkpointed in ``indexed_files`` and commits
+    every *batch_size* entries together with the new offset, so memory is bounded by the
+    batch and an interrupted run resumes where it stopped. A trailing partial line (a
+    harvester still writing) is left for the next run. Returns papers added or changed.
+    """
+    conn = writer()
+    path = str(jsonl_file)
+    st = jsonl_file.stat()
+    head_hash = _head_hash(jsonl_file)
+    prev = conn.execute(
+        "SELECT size, mtime_ns, content_hash, byte_offset FROM indexed_files WHERE path = ?", (path,)
+    ).fetchone()
+    offset = 0
+    if prev and not force and prev[2] == head_hash and prev[3] <= st.st_size:
+        if prev[:2] == (st.st_size, st.st_mtime_ns) and prev[3] == st.st_size:
+            return 0
+        offset = prev[3]
+
+    total = 0
+    batch: list[dict] = []
+    with jsonl_file.open("rb") as f:
+        f.seek(offset)
+        for line in iter(f.readline, b""):
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(row, dict) and row.get("work_id") and row.get("title"):
+                batch.append(_normalize_entry(row))
+            if len(batch) >= batch_size:
+                with conn:
+                    total += _write_papers(conn, batch, path)
+                    _save_offset(conn, path, st.st_size, st.st_mtime_ns, head_hash, offset)
+                batch = []
+    with conn:
+        total += _write_papers(conn, batch, path) if batch else 0
+        _save_offset(conn, path, st.st_size, st.st_mtime_ns, head_hash, offset)
+    return total
+
+
+def index_all_topic(force: bool = False) -> int:
+    """Index the bulk harvests under ``data/topic/`` (fetch_ag_all.py, fetch_ag_focus_10k.py)."""
+    topic_dir = Path(CONFIG.data_dir) / "topic"
+    if not topic_dir.exists():
+        return 0
+    return sum(index_jsonl_file(f, force=force) for f in sorted(topic_dir.glob("*.jsonl")))
+
+
+def index_all_raw(force: bool = False, workers: int = 1) -> int:
+    """Index every ``data/raw/arxiv_*.xml`` file.
+
+    With ``workers > 1`` a process pool parses/tags/chunks files while this process is
+    the single writer, committing in large batches.
+    """
     raw_dir = Path(CONFIG.data_dir) / "raw"
     if not raw_dir.exists():
         return 0
+    files = sorted(raw_dir.glob("arxiv_*.xml"))
+    if workers > 1:
+        return _index_files_parallel(files, workers, force)
     total = 0
-    for xml_file in sorted(raw_dir.glob("arxiv_*.xml")):
-        total += index_raw_file(xml_file)
+    for xml_file in files:
+        total += index_raw_file(xml_file, force=force)
     return total
+
+
+def recompress_index(vacuum: bool = True) -> dict:
+    """Re-encode the stored summary/text bodies for ``MATHFOUNDRY_STORE_COMPRESSION``.
+
+    With *vacuum* the database is compacted afterwards so the saving shows on disk; the
+    FTS tables are rebuilt after the VACUUM because it may renumber rowids.
+    """
+    conn = writer()
+    stats = recompress_texts(conn)
+    if vacuum:
+        conn.execute("VACUUM")
+        _resume_fts(conn)
+    stats["db_bytes"] = db_path().stat().st_size
+    return stats
@@ -0,0 +1,303 @@
+"""In-process BM25 engine over a compact, memory-mapped postings index.
+
+The index is built from the ``papers``/``passages`` tables (one document per passage,
+title + passage text) with the same tokenisation as ``retrieval._tokenize`` and written
+to ``data/index/bm25/`` as flat ``.npy`` arrays in CSR layout. Formula terms
+(``mathtext.formula_terms``) share the vocabulary as a separate field, prefixed ``$``:
+
+- ``offsets[t]:offsets[t+1]`` slices ``doc_ids``/``tfs`` for term ``t``;
+- per-passage vectors hold the BM25 length norm, the precomputed block + density boost,
+  the subarea tag bitmask and the owning work;
+- ``works.jsonl`` + ``work_offsets`` hold the result metadata.
+
+Documents passing the coverage gate are ranked by the coverage + boosts score blended with
+their BM25 score (``BM25_WEIGHT``). Arrays are opened with ``mmap_mode="r"`` so every uvicorn worker shares the same pages and
+queries never touch SQLite. Requires NumPy (``pip install -e .[bm25]``).
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import mmap
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter
+from pathlib import Path
+
+from .compression import decode_text
+from .config import CONFIG
+from .db import reader
+from .mathtext import formula_terms
+from .metrics import SEARCH_ROWS_PASSED, SEARCH_ROWS_SCANNED, span
+from .models import SearchRequest
+from .retrieval import _block_boost, _density_boost, _tokenize
+from .subareas import AG_SUBAREA_KEYWORDS, detect_ag_subareas
+
+try:  # optional dependency
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+K1 = 1.2
+MATH_PREFIX = "$"
+B = 0.75
+# Share of the final score taken by BM25 (normalised to the best candidate of the query);
+# the rest is the coverage + boosts score the SQLite backend ranks by.
+BM25_WEIGHT = 0.3
+_BLOCK_TYPES = ["paragraph", "theorem", "definition", "proof", "example"]
+_ARRAYS = ["offsets", "doc_ids", "tfs", "doc_norm", "doc_boost", "doc_tags", "doc_block", "doc_density", "doc_work", "work_offsets"]
+
+
+def bm25_dir() -> Path:
+    return Path(CONFIG.data_dir) / "index" / "bm25"
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("the bm25 backend requires numpy (pip install -e .[bm25])")
+
+
+def _iter_documents(conn: sqlite3.Connection | None):
+    if conn is None:
+        return iter(())
+    return conn.execute(
+        """
+        SELECT p.work_id, p.title, p.summary, p.category, p.ag_subareas, p.published, p.updated,
+               ps.text_lc, ps.block_type, ps.math_density, coalesce(ps.math_terms, p.math_terms)
+        FROM papers p
+        LEFT JOIN passages ps ON ps.work_id = p.work_id
+        ORDER BY p.work_id, ps.chunk_index
+        """
+    )
+
+
+def build_bm25_index(out_dir: Path | None = None) -> dict:
+    """Build the BM25 arrays from the SQLite index and atomically swap them into place."""
+    _require_numpy()
+    out_dir = out_dir or bm25_dir()
+    tag_bits = {tag: i for i, tag in enumerate(AG_SUBAREA_KEYWORDS)}
+    vocab: dict[str, int] = {}
+
+    post_term = array("I")
+    post_doc = array("I")
+    post_tf = array("I")
+    doc_len = array("f")
+    doc_boost = array("f")
+    doc_tags = array("H")
+    doc_block = array("B")
+    doc_density = array("f")
+    doc_work = array("I")
+    work_offsets = array("q", [0])
+
+    tmp_dir = out_dir.with_name(f"{out_dir.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    conn = reader()
+    last_work = None
+    n_docs = 0
+    with (tmp_dir / "works.jsonl").open("wb") as works:
+        for row in _iter_documents(conn):
+            work_id, title, summary, category, ag_subareas, published, updated, text, block, density, math = row
+            tags = [t for t in (ag_subareas or "").split(",") if t]
+            if work_id != last_work:
+                summary = decode_text(conn, summary)
+                title_math = [MATH_PREFIX + t for t in formula_terms(title)]
+                line = json.dumps(
+                    {
+                        "work_id": work_id,
+                        "title": title or "",
+                        "summary": (summary or "")[:500],
+                        "category": category,
+                        "published": published,
+                        "updated": updated,
+                        "ag_subareas": sorted(tags),
+                    },
+                    ensure_ascii=False,
+                ).encode("utf-8")
+                works.write(line + b"\n")
+                work_offsets.append(work_offsets[-1] + len(line) + 1)
+                last_work = work_id
+
+            block = (block or "paragraph").lower()
+            density = float(density or 0.0)
+            counts = Counter(_tokenize(f"{title or ''} {text if text is not None else summary or ''}"))
+            n_words = sum(counts.values())
+            # Without passages the paper's math_terms already cover the title.
+            counts.update(title_math if text is not None else ())
+            counts.update(MATH_PREFIX + t for t in (math or "").split())
+            for term, tf in counts.items():
+                tid = vocab.setdefault(term, len(vocab))
+                post_term.append(tid)
+                post_doc.append(n_docs)
+                post_tf.append(tf)
+            doc_len.append(float(n_words))
+            doc_boost.append(_block_boost(block) + _density_boost(density))
+            doc_tags.append(sum(1 << tag_bits[t] for t in tags if t in tag_bits))
+            doc_block.append(_BLOCK_TYPES.index(block) if block in _BLOCK_TYPES else 0)
+            doc_density.append(density)
+            doc_work.append(len(work_offsets) - 2)
+            n_docs += 1
+
+    terms = np.frombuffer(post_term, dtype=np.uint32)
+    order = np.argsort(terms, kind="stable")
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=len(vocab)), out=offsets[1:])
+    lengths = np.frombuffer(doc_len, dtype=np.float32)
+    avgdl = float(lengths.mean()) if n_docs else 0.0
+    arrays = {
+        "offsets": offsets,
+        "doc_ids": np.frombuffer(post_doc, dtype=np.uint32)[order],
+        "tfs": np.minimum(np.frombuffer(post_tf, dtype=np.uint32)[order], 65535).astype(np.uint16),
+        "doc_norm": (K1 * (1 - B + B * lengths / max(avgdl, 1e-9))).astype(np.float32),
+        "doc_boost": np.frombuffer(doc_boost, dtype=np.float32),
+        "doc_tags": np.frombuffer(doc_tags, dtype=np.uint16),
+        "doc_block": np.frombuffer(doc_block, dtype=np.uint8),
+        "doc_density": np.frombuffer(doc_density, dtype=np.float32),
+        "doc_work": np.frombuffer(doc_work, dtype=np.uint32),
+        "work_offsets": np.frombuffer(work_offsets, dtype=np.int64),
+    }
+    for name, arr in arrays.items():
+        np.save(tmp_dir / f"{name}.npy", arr)
+    (tmp_dir / "vocab.json").write_text(
+        json.dumps(sorted(vocab, key=vocab.__getitem__), ensure_ascii=False), encoding="utf-8"
+    )
+    manifest = {
+        "docs": n_docs,
+        "works": len(work_offsets) - 1,
+        "terms": len(vocab),
+        "postings": int(len(terms)),
+        "avgdl": round(avgdl, 4),
+        "k1": K1,
+        "b": B,
+        "tags": list(tag_bits),
+        "built_at": time.time(),
+    }
+    (tmp_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    # Swap directories; readers holding the old mmaps keep valid (unlinked) pages.
+    old_dir = out_dir.with_name(f"{out_dir.name}.old-{os.getpid()}")
+    if out_dir.exists():
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+class BM25Engine:
+    """Read-only view over a built BM25 index directory."""
+
+    def __init__(self, index_dir: Path):
+        _require_numpy()
+        self.index_dir = index_dir
+        self.manifest = json.loads((index_dir / "manifest.json").read_text(encoding="utf-8"))
+        terms = json.loads((index_dir / "vocab.json").read_text(encoding="utf-8"))
+        self.vocab = {t: i for i, t in enumerate(terms)}
+        for name in _ARRAYS:
+            setattr(self, name, np.load(index_dir / f"{name}.npy", mmap_mode="r"))
+        self.n_docs = int(self.manifest["docs"])
+        self.tag_bits = {tag: i for i, tag in enumerate(self.manifest["tags"])}
+        self._popcount = np.array([bin(i).count("1") for i in range(1 << len(self.tag_bits))], dtype=np.float32)
+        with (index_dir / "works.jsonl").open("rb") as f:
+            self._works = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def _work(self, idx: int) -> dict:
+        lo, hi = int(self.work_offsets[idx]), int(self.work_offsets[idx + 1])
+        return json.loads(self._works[lo:hi])
+
+    def search(self, req: SearchRequest) -> list[dict]:
+        with span("search.bm25"):
+            return self._search(req)
+
+    def _search(self, req: SearchRequest) -> list[dict]:
+        words = list(dict.fromkeys(_tokenize(req.query)))
+        maths = [MATH_PREFIX + t for t in formula_terms(req.query)]
+        if not (words or maths) or not self.n_docs:
+            return []
+
+        bm25 = np.zeros(self.n_docs, dtype=np.float32)
+        shares = []
+        for terms in (words, maths):
+            if not terms:
+                continue
+            hits = np.zeros(self.n_docs, dtype=np.uint16)
+            for term in terms:
+                tid = self.vocab.get(term)
+                if tid is None:
+                    continue
+                lo, hi = int(self.offsets[tid]), int(self.offsets[tid + 1])
+                docs = self.doc_ids[lo:hi]
+                tf = self.tfs[lo:hi].astype(np.float32)
+                idf = math.log(1.0 + (self.n_docs - (hi - lo) + 0.5) / ((hi - lo) + 0.5))
+                bm25[docs] += idf * tf * (K1 + 1) / (tf + self.doc_norm[docs])
+                hits[docs] += 1
+            shares.append(hits / len(terms))
+        # Same coverage (and gate: at least half) as the SQLite backend: the share of query
+        # words present, averaged with the share of formula terms when there are formulas.
+        coverage = sum(shares) / len(shares)
+
+        cand = np.flatnonzero(coverage >= 0.5)
+        SEARCH_ROWS_SCANNED.inc(int(np.count_nonzero(coverage)), backend="bm25")
+        SEARCH_ROWS_PASSED.inc(int(cand.size), backend="bm25")
+        if not cand.size:
+            return []
+
+        query_mask = sum(1 << self.tag_bits[t] for t in detect_ag_subareas(req.query) if t in self.tag_bits)
+        overlap = self._popcount[self.doc_tags[cand] & query_mask]
+        subarea = np.minimum(0.12, 0.05 * overlap)
+        heuristic = np.minimum(1.0, coverage[cand] + self.doc_boost[cand] + subarea)
+        relevance = bm25[cand] / max(float(bm25[cand].max()), 1e-9)
+        final = np.round((1.0 - BM25_WEIGHT) * heuristic + BM25_WEIGHT * relevance, 4)
+        order = cand[np.lexsort((-bm25[cand], -final))]
+        final_by_doc = dict(zip(cand.tolist(), final.tolist()))
+
+        out: list[dict] = []
+        seen: set[int] = set()
+        for doc in order.tolist():
+            work = int(self.doc_work[doc])
+            if work in seen:
+                continue
+            seen.add(work)
+            block = _BLOCK_TYPES[int(self.doc_block[doc])]
+            out.append(
+                {
+                    **self._work(work),
+                    "score": final_by_doc[doc],
+                    "source": "arxiv",
+                    "top_block_type": block,
+                    "math_density": round(float(self.doc_density[doc]), 4),
+                }
+            )
+            if len(out) >= max(1, req.limit):
+                break
+        return out
+
+
+_ENGINE: BM25Engine | None = None
+_ENGINE_STAMP: int | None = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def load_engine() -> BM25Engine | None:
+    """Return the shared engine, reopening it when the index was rebuilt; None if not built."""
+    global _ENGINE, _ENGINE_STAMP
+    manifest = bm25_dir() / "manifest.json"
+    try:
+        stamp = manifest.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _ENGINE is None or stamp != _ENGINE_STAMP or _ENGINE.index_dir != bm25_dir():
+        with _ENGINE_LOCK:
+            if _ENGINE is None or stamp != _ENGINE_STAMP or _ENGINE.index_dir != bm25_dir():
+                try:
+                    _ENGINE = BM25Engine(bm25_dir())
+                except FileNotFoundError:
+                    # Caught mid-swap by a concurrent rebuild; keep serving the old index.
+                    return _ENGINE
+                _ENGINE_STAMP = stamp
+    return _ENGINE
@@ -0,0 +1,286 @@
+"""LaTeX / Unicode-math normalisation shared by indexing and querying.
+
+Two views of a text come out of here:
+
+- ``normalise_text``: the text for the word field. Unicode math is rewritten as LaTeX
+  (``𝒪`` -> ``\\mathcal{O}``, ``≅`` -> ``\\cong``), formatting macros (``\\mathcal``,
+  ``\\operatorname``, ``\\left`` ...) are dropped and synonymous macros share one name
+  (``\\rightarrow`` -> ``\\to``, ``\\varphi`` -> ``\\phi``), so the word tokenizer sees
+  ``pic`` in ``\\operatorname{Pic}`` and ``omega`` in ``Ω``.
+- ``fold_text``: case and diacritic folding applied on top of ``normalise_text`` to the
+  stored search columns and to queries alike.
+- ``formula_terms``: the formula field. Each formula (``$...$``, ``\\(...\\)``,
+  ``\\[...\\]``, display environments, or a bare run such as ``H^1(X,\\mathcal{F})`` in
+  a query) is lexed into canonical atoms (``h sup 1 x calf``) whose 2- and 3-grams
+  (``h_sup_1``) plus multi-character atoms (``calf``, ``pic``, ``otimes``) become terms,
+  so ``H^{1}(X, \\mathscr F)``, ``H^1(X,\\mathcal{F})`` and ``H¹(X,ℱ)`` all index alike.
+
+Everything is precompiled at import and ASCII text without math takes a fast path, so
+both run over the whole corpus inside the index workers.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from functools import lru_cache
+from itertools import chain
+from typing import NamedTuple
+
+# Bump when the output of normalise_text / formula_terms / fold_text changes; the next
+# migration re-derives the stored search columns (indexing._backfill_search_columns).
+NORMALISE_VERSION = 2
+
+# Font macros: letter prefix for the styles that change meaning, "" for plain.
+_LETTER_FONTS = {
+    "mathcal": "cal", "mathscr": "cal", "cal": "cal", "scr": "cal", "euscript": "cal",
+    "mathbb": "bb", "bbb": "bb", "mathbbm": "bb", "bb": "bb",
+    "mathfrak": "frak", "frak": "frak", "eufrak": "frak",
+    "mathbf": "", "boldsymbol": "", "bm": "", "pmb": "", "bf": "", "mathnormal": "",
+}
+# Fonts whose argument is a word (an operator name or text), not a product of symbols.
+_WORD_FONTS = {"operatorname", "mathrm", "mathit", "mathsf", "mathtt", "rm", "it", "text", "textrm", "textit", "mbox"}
+# Spacing, sizing and delimiters-scaling macros carry no meaning.
+_DROPPED_MACROS = {
+    "left", "right", "middle", "big", "bigl", "bigr", "bigm", "bigg", "biggl", "biggr", "bigm",
+    "displaystyle", "textstyle", "scriptstyle", "limits", "nolimits", "quad", "qquad",
+    "label", "nonumber", "notag", "tag", "mathstrut", "phantom",
+}
+_ALIASES = {
+    "rightarrow": "to", "longrightarrow": "to", "xrightarrow": "to",
+    "mapsto": "mapsto", "longmapsto": "mapsto",
+    "leftarrow": "gets", "longleftarrow": "gets",
+    "hookrightarrow": "into", "lhook": "into", "twoheadrightarrow": "onto",
+    "le": "leq", "leqslant": "leq", "ge": "geq", "geqslant": "geq", "ne": "neq",
+    "varphi": "phi", "varepsilon": "epsilon", "vartheta": "theta", "varrho": "rho", "varpi": "pi",
+    "varsigma": "sigma", "varkappa": "kappa",
+    "bigotimes": "otimes", "bigoplus": "oplus", "bigcup": "cup", "bigcap": "cap", "bigsqcup": "sqcup",
+    "widetilde": "tilde", "widehat": "hat", "overline": "bar",
+    "varinjlim": "colim", "injlim": "colim", "varprojlim": "lim", "projlim": "lim",
+    "lvert": "vert", "rvert": "vert", "lbrace": "", "rbrace": "",
+}
+_OPERATORS = {
+    "^": "sup", "_": "sub", "=": "eq", "+": "plus", "-": "minus", "<": "lt", ">": "gt",
+    "/": "slash", "|": "vert", "*": "star", "'": "prime",
+}
+_STRUCTURAL = frozenset(_OPERATORS.values())
+
+_GREEK = {
+    "ALPHA", "BETA", "GAMMA", "DELTA", "EPSILON", "ZETA", "ETA", "THETA", "IOTA", "KAPPA", "LAMDA",
+    "MU", "NU", "XI", "OMICRON", "PI", "RHO", "SIGMA", "TAU", "UPSILON", "PHI", "CHI", "PSI", "OMEGA",
+}
+_DIGITS = {n: str(i) for i, n in enumerate(["ZERO", "ONE", "TWO", "THREE", "FOUR", "FIVE", "SIX", "SEVEN", "EIGHT", "NINE"])}
+_UNICODE_SYMBOLS = {
+    "→": r"\to ", "⟶": r"\to ", "↦": r"\mapsto ", "⟼": r"\mapsto ", "↪": r"\into ", "↠": r"\onto ",
+    "←": r"\gets ", "≤": r"\leq ", "≥": r"\geq ", "≠": r"\neq ", "≅": r"\cong ", "≃": r"\simeq ",
+    "∼": r"\sim ", "≈": r"\approx ", "≡": r"\equiv ", "⊗": r"\otimes ", "⊕": r"\oplus ", "⊠": r"\boxtimes ",
+    "×": r"\times ", "·": r"\cdot ", "∘": r"\circ ", "∪": r"\cup ", "∩": r"\cap ", "⊂": r"\subset ",
+    "⊆": r"\subseteq ", "∈": r"\in ", "∞": r"\infty ", "∂": r"\partial ", "∇": r"\nabla ", "∑": r"\sum ",
+    "∏": r"\prod ", "∐": r"\coprod ", "∫": r"\int ", "ℓ": r"\ell ", "′": "'", "−": "-", "∗": "*",
+    **{c: "^" + str(i) for i, c in enumerate("⁰¹²³⁴⁵⁶⁷⁸⁹")},
+    **{c: "_" + str(i) for i, c in enumerate("₀₁₂₃₄₅₆₇₈₉")},
+    "⁺": "^+", "⁻": "^-", "⁎": "^*",
+}
+_STYLE_FONTS = {"SCRIPT": "mathcal", "DOUBLE-STRUCK": "mathbb", "FRAKTUR": "mathfrak", "BLACK-LETTER": "mathfrak"}
+_STYLED_RE = re.compile(r"(?:MATHEMATICAL )?(?P<style>[A-Z\- ]*?) ?(?:(?P<case>CAPITAL|SMALL) |DIGIT )(?P<name>[A-Z]+)")
+
+
+def _unicode_table() -> dict[int, str]:
+    """codepoint -> LaTeX for styled letters/digits, Greek and the common math symbols."""
+    table = {ord(c): latex for c, latex in _UNICODE_SYMBOLS.items()}
+    for cp in chain(range(0x391, 0x3D7), range(0x3F0, 0x3F6), range(0x2100, 0x2150), range(0x1D400, 0x1D800)):
+        if cp in table:
+            continue
+        name = unicodedata.name(chr(cp), "")
+        if name.startswith("GREEK"):
+            base = name.split()[-1] if "LETTER" in name else name.split()[1]
+            if base in _GREEK:
+                table[cp] = "\\" + ("lambda" if base == "LAMDA" else base.lower()) + " "
+            continue
+        m = _STYLED_RE.fullmatch(name)
+        if m is None:
+            continue
+        style, letter = m["style"], m["name"]
+        if letter in _DIGITS and m["case"] is None:
+            table[cp] = _DIGITS[letter]
+        elif letter in _GREEK:
+            table[cp] = "\\" + ("lambda" if letter == "LAMDA" else letter.lower()) + " "
+        elif len(letter) == 1 and m["case"]:
+            letter = letter if m["case"] == "CAPITAL" else letter.lower()
+            font = next((f for s, f in _STYLE_FONTS.items() if s in style), None)
+            table[cp] = f"\\{font}{{{letter}}}" if font else letter
+    return table
+
+
+_UNICODE_TO_LATEX = _unicode_table()
+# str.translate looks every character up; most non-ASCII text (accents) needs nothing.
+_UNICODE_MATH_CHARS = frozenset(map(chr, _UNICODE_TO_LATEX))
+
+_MACRO_RE = re.compile(r"\\([A-Za-z]+)\*?")
+# Prose macros whose argument is a key, not math (dropped before looking for bare formulas).
+_PROSE_REF_RE = re.compile(r"\\(?:cite[tp]?|[cC]?ref|eqref|autoref|label|url|href|bibitem)\*?(?:\[[^\]]*\])?\{[^}]*\}")
+_DELIMITED_RE = re.compile(
+    r"\$\$(.+?)\$\$|\$(.+?)\$|\\\((.+?)\\\)|\\\[(.+?)\\\]"
+    r"|\\begin\{(equation|align|gather|multline|eqnarray|displaymath)(\*?)\}(.+?)\\end\{\5\6\}",
+    re.S,
+)
+# A bare formula: a whitespace-free chunk with a macro or ^/_ in it, plus following chunks
+# that are math too or single symbols (``\mathcal F``).
+_BARE_CHUNK = r"[^\s$]*(?:\\[A-Za-z]+|[\^_])[^\s$]*"
+_BARE_RE = re.compile(rf"{_BARE_CHUNK}(?:\s+(?:{_BARE_CHUNK}|[A-Za-z0-9](?![A-Za-z0-9])[^\s$]{{0,3}}))*")
+_MATH_SIGNAL_RE = re.compile(r"[$^_]|\\[A-Za-z(\[]")
+_LEX_RE = re.compile(r"\\([A-Za-z]+)\*?|\\.|([A-Za-z]+)|(\d+)|([{}])|([\^_=+\-<>/|*'])")
+
+
+def _normalise_macro(m: re.Match) -> str:
+    name = m[1].lower()
+    if name in _LETTER_FONTS or name in _WORD_FONTS or name in _DROPPED_MACROS:
+        return " "
+    alias = _ALIASES.get(name)
+    if alias is None:
+        return m[0]
+    return f"\\{alias} " if alias else " "
+
+
+def _to_latex(text: str) -> str:
+    if text.isascii() or _UNICODE_MATH_CHARS.isdisjoint(text):
+        return text
+    return text.translate(_UNICODE_TO_LATEX)
+
+
+def normalise_text(text: str | None) -> str:
+    """Canonical text for the word field (case is left to the caller)."""
+    if not text:
+        return ""
+    return _normalise(_to_latex(text))
+
+
+def fold_text(text: str) -> str:
+    """Lower-case *text* and strip diacritics (NFKD, combining marks dropped), as the FTS
+    ``remove_diacritics`` tokenizer does, so ``étale`` is searched and stored as ``etale``."""
+    if text.isascii():
+        return text.lower()
+    return "".join(c for c in unicodedata.normalize("NFKD", text.lower()) if not unicodedata.combining(c))
+
+
+def _normalise(text: str) -> str:
+    if "\\" in text:
+        text = _MACRO_RE.sub(_normalise_macro, text)
+    return text
+
+
+def _formula_spans(text: str) -> list[str]:
+    """Formula sources in *text* (already passed through ``_to_latex``)."""
+    if not _MATH_SIGNAL_RE.search(text):
+        return []
+    formulas: list[str] = []
+    rest = text
+    if "$" in text or "\\(" in text or "\\[" in text or "\\begin" in text:
+        outside = []
+        last = 0
+        for m in _DELIMITED_RE.finditer(text):
+            formulas.append(m[1] or m[2] or m[3] or m[4] or m[7] or "")
+            outside.append(text[last : m.start()])
+            last = m.end()
+        outside.append(text[last:])
+        rest = " ".join(outside)
+    if "\\" in rest or "^" in rest or "_" in rest:
+        rest = _PROSE_REF_RE.sub(" ", rest)
+        formulas.extend(m[0] for m in _BARE_RE.finditer(rest))
+    return formulas
+
+
+def formula_atoms(formula: str) -> list[str]:
+    """Canonical atoms of one formula, e.g. ``H^1(X,\\mathcal{F})`` -> h sup 1 x calf."""
+    atoms: list[str] = []
+    fonts: list[tuple[str, int]] = []  # (font, brace depth it closes at)
+    pending: str | None = None
+    depth = 0
+    for m in _LEX_RE.finditer(formula):
+        macro, letters, number, brace, op = m.groups()
+        font = fonts[-1][0] if fonts else ""
+        if brace == "{":
+            depth += 1
+            if pending is not None:
+                fonts.append((pending, depth))
+                pending = None
+            continue
+        if brace == "}":
+            if fonts and fonts[-1][1] == depth:
+                fonts.pop()
+            depth = max(0, depth - 1)
+            continue
+        if pending is not None:
+            font, pending = pending, None
+            if letters and font != "word":
+                # An unbraced font applies to the next symbol only: \mathcal FG = \mathcal{F}G.
+                atoms.append(font + letters[0].lower())
+                letters = letters[1:]
+                font = fonts[-1][0] if fonts else ""
+                if not letters:
+                    continue
+        if macro:
+            name = macro.lower()
+            if name in _LETTER_FONTS:
+                pending = _LETTER_FONTS[name]
+            elif name in _WORD_FONTS:
+                pending = "word"
+            elif name not in _DROPPED_MACROS:
+                alias = _ALIASES.get(name, name)
+                if alias:
+                    atoms.append(alias)
+        elif letters:
+            letters = letters.lower()
+            if font == "word" or len(letters) >= 3:
+                atoms.append(letters)  # Pic, Hom, Spec written without a macro
+            else:
+                atoms.extend(font + c for c in letters)
+        elif number:
+            atoms.append(number)
+        elif op:
+            atoms.append(_OPERATORS[op])
+    return atoms
+
+
+# Short formulas ($X$, $\mathcal{O}_X$, $\mathbb{P}^n$) recur across the corpus.
+@lru_cache(maxsize=65536)
+def _terms_of_formula(formula: str) -> tuple[str, ...]:
+    atoms = formula_atoms(formula)
+    terms = [a for a in atoms if len(a) > 1 and a not in _STRUCTURAL]
+    for size in (2, 3):
+        terms.extend("_".join(atoms[i : i + size]) for i in range(len(atoms) - size + 1))
+    return tuple(terms)
+
+
+def _nonspace(text: str) -> int:
+    return len(text) - text.count(" ") - text.count("\n")
+
+
+class TextAnalysis(NamedTuple):
+    normalised: str
+    terms: list[str]
+    density: float
+
+
+def analyse_text(text: str | None) -> TextAnalysis:
+    """``normalise_text``, ``formula_terms`` and ``math_density`` of *text* in one pass."""
+    if not text:
+        return TextAnalysis("", [], 0.0)
+    text = _to_latex(text)
+    formulas = _formula_spans(text)
+    terms = list(dict.fromkeys(t for f in formulas for t in _terms_of_formula(f)))
+    total = _nonspace(text)
+    density = round(min(1.0, sum(map(_nonspace, formulas)) / total), 4) if total > 0 else 0.0
+    return TextAnalysis(_normalise(text), terms, density)
+
+
+def formula_terms(text: str | None) -> list[str]:
+    """Distinct formula-field terms of *text*: atom 2-/3-grams plus multi-character atoms."""
+    if not text:
+        return []
+    return list(dict.fromkeys(t for f in _formula_spans(_to_latex(text)) for t in _terms_of_formula(f)))
+
+
+def math_density(text: str | None) -> float:
+    """Share of the non-space characters of *text* that sit inside formulas."""
+    return analyse_text(text).density
@@ -0,0 +1,148 @@
+"""In-process metrics: stage timing spans, counters and latency histograms.
+
+``span("search.fetch")`` times a block, observes it in the ``mathfoundry_stage_seconds``
+histogram and, while a request is being timed (``timed_request``), adds it to that request's
+breakdown for the optional ``X-MathFoundry-Timing`` header. ``render()`` produces the
+Prometheus text exposition format served on ``/metrics``.
+
+Metrics are per process; with several uvicorn workers scrape each one (or run one worker
+per container).
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Prometheus' default buckets, extended for multi-second LLM calls.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar("mathfoundry_request_timings", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_label_str(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series: dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            s = self.series.get(key)
+            if s is None:
+                s = self.series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, s in sorted(self.series.items()):
+            for bound, count in zip(self.buckets + (math.inf,), s[: len(self.buckets)] + [s[-1]]):
+                le = "+Inf" if bound == math.inf else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_label_str(key + (('le', le),))} {count}")
+            lines.append(f"{self.name}_sum{_label_str(key)} {s[-2]:.6f}")
+            lines.append(f"{self.name}_count{_label_str(key)} {s[-1]}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram("mathfoundry_request_seconds", "HTTP request latency by route.")
+STAGE_SECONDS = Histogram("mathfoundry_stage_seconds", "Latency of search / grounding / verification stages.")
+SEARCH_ROWS_SCANNED = Counter("mathfoundry_search_rows_scanned_total", "Candidate rows scored by search.")
+SEARCH_ROWS_PASSED = Counter(
+    "mathfoundry_search_rows_passed_total", "Candidate rows passing the query-coverage threshold."
+)
+LLM_TOKENS = Counter("mathfoundry_llm_tokens_total", "OpenAI tokens used, by kind (input/output).")
+LLM_REQUESTS = Counter("mathfoundry_llm_requests_total", "OpenAI Responses API calls, by outcome.")
+
+_REGISTRY = [REQUEST_SECONDS, STAGE_SECONDS, SEARCH_ROWS_SCANNED, SEARCH_ROWS_PASSED, LLM_TOKENS, LLM_REQUESTS]
+
+
+def observe_stage(stage: str, elapsed: float) -> None:
+    """Record *elapsed* seconds for *stage* (histogram + current request's breakdown)."""
+    STAGE_SECONDS.observe(elapsed, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block as *stage*."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - t0)
+
+
+@contextmanager
+def timed_request():
+    """Collect the spans of the current request; yields the stage -> seconds dict."""
+    timings: dict[str, float] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def timing_header(timings: dict[str, float], total: float) -> str:
+    """Server-Timing style value: ``stage;dur=<ms>, ..., total;dur=<ms>``."""
+    parts = [f"{stage};dur={sec * 1000:.2f}" for stage, sec in timings.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def record_llm_usage(data: dict) -> None:
+    """Count tokens from a Responses API ``usage`` block, if present."""
+    usage = data.get("usage") or {}
+    for kind in ("input", "output"):
+        n = usage.get(f"{kind}_tokens")
+        if n:
+            LLM_TOKENS.inc(n, kind=kind)
+
+
+def render() -> str:
+    lines: list[str] = []
+    with _lock:
+        for metric in _REGISTRY:
+            lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
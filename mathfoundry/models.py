@@ -26,14 +26,28 @@ class SearchRequest(BaseModel):
     limit: int = 10
 
 
+class SearchBatchRequest(BaseModel):
+    queries: list[SearchRequest] = Field(max_length=500)
+
+
 class QARequest(BaseModel):
     query: str
 
 
+class QABatchRequest(BaseModel):
+    queries: list[QARequest] = Field(max_length=500)
+
+
 class VerifyRequest(BaseModel):
     answer: GroundedAnswer
 
 
+class VerifyBatchRequest(BaseModel):
+    answers: list[GroundedAnswer] = Field(max_length=500)
+    # Shared reference set for every answer; each answer's own references when omitted.
+    reference_ids: list[str] | None = None
+
+
 class VerifyResponse(BaseModel):
     ok: bool
     verified_claims: int
@@ -0,0 +1,177 @@
+"""Shared, pooled HTTP clients for the OpenAI Responses API.
+
+One keep-alive ``httpx.Client`` (sync callers, eval scripts) and one ``httpx.AsyncClient``
+(async endpoints) per process, so requests reuse TCP/TLS connections to
+``CONFIG.openai_base_url``. The app lifespan closes them on shutdown. Requests are retried
+with exponential backoff on transport errors, 429 and 5xx (honouring ``Retry-After``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import threading
+import time
+from collections.abc import AsyncIterator
+
+import httpx
+
+from .config import CONFIG
+from .metrics import LLM_REQUESTS, record_llm_usage
+
+_RETRY_BASE_SEC = 0.5
+_RETRY_MAX_SEC = 20.0
+
+_client: httpx.Client | None = None
+_async_client: httpx.AsyncClient | None = None
+_lock = threading.Lock()
+
+
+def _client_kwargs() -> dict:
+    return {
+        "base_url": CONFIG.openai_base_url.rstrip("/"),
+        "headers": {
+            "Authorization": f"Bearer {CONFIG.openai_api_key}",
+            "Content-Type": "application/json",
+        },
+        "timeout": httpx.Timeout(connect=10.0, read=CONFIG.openai_read_timeout_sec, write=30.0, pool=10.0),
+        "limits": httpx.Limits(
+            max_connections=CONFIG.openai_max_connections,
+            max_keepalive_connections=CONFIG.openai_max_keepalive,
+            keepalive_expiry=60.0,
+        ),
+    }
+
+
+def get_client() -> httpx.Client:
+    global _client
+    with _lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(**_client_kwargs())
+        return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    with _lock:
+        if _async_client is None or _async_client.is_closed:
+            _async_client = httpx.AsyncClient(**_client_kwargs())
+        return _async_client
+
+
+async def aclose_clients() -> None:
+    """Close both pooled clients (app shutdown)."""
+    global _client, _async_client
+    with _lock:
+        client, async_client = _client, _async_client
+        _client = _async_client = None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.aclose()
+
+
+def _retry_delay(attempt: int, response: httpx.Response | None) -> float:
+    if response is not None:
+        try:
+            return min(_RETRY_MAX_SEC, float(response.headers["retry-after"]))
+        except (KeyError, ValueError):
+            pass
+    return min(_RETRY_MAX_SEC, _RETRY_BASE_SEC * 2**attempt) * random.uniform(0.8, 1.2)
+
+
+def _should_retry(response: httpx.Response) -> bool:
+    return response.status_code == 429 or 500 <= response.status_code <= 599
+
+
+def post_responses(payload: dict, client: httpx.Client | None = None) -> dict:
+    """POST /responses on the shared client, retrying transient failures."""
+    client = client or get_client()
+    for attempt in range(CONFIG.openai_max_retries + 1):
+        response = None
+        try:
+            response = client.post("/responses", json=payload)
+        except httpx.TransportError:
+            if attempt == CONFIG.openai_max_retries:
+                raise
+        else:
+            if not _should_retry(response) or attempt == CONFIG.openai_max_retries:
+                response.raise_for_status()
+                data = response.json()
+                LLM_REQUESTS.inc(outcome="ok")
+                record_llm_usage(data)
+                return data
+        LLM_REQUESTS.inc(outcome="retry")
+        time.sleep(_retry_delay(attempt, response))
+    raise AssertionError("unreachable")
+
+
+async def apost_responses(payload: dict, client: httpx.AsyncClient | None = None) -> dict:
+    """Async ``post_responses`` on the shared AsyncClient."""
+    client = client or get_async_client()
+    for attempt in range(CONFIG.openai_max_retries + 1):
+        response = None
+        try:
+            response = await client.post("/responses", json=payload)
+        except httpx.TransportError:
+            if attempt == CONFIG.openai_max_retries:
+                raise
+        else:
+            if not _should_retry(response) or attempt == CONFIG.openai_max_retries:
+                response.raise_for_status()
+                data = response.json()
+                LLM_REQUESTS.inc(outcome="ok")
+                record_llm_usage(data)
+                return data
+        LLM_REQUESTS.inc(outcome="retry")
+        await asyncio.sleep(_retry_delay(attempt, response))
+    raise AssertionError("unreachable")
+
+
+async def astream_responses(payload: dict, client: httpx.AsyncClient | None = None) -> AsyncIterator[str]:
+    """Stream a Responses API call, yielding output_text deltas as they arrive.
+
+    Connection errors, 429 and 5xx are retried like ``apost_responses`` until the first
+    delta has been yielded; after that a failure propagates to the caller.
+    """
+    client = client or get_async_client()
+    payload = {**payload, "stream": True}
+    started = False
+    for attempt in range(CONFIG.openai_max_retries + 1):
+        response = None
+        try:
+            async with client.stream("POST", "/responses", json=payload) as response:
+                if not _should_retry(response) or attempt == CONFIG.openai_max_retries:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            return
+                        event = json.loads(data)
+                        if event.get("type") == "response.output_text.delta":
+                            started = True
+                            yield event.get("delta", "")
+                        elif event.get("type") == "response.completed":
+                            LLM_REQUESTS.inc(outcome="ok")
+                            record_llm_usage(event.get("response") or {})
+                        elif event.get("type") in {"error", "response.failed"}:
+                            raise RuntimeError(f"stream failed: {event}")
+                    return
+        except httpx.TransportError:
+            if started or attempt == CONFIG.openai_max_retries:
+                raise
+        LLM_REQUESTS.inc(outcome="retry")
+        await asyncio.sleep(_retry_delay(attempt, response))
+
+
+def output_text(data: dict) -> str:
+    """Extract the first output_text block of a Responses API payload."""
+    # output -> [message] -> content -> [output_text] -> text
+    for msg in data.get("output", []):
+        for block in msg.get("content", []):
+            if block.get("type") == "output_text":
+                return block.get("text", "")
+    return ""
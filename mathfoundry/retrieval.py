@@ -1,19 +1,32 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import re
 import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
 
-from .indexing import db_path
+from .cache import LRUCache, SqliteCache
+from .compression import decode_text
+from .config import CONFIG
+from .db import db_path, reader
+from .indexing import index_generation
+from .mathtext import fold_text, formula_terms, normalise_text
+from .metrics import SEARCH_ROWS_PASSED, SEARCH_ROWS_SCANNED, span
 from .models import SearchRequest
 from .subareas import detect_ag_subareas
 
 
 def _tokenize(text: str) -> list[str]:
-    return [t for t in re.findall(r"[a-zA-Z0-9*\-]+", text.lower()) if len(t) >= 2]
+    """Word-field tokens, after the LaTeX / Unicode-math normalisation of ``mathtext`` and the
+    same case and diacritic folding as the stored ``*_lc`` columns (``étale`` -> ``etale``)."""
+    return [t for t in re.findall(r"[a-zA-Z0-9*\-]+", fold_text(normalise_text(text))) if len(t) >= 2]
 
 
-def _score(text: str, tokens: list[str]) -> float:
-    hay = text.lower()
+def _coverage(hay: str, tokens: list[str]) -> float:
+    """Fraction of *tokens* occurring in the already lower-cased *hay*."""
     if not tokens:
         return 0.0
     hits = 0
@@ -23,94 +36,441 @@ def _score(text: str, tokens: list[str]) -> float:
     return hits / len(tokens)
 
 
-def _search_sqlite(req: SearchRequest) -> list[dict]:
-    path = db_path()
-    if not path.exists():
-        return []
+# Math-aware boosts: theorem/definition/proof-like passages, denser symbolic text and
+# subarea overlap with the query. Shared by every search backend.
+def _block_boost(block: str) -> float:
+    if block in {"theorem", "definition", "proof"}:
+        return 0.12
+    if block == "example":
+        return 0.05
+    return 0.0
+
+
+# Density is the share of non-space characters inside formulas (mathtext.analyse_text):
+# about 0.15-0.25 for a typical math abstract, so the cap is left to formula-heavy text.
+def _density_boost(density: float) -> float:
+    return min(0.15, density * 0.4)
+
+
+def _subarea_boost(overlap: int) -> float:
+    return min(0.12, 0.05 * overlap) if overlap > 0 else 0.0
+
+
+# Upper bound on FTS hits pulled per table before Python-side scoring; keeps per-request
+# work independent of corpus size.
+_FTS_CANDIDATES = 300
+
+
+def _fts_match_expr(tokens: list[str]) -> str:
+    """Build an FTS5 MATCH expression: OR of prefix phrases, one per distinct query token."""
+    phrases = []
+    for t in dict.fromkeys(tokens):
+        words = re.findall(r"[a-z0-9]+", t)
+        if words:
+            phrases.append('"' + " ".join(words) + '"*')
+    return " OR ".join(phrases)
+
+
+def _substring_match_expr(tokens: list[str]) -> str:
+    """MATCH expression over the trigram tables: per query token, all trigrams of its words.
+
+    Finds a token anywhere inside a word (``morphism`` in ``isomorphisms``). Words shorter
+    than three characters have no trigram and are left to the prefix match.
+    """
+    groups = []
+    for t in dict.fromkeys(tokens):
+        grams = [w[i : i + 3] for w in re.findall(r"[a-z0-9]{3,}", t) for i in range(len(w) - 2)]
+        if grams:
+            groups.append("(" + " AND ".join(f'"{g}"' for g in dict.fromkeys(grams)) + ")")
+    return " OR ".join(groups)
+
+
+def _math_match_expr(terms: list[str]) -> str:
+    """MATCH expression over the formula FTS tables (terms are ``[a-z0-9_]+``)."""
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+# Candidate arms: the word FTS tables (:match), the trigram tables for substring hits
+# (:sub) and, for queries with formulas, the formula FTS tables (:math), so formula
+# queries are answered from an index too.
+_HITS_ARM = """
+  SELECT * FROM (
+    SELECT {alias}.work_id, bm25({fts}{weights}) AS rank
+    FROM {fts} JOIN {table} {alias} ON {alias}.rowid = {fts}.rowid
+    WHERE {fts} MATCH {param}
+    ORDER BY bm25({fts}{weights}) LIMIT :n
+  )"""
+
+
+def _hits_sql(words: bool = True, math: bool = False, substrings: bool = False) -> str:
+    arms = []
+    if words:
+        arms.append(_HITS_ARM.format(alias="ps", fts="passages_fts", table="passages", weights="", param=":match"))
+        arms.append(_HITS_ARM.format(alias="p", fts="papers_fts", table="papers", weights=", 2.0, 1.0", param=":match"))
+    if substrings:
+        arms.append(_HITS_ARM.format(alias="ps", fts="passages_sub_fts", table="passages", weights="", param=":sub"))
+        arms.append(_HITS_ARM.format(alias="p", fts="papers_sub_fts", table="papers", weights="", param=":sub"))
+    if math:
+        arms.append(_HITS_ARM.format(alias="ps", fts="passages_math_fts", table="passages", weights="", param=":math"))
+        arms.append(_HITS_ARM.format(alias="p", fts="papers_math_fts", table="papers", weights="", param=":math"))
+    return "SELECT work_id, MIN(rank) AS rank FROM (" + "\n  UNION ALL".join(arms) + "\n)\nGROUP BY work_id"
 
-    tokens = _tokenize(req.query)
-    if not tokens:
-        return []
 
-    conn = sqlite3.connect(path)
-    conn.row_factory = sqlite3.Row
-    query_tags = set(detect_ag_subareas(req.query))
+# Candidate scoring, entirely in SQLite over the precomputed lower-cased columns: query
+# coverage per (paper, passage) row (title/summary matched once per work), the math-aware boosts (mirroring _block_boost,
+# _density_boost and _subarea_boost), then the best row per work by window function.
+# Coverage is the share of query words found, or with formulas in the query the mean of
+# that and the share of its formula terms found in math_terms (_coverage_score).
+# Only the top :k works come back, with the scan/pass counts riding along on each row.
+# Query tokens, formula terms and tags are bound as :t0.. / :m0.. / :g0.., so the
+# statement text (and its cached prepared statement) depends only on how many there are.
+_SCORE_SQL = """
+WITH hits AS ({hits}),
+works AS MATERIALIZED (
+  SELECT h.work_id, h.rank, {paper_hits}, {overlap} AS overlap
+  FROM hits h JOIN papers p ON p.work_id = h.work_id
+),
+rows AS (
+  SELECT w.work_id, w.rank, w.overlap,
+         coalesce(nullif(lower(ps.block_type), ''), 'paragraph') AS block_type,
+         coalesce(ps.math_density, 0.0) AS math_density,
+         {coverage} AS coverage
+  FROM works w
+  LEFT JOIN passages ps ON ps.work_id = w.work_id
+),
+scored AS (
+  SELECT work_id, rank, block_type, math_density, coverage >= 0.5 AS passed,
+         round(min(1.0, coverage
+           + (CASE WHEN block_type IN ('theorem', 'definition', 'proof') THEN 0.12
+                   WHEN block_type = 'example' THEN 0.05 ELSE 0.0 END
+              + min(0.15, math_density * 0.4))
+           + CASE WHEN overlap > 0 THEN min(0.12, 0.05 * overlap) ELSE 0.0 END), 4) AS score
+  FROM rows
+),
+best AS (
+  SELECT *,
+         row_number() OVER (PARTITION BY work_id ORDER BY passed DESC, score DESC) AS rn,
+         count(*) OVER () AS scanned,
+         sum(passed) OVER () AS n_passed
+  FROM scored
+)
+SELECT work_id, score, block_type, math_density, passed, scanned, n_passed
+FROM best
+WHERE rn = 1
+ORDER BY passed DESC, score DESC, rank, work_id
+LIMIT :k
+"""
 
+
+@lru_cache(maxsize=64)
+def _score_sql(n_tokens: int, n_tags: int, n_math: int = 0, substrings: bool = False) -> str:
+    paper_hits = [f"(instr(p.title_lc, :t{i}) OR instr(p.summary_lc, :t{i})) AS h{i}" for i in range(n_tokens)]
+    paper_hits += [f"instr(coalesce(p.math_terms, ''), :m{i}) AS mh{i}" for i in range(n_math)]
+    shares = []
+    if n_tokens:
+        found = " + ".join(f"(w.h{i} OR instr(coalesce(ps.text_lc, ''), :t{i}))" for i in range(n_tokens))
+        shares.append(f"({found}) * 1.0 / {n_tokens}")
+    if n_math:
+        found = " + ".join(f"(w.mh{i} OR instr(coalesce(ps.math_terms, ''), :m{i}))" for i in range(n_math))
+        shares.append(f"({found}) * 1.0 / {n_math}")
+    overlap = " + ".join(
+        f"(instr(',' || coalesce(p.ag_subareas, '') || ',', :g{i}) > 0)" for i in range(n_tags)
+    )
+    return _SCORE_SQL.format(
+        hits=_hits_sql(words=n_tokens > 0, math=n_math > 0, substrings=substrings),
+        paper_hits=", ".join(paper_hits),
+        coverage="(" + " + ".join(shares) + f") / {len(shares)}.0",
+        overlap=overlap or "0",
+    )
+
+
+_META_SQL = """
+SELECT work_id, title,
+       CASE WHEN typeof(summary) = 'blob' THEN summary ELSE substr(summary, 1, 500) END AS summary,
+       category, ag_subareas, published, updated
+FROM papers
+WHERE work_id IN (SELECT value FROM json_each(:ids))
+"""
+
+
+def _search_sqlite_many(reqs: list[SearchRequest]) -> list[list[dict]]:
+    """Score a batch of queries against one read snapshot.
+
+    Ranking happens in SQLite (``_SCORE_SQL``); Python only receives the top-k works per
+    query and then fetches their display fields once for the whole batch.
+    """
+    conn = reader()
+    tokens = [_tokenize(r.query) for r in reqs]
+    maths = [formula_terms(r.query) for r in reqs]
+    matches = [_fts_match_expr(t) for t in tokens]
+    subs = [_substring_match_expr(t) for t in tokens]
+    if conn is None or not any(matches) and not any(maths):
+        return [[] for _ in reqs]
+
+    top: list[list] = [[] for _ in reqs]
+    meta: dict[str, dict] = {}
+    scanned = passed = 0
+    conn.execute("BEGIN")  # one snapshot for the whole batch
     try:
-        rows = conn.execute(
-            """
-            SELECT p.work_id, p.title, p.summary, p.category, p.ag_subareas, p.published, p.updated,
-                   ps.text AS passage_text, ps.block_type, ps.math_density
-            FROM papers p
-            LEFT JOIN passages ps ON ps.work_id = p.work_id
-            ORDER BY p.updated DESC
-            LIMIT 3000
-            """
-        ).fetchall()
+        with span("search.score"):
+            for i, (req, match) in enumerate(zip(reqs, matches)):
+                if not match and not maths[i]:
+                    continue
+                tags = detect_ag_subareas(req.query)
+                params = {"match": match, "n": max(_FTS_CANDIDATES, req.limit * 30), "k": max(1, req.limit)}
+                params["math"] = _math_match_expr(maths[i])
+                params["sub"] = subs[i]
+                params.update({f"t{j}": t for j, t in enumerate(tokens[i])})
+                params.update({f"m{j}": f" {m} " for j, m in enumerate(maths[i])})
+                params.update({f"g{j}": f",{g}," for j, g in enumerate(tags)})
+                sql = _score_sql(len(tokens[i]) if match else 0, len(tags), len(maths[i]), bool(match and subs[i]))
+                rows = conn.execute(sql, params).fetchall()
+                if rows:
+                    scanned += rows[0]["scanned"]
+                    passed += rows[0]["n_passed"]
+                top[i] = [r for r in rows if r["passed"]]
+        works = sorted({r["work_id"] for rows in top for r in rows})
+        if works:
+            with span("search.fetch"):
+                meta = _fetch_meta(conn, works)
     except sqlite3.OperationalError:
-        rows = conn.execute(
-            """
-            SELECT p.work_id, p.title, p.summary, p.category, '' AS ag_subareas, p.published, p.updated,
-                   ps.text AS passage_text, ps.block_type, ps.math_density
-            FROM papers p
-            LEFT JOIN passages ps ON ps.work_id = p.work_id
-            ORDER BY p.updated DESC
-            LIMIT 3000
-            """
-        ).fetchall()
-    conn.close()
-
-    best_by_work: dict[str, dict] = {}
-    for r in rows:
-        work_id = r["work_id"]
-        title = r["title"] or ""
-        summary = r["summary"] or ""
-        ptext = r["passage_text"] or ""
-        block = (r["block_type"] or "paragraph").lower()
-        density = float(r["math_density"] or 0.0)
-        row_tags = set([t for t in (r["ag_subareas"] or "").split(",") if t])
-
-        text_score = _score(f"{title} {summary} {ptext}", tokens)
-        if text_score < 0.5:
-            continue
-
-        # Math-aware boost: theorem/definition/proof-like passages and denser symbolic text.
-        block_boost = 0.0
-        if block in {"theorem", "definition", "proof"}:
-            block_boost = 0.12
-        elif block == "example":
-            block_boost = 0.05
-
-        density_boost = min(0.15, density * 0.8)
-        subarea_boost = 0.0
-        if query_tags and row_tags:
-            overlap = len(query_tags & row_tags)
-            if overlap > 0:
-                subarea_boost = min(0.12, 0.05 * overlap)
-
-        final = min(1.0, text_score + block_boost + density_boost + subarea_boost)
-
-        current = best_by_work.get(work_id)
-        candidate = {
-            "work_id": work_id,
-            "title": title,
-            "summary": summary[:500],
-            "category": r["category"],
-            "published": r["published"],
-            "updated": r["updated"],
-            "ag_subareas": sorted(row_tags),
-            "score": round(final, 4),
-            "source": "arxiv",
-            "top_block_type": block,
-            "math_density": round(density, 4),
+        # Index predates the FTS tables; the next build_lexical_index run migrates it.
+        top = [[] for _ in reqs]
+    finally:
+        conn.rollback()
+    SEARCH_ROWS_SCANNED.inc(scanned, backend="sqlite")
+    SEARCH_ROWS_PASSED.inc(passed, backend="sqlite")
+
+    return [[_result(meta[r["work_id"]], r["block_type"], r["math_density"], r["score"]) for r in rows] for rows in top]
+
+
+def _fetch_meta(conn: sqlite3.Connection, work_ids: list[str]) -> dict[str, dict]:
+    """Display fields of *work_ids*; only these (top-k) summaries are ever decompressed."""
+    out = {}
+    for m in conn.execute(_META_SQL, {"ids": json.dumps(work_ids)}):
+        row = dict(m)
+        row["summary"] = (decode_text(conn, row["summary"]) or "")[:500]
+        out[row["work_id"]] = row
+    return out
+
+
+def _result(meta: dict, block_type: str, density: float, score: float) -> dict:
+    """A search result from a ``_fetch_meta`` row and its best-scoring passage."""
+    return {
+        "work_id": meta["work_id"],
+        "title": meta["title"] or "",
+        "summary": meta["summary"] or "",
+        "category": meta["category"],
+        "published": meta["published"],
+        "updated": meta["updated"],
+        "ag_subareas": sorted(t for t in (meta["ag_subareas"] or "").split(",") if t),
+        "source": "arxiv",
+        "top_block_type": block_type,
+        "math_density": round(float(density or 0.0), 4),
+        "score": score,
+    }
+
+
+def _search_sqlite(req: SearchRequest) -> list[dict]:
+    return _search_sqlite_many([req])[0]
+
+
+# ---------------------------------------------------------------------------
+# Hybrid retrieval: reciprocal rank fusion with the dense index
+# ---------------------------------------------------------------------------
+
+_RRF_K = 60
+# Lexical results / dense works ranked per list before fusion.
+_FUSION_POOL = 20
+
+_PASSAGES_SQL = """
+SELECT passage_id, coalesce(nullif(lower(block_type), ''), 'paragraph') AS block_type, math_density
+FROM passages
+WHERE passage_id IN (SELECT value FROM json_each(:ids))
+"""
+
+
+def _dense_engine():
+    if not CONFIG.dense_enabled:
+        return None
+    from .dense import load_dense_engine
+
+    return load_dense_engine()
+
+
+def _dense_results(hits: list[tuple[str, str, float]]) -> dict[str, dict]:
+    """Result dicts for the works of dense passage *hits* (best passage per work)."""
+    best: dict[str, tuple[str, float]] = {}
+    for passage_id, work_id, sim in hits:
+        best.setdefault(work_id, (passage_id, sim))
+    conn = reader()
+    if conn is None or not best:
+        return {}
+    with span("search.fetch"):
+        meta = _fetch_meta(conn, list(best))
+        passages = {
+            r["passage_id"]: r
+            for r in conn.execute(_PASSAGES_SQL, {"ids": json.dumps([p for p, _ in best.values()])})
         }
-        if current is None or candidate["score"] > current["score"]:
-            best_by_work[work_id] = candidate
+    out = {}
+    for work_id, (passage_id, sim) in best.items():
+        if work_id in meta and passage_id in passages:
+            ps = passages[passage_id]
+            out[work_id] = _result(meta[work_id], ps["block_type"], ps["math_density"], sim)
+    return out
+
+
+def _fuse(req: SearchRequest, lexical: list[dict], dense: dict[str, dict]) -> list[dict]:
+    """Reciprocal rank fusion of the lexical and dense rankings, one entry per work.
+
+    Works found lexically keep their lexical result (and ``score``); dense-only works carry
+    their cosine similarity as ``score``. ``fusion_score`` is the RRF sum that orders them.
+    """
+    fused: dict[str, float] = {}
+    for ranking in (lexical, list(dense.values())):
+        for rank, r in enumerate(ranking, start=1):
+            fused[r["work_id"]] = fused.get(r["work_id"], 0.0) + 1.0 / (_RRF_K + rank)
+    by_work = {**dense, **{r["work_id"]: r for r in lexical}}
+    order = sorted(fused, key=lambda w: (-fused[w], -by_work[w]["score"], w))
+    return [
+        {**by_work[w], "fusion_score": round(fused[w], 6), "dense_score": dense[w]["score"] if w in dense else None}
+        for w in order[: max(1, req.limit)]
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Result cache
+# ---------------------------------------------------------------------------
+
+_memory_cache: LRUCache | None = None
+_disk_cache: SqliteCache | None = None
+_cache_lock = threading.Lock()
+
+
+def _caches() -> tuple[LRUCache | None, SqliteCache | None]:
+    """The in-process LRU and, if enabled, the shared on-disk cache under ``data/cache/``."""
+    global _memory_cache, _disk_cache
+    if not CONFIG.search_cache_enabled:
+        return None, None
+    with _cache_lock:
+        if _memory_cache is None or _memory_cache.max_entries != CONFIG.search_cache_max_entries:
+            _memory_cache = LRUCache(CONFIG.search_cache_max_entries)
+        if CONFIG.search_cache_disk:
+            path = Path(CONFIG.data_dir) / "cache" / "search.db"
+            if _disk_cache is None or _disk_cache.path != path:
+                _disk_cache = SqliteCache(path, max_entries=CONFIG.search_cache_max_entries * 8, ttl_sec=86400)
+        return _memory_cache, _disk_cache if CONFIG.search_cache_disk else None
+
+
+def _index_stamp() -> str | None:
+    """Identify the index contents: file identity plus its generation counter.
+
+    None while there is no index, in which case nothing is cached.
+    """
+    stamp = None
+    if CONFIG.search_backend == "bm25":
+        from .lexical import load_engine
+
+        if load_engine() is not None:
+            from . import lexical
 
-    scored = sorted(best_by_work.values(), key=lambda x: x["score"], reverse=True)
-    return scored[: max(1, req.limit)]
+            stamp = f"bm25:{lexical._ENGINE_STAMP}"
+    if stamp is None:
+        conn = reader()
+        if conn is None:
+            return None
+        path = db_path()
+        stamp = f"sqlite:{path.resolve()}:{path.stat().st_ino}:{index_generation(conn)}"
+    if _dense_engine() is not None:
+        from . import dense
+
+        stamp += f"|dense:{dense._ENGINE_STAMP}"
+    return stamp
+
+
+def _cache_key(stamp: str, req: SearchRequest) -> str:
+    """Order-insensitive key: sorted query tokens and formula terms, query subarea tags,
+    limit and index stamp."""
+    tokens = sorted(_tokenize(req.query))
+    maths = sorted(formula_terms(req.query))
+    tags = sorted(detect_ag_subareas(req.query))
+    raw = json.dumps([stamp, tokens, maths, tags, max(1, req.limit)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str, memory: LRUCache, disk: SqliteCache | None) -> list[dict] | None:
+    hit = memory.get(key)
+    if hit is None and disk is not None:
+        hit = disk.get(key)
+        if hit is not None:
+            memory.set(key, hit)
+    return None if hit is None else [dict(r) for r in hit]
+
+
+def _cache_set(key: str, results: list[dict], memory: LRUCache, disk: SqliteCache | None) -> None:
+    memory.set(key, [dict(r) for r in results])
+    if disk is not None:
+        disk.set(key, results)
+
+
+def search_cache_stats() -> dict:
+    if not CONFIG.search_cache_enabled:
+        return {"enabled": False}
+    stats: dict = {"enabled": True}
+    stats["memory"] = _memory_cache.stats() if _memory_cache is not None else {"entries": 0, "hits": 0, "misses": 0}
+    if CONFIG.search_cache_disk and _disk_cache is not None:
+        stats["disk"] = _disk_cache.stats()
+    return stats
+
+
+def _search_uncached(reqs: list[SearchRequest]) -> list[list[dict]]:
+    engine = _dense_engine()
+    if engine is None:
+        return _search_lexical(reqs)
+    pool = [SearchRequest(query=r.query, limit=max(r.limit, _FUSION_POOL)) for r in reqs]
+    out = []
+    for req, lexical in zip(reqs, _search_lexical(pool)):
+        hits = engine.search(req.query, _FUSION_POOL * 3)
+        out.append(_fuse(req, lexical, _dense_results(hits)))
+    return out
+
+
+def _search_lexical(reqs: list[SearchRequest]) -> list[list[dict]]:
+    if CONFIG.search_backend == "bm25":
+        from .lexical import load_engine
+
+        engine = load_engine()
+        if engine is not None:
+            return [engine.search(r) for r in reqs]
+    return _search_sqlite_many(reqs)
 
 
 def search(req: SearchRequest) -> list[dict]:
-    """Search the local SQLite index. Returns empty list when index has no matches."""
-    return _search_sqlite(req)
+    """Search the local index. Returns empty list when index has no matches.
+
+    Uses the SQLite FTS index unless ``MATHFOUNDRY_SEARCH_BACKEND=bm25`` and a BM25
+    index has been built (falls back to SQLite while it is missing). With
+    ``MATHFOUNDRY_DENSE=1`` and a built dense index, lexical and embedding rankings are
+    merged by reciprocal rank fusion (see ``mathfoundry.dense``). Ranked results are
+    cached per index generation, so a re-index never serves stale results.
+    """
+    return search_many([req])[0]
+
+
+def search_many(reqs: list[SearchRequest]) -> list[list[dict]]:
+    """Batch ``search``: one result list per request, in order."""
+    memory, disk = _caches()
+    stamp = _index_stamp() if memory is not None else None
+    if memory is None or stamp is None:
+        return _search_uncached(reqs)
+
+    with span("search.cache"):
+        keys = [_cache_key(stamp, r) for r in reqs]
+        out: list[list[dict] | None] = [_cache_get(k, memory, disk) for k in keys]
+    missing = [i for i, hit in enumerate(out) if hit is None]
+    if missing:
+        fresh = _search_uncached([reqs[i] for i in missing])
+        for i, results in zip(missing, fresh):
+            _cache_set(keys[i], results, memory, disk)
+            out[i] = results
+    return out  # type: ignore[return-value]
@@ -0,0 +1,148 @@
+const q = document.getElementById('q');
+const answer = document.getElementById('answer');
+const searchBox = document.getElementById('search');
+const preset = document.getElementById('preset');
+let presetQueries = [];
+
+function esc(s){return (s||'').replace(/[&<>"']/g,m=>({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'}[m]));}
+
+async function loadPresets(){
+  try {
+    const r = await fetch('/presets');
+    const j = await r.json();
+    presetQueries = j.queries || [];
+    preset.innerHTML = '';
+    for (const query of presetQueries){
+      const opt = document.createElement('option');
+      opt.value = query;
+      opt.textContent = query;
+      preset.appendChild(opt);
+    }
+    if (!presetQueries.length){
+      preset.innerHTML = '<option>No presets found</option>';
+    }
+  } catch (e) {
+    preset.innerHTML = '<option>Failed to load presets</option>';
+  }
+}
+
+function loadSelectedPreset(){
+  const selected = preset.value || '';
+  if (selected) q.value = selected;
+}
+
+function loadRandomPreset(){
+  if (!presetQueries.length) return;
+  const idx = Math.floor(Math.random() * presetQueries.length);
+  q.value = presetQueries[idx];
+}
+
+function refList(refs){
+  return refs.map((x,idx)=>`<li>[${idx+1}] ${esc(x.title||x.work_id||'unknown')} <span class="small">${esc(x.work_id||'')}</span></li>`).join('');
+}
+
+function claimItem(c, idx, verified){
+  const badge = verified === undefined ? '' : `<span class="badge">${verified ? 'verified' : 'unverified'}</span>`;
+  return `<li><b>Claim ${idx+1}:</b> ${esc(c.text)}${badge}<br><span class="small">Citations: ${(c.supporting_citations||[]).map(x=>`<code>${esc(x.work_id)}</code>`).join(' ')||'none'}</span></li>`;
+}
+
+// Best-effort decode of the answer_summary string from the partial model JSON.
+function partialSummary(text){
+  const m = text.match(/"answer_summary"\s*:\s*"((?:[^"\\]|\\.)*)/);
+  if(!m) return '';
+  try { return JSON.parse('"' + m[1].replace(/\\$/, '') + '"'); } catch (e) { return m[1]; }
+}
+
+function renderAnswer(j){
+  const claims = (j.claims||[]).map((c,idx)=>claimItem(c, idx)).join('');
+  const verify = j.verification || {};
+  answer.innerHTML = `
+    <h3>Answer <span class="badge">${esc(j.confidence||'unknown')}</span></h3>
+    <p>${esc(j.answer_summary||'')}</p>
+    <div class="small">Verification: ok=${verify.ok} | coverage=${verify.coverage_ratio} | suggested=${verify.suggested_confidence} | abstain=${verify.must_abstain}</div>
+    <h4>Claims</h4>
+    <ul>${claims || '<li>No claims</li>'}</ul>
+    <h4>References</h4>
+    <ul>${refList(j.references||[]) || '<li>No references</li>'}</ul>
+    <h4>Limitations</h4>
+    <ul>${(j.limitations||[]).map(x=>`<li>${esc(x)}</li>`).join('') || '<li>None</li>'}</ul>
+  `;
+}
+
+async function ask(){
+  const query = q.value.trim();
+  if(!query) return;
+  answer.style.display='block';
+  answer.innerHTML='Retrieving...';
+  const r = await fetch('/qa/stream',{method:'POST',headers:{'content-type':'application/json'},body:JSON.stringify({query})});
+  if(!r.ok || !r.body){ answer.innerHTML='Request failed.'; return; }
+
+  let draft = '';
+  const claims = [];
+  const handlers = {
+    candidates(j){
+      answer.innerHTML = `
+        <h3>Answer <span class="badge">generating...</span></h3>
+        <p id="draft" class="muted">Waiting for the model...</p>
+        <h4>Claims</h4>
+        <ul id="claims"></ul>
+        <h4>Candidates (${j.count||0})</h4>
+        <ul>${refList(j.results||[]) || '<li>No candidates</li>'}</ul>
+      `;
+    },
+    token(j){
+      draft += j.text;
+      const s = partialSummary(draft);
+      if(s) document.getElementById('draft').textContent = s;
+    },
+    claim(j){
+      claims[j.index] = j;
+      document.getElementById('claims').innerHTML = claims.map(c=>c ? claimItem(c.claim, c.index, c.verified) : '').join('');
+    },
+    reset(){
+      // The final answer replaced the streamed claims; its claims follow.
+      claims.length = 0;
+      document.getElementById('claims').innerHTML = '';
+    },
+    final: renderAnswer,
+  };
+
+  // Server-sent events over fetch: blocks separated by a blank line, "event:" + "data:" lines.
+  const reader = r.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = '';
+  while(true){
+    const {value, done} = await reader.read();
+    if(done) break;
+    buf += decoder.decode(value, {stream: true});
+    let sep;
+    while((sep = buf.indexOf('\n\n')) >= 0){
+      const block = buf.slice(0, sep);
+      buf = buf.slice(sep + 2);
+      let event = 'message', data = '';
+      for(const line of block.split('\n')){
+        if(line.startsWith('event:')) event = line.slice(6).trim();
+        else if(line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if(handlers[event] && data) handlers[event](JSON.parse(data));
+    }
+  }
+}
+
+async function runSearch(){
+  const query = q.value.trim();
+  if(!query) return;
+  searchBox.style.display='block';
+  searchBox.innerHTML='Searching...';
+  const r = await fetch('/search',{method:'POST',headers:{'content-type':'application/json'},body:JSON.stringify({query,limit:10})});
+  const j = await r.json();
+  const rows = (j.results||[]).map((x,idx)=>`<li>[${idx+1}] ${esc(x.title)} <span class="small">${esc(x.work_id)} | score=${x.score} | block=${esc(x.top_block_type||'n/a')} | density=${x.math_density ?? 'n/a'}</span></li>`).join('');
+  searchBox.innerHTML = `<h3>Search results (${j.count||0})</h3><ul>${rows || '<li>No results</li>'}</ul>`;
+}
+
+document.getElementById('askBtn').addEventListener('click', ask);
+document.getElementById('searchBtn').addEventListener('click', runSearch);
+document.getElementById('loadPresetBtn').addEventListener('click', loadSelectedPreset);
+document.getElementById('randomPresetBtn').addEventListener('click', loadRandomPreset);
+
+loadPresets();
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import re
+from collections.abc import Iterable
 
 AG_SUBAREA_KEYWORDS: dict[str, list[str]] = {
     "birational_geometry_mmp": ["birational", "minimal model", "mmp", "log canonical", "klt", "flip", "fano"],
@@ -16,18 +17,79 @@ AG_SUBAREA_KEYWORDS: dict[str, list[str]] = {
 }
 
 
-def _normalize(text: str) -> str:
-    text = text.lower()
-    text = re.sub(r"\s+", " ", text)
+def _trie_pattern(words: list[str]) -> str:
+    """Regex alternation of *words* factored into a prefix trie, so the engine tests each
+    input position against shared prefixes instead of every keyword in turn."""
+    trie: dict = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        optional = "" in node
+        branches = [(r"\s+" if ch == " " else re.escape(ch)) + build(node[ch]) for ch in sorted(node) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if optional else body
+
+    return build(trie)
+
+
+def _build_matcher() -> tuple[re.Pattern[str], dict[str, list[str]]]:
+    """One word-boundary regex over every keyword, compiled at import time.
+
+    Matching is greedy, so "derived category" wins over "derived"; a plural "s"/"es" is
+    allowed ("stacks", "fans") but a keyword never matches inside a word ("git" in "digit",
+    "fan" in "infant"). Because a match consumes its text, each keyword also credits the
+    shorter keywords it contains ("stability condition" -> "stability").
+    """
+    keywords = sorted({kw for kws in AG_SUBAREA_KEYWORDS.values() for kw in kws})
+    pattern = re.compile(rf"\b{_trie_pattern(keywords)}(?:e?s)?\b")
+
+    inner = {kw: re.compile(rf"\b{re.escape(kw)}\b") for kw in keywords}
+    contains = {kw: [other for other in keywords if inner[other].search(kw)] for kw in keywords}
+    return pattern, contains
+
+
+_MATCHER, _CONTAINS = _build_matcher()
+_KEYWORD_TAGS: dict[str, list[str]] = {}
+for _tag, _kws in AG_SUBAREA_KEYWORDS.items():
+    for _kw in _kws:
+        _KEYWORD_TAGS.setdefault(_kw, []).append(_tag)
+
+
+def _canonical(match: str) -> str:
+    text = " ".join(match.split())
+    if text in _CONTAINS:
+        return text
+    for suffix in ("es", "s"):
+        if text.endswith(suffix) and text[: -len(suffix)] in _CONTAINS:
+            return text[: -len(suffix)]
     return text
 
 
+def score_ag_subareas(text: str) -> dict[str, int]:
+    """Number of distinct keywords of each tag found in *text* (single regex scan)."""
+    found: set[str] = set()
+    for match in set(_MATCHER.findall(text.lower())):
+        found.update(_CONTAINS.get(match) or _CONTAINS.get(_canonical(match), ()))
+    scores: dict[str, int] = {}
+    for kw in found:
+        for tag in _KEYWORD_TAGS[kw]:
+            scores[tag] = scores.get(tag, 0) + 1
+    return scores
+
+
 def detect_ag_subareas(text: str, max_tags: int = 3) -> list[str]:
-    t = _normalize(text)
-    scored: list[tuple[str, int]] = []
-    for tag, kws in AG_SUBAREA_KEYWORDS.items():
-        score = sum(1 for kw in kws if kw in t)
-        if score > 0:
-            scored.append((tag, score))
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return [tag for tag, _ in scored[:max_tags]]
+    scores = score_ag_subareas(text)
+    # Ties keep AG_SUBAREA_KEYWORDS order.
+    ranked = sorted((tag for tag in AG_SUBAREA_KEYWORDS if tag in scores), key=lambda t: scores[t], reverse=True)
+    return ranked[:max_tags]
+
+
+def detect_ag_subareas_many(texts: Iterable[str], max_tags: int = 3) -> list[list[str]]:
+    """Batch ``detect_ag_subareas`` for the indexer."""
+    return [detect_ag_subareas(t, max_tags) for t in texts]
@@ -0,0 +1,189 @@
+"""Startup warm-up and the readiness state behind ``/ready``.
+
+The lifespan hook runs ``warm_up()`` in a worker thread once migrations are done, so the
+process accepts connections (and ``/health`` answers) at once while ``/ready`` returns
+503 until the first search no longer pays for cold caches:
+
+1. ``sqlite``: every page the ranking query touches (the FTS5 index b-trees, the
+   lower-cased and formula columns of ``papers``/``passages`` and their keys) is read once,
+   pulling it into the OS page cache the readers' mmap shares;
+2. ``engines``: the BM25 and dense indexes (and the embedding model) are loaded when
+   configured, and their arrays are touched page by page;
+3. ``search``: one probe query through the configured backend, which also fills the
+   tokenizer and formula caches;
+4. ``assets``: the frontend bundle and presets are read, hashed and compressed;
+5. ``llm``: the LLM client module (kept out of the import path for ``/health``) is
+   imported when an API key is configured, so the first ``/qa`` does not pay for it.
+
+Steps run in that order until ``MATHFOUNDRY_WARMUP_BUDGET_SEC`` is spent (a table scan
+still running then is interrupted); anything left loads on first use, as it would with
+``MATHFOUNDRY_WARMUP=0``. A failing step is logged and recorded, never fatal.
+"""
+
+from __future__ import annotations
+
+import importlib
+import logging
+import sqlite3
+import threading
+import time
+
+from .config import CONFIG
+from .db import reader
+
+logger = logging.getLogger(__name__)
+
+_PROBE_QUERY = "cohomology of coherent sheaves on a projective variety"
+# SQLite VM instructions between deadline checks while a scan runs.
+_PROGRESS_STEPS = 10_000
+
+_lock = threading.Lock()
+_state: dict = {"ready": False, "state": "pending", "steps": {}, "seconds": None}
+
+
+def readiness() -> dict:
+    with _lock:
+        return {**_state, "steps": dict(_state["steps"])}
+
+
+def _set(**changes) -> None:
+    with _lock:
+        _state.update(changes)
+
+
+def _record(step: str, outcome: str | float) -> None:
+    with _lock:
+        _state["steps"][step] = outcome
+
+
+def reset() -> None:
+    """Back to not ready (tests, or before re-running ``warm_up``)."""
+    _set(ready=False, state="pending", steps={}, seconds=None)
+
+
+def mark_ready(state: str = "skipped") -> None:
+    _set(ready=True, state=state)
+
+
+# ---------------------------------------------------------------------------
+# Steps
+# ---------------------------------------------------------------------------
+
+
+def _sqlite_scans() -> list[str]:
+    from .indexing import _FTS_TABLES
+
+    # Each reads every page of one b-tree, overflow pages included, without decoding the
+    # compressed bodies. Smallest and hottest first: the FTS indexes serve every query.
+    # (length() of a BLOB is answered from the record header, hence the cast.)
+    scans = [f"SELECT sum(length(CAST(block AS TEXT))) FROM {name}_data" for name in _FTS_TABLES]
+    scans += [f"SELECT count(*) FROM {name}_idx" for name in _FTS_TABLES]
+    scans += [
+        "SELECT count(*) FROM (SELECT work_id FROM papers ORDER BY work_id)",
+        "SELECT count(*) FROM (SELECT work_id FROM passages ORDER BY work_id)",
+        "SELECT sum(length(title_lc) + length(summary_lc) + length(math_terms) + length(ag_subareas)) FROM papers",
+        "SELECT sum(length(text_lc) + length(math_terms) + length(block_type)) FROM passages",
+    ]
+    return scans
+
+
+def _warm_sqlite(deadline: float) -> str | None:
+    conn = reader()
+    if conn is None:
+        return "missing"
+    conn.set_progress_handler(lambda: time.monotonic() > deadline, _PROGRESS_STEPS)
+    try:
+        for sql in _sqlite_scans():
+            try:
+                conn.execute(sql).fetchone()
+            except sqlite3.OperationalError as exc:
+                if time.monotonic() > deadline:
+                    return "budget"
+                # Index built before this table/column existed; warm what is there.
+                logger.debug("warm-up scan skipped (%s): %s", exc, sql)
+    finally:
+        conn.set_progress_handler(None, 0)
+    return None
+
+
+def _touch(array) -> None:
+    """Read one element per page of a memory-mapped array."""
+    flat = array.reshape(-1)
+    if flat.size:
+        flat[:: max(1, 4096 // flat.itemsize)].sum()
+
+
+def _warm_engines(deadline: float) -> str | None:
+    loaded = []
+    if CONFIG.search_backend == "bm25":
+        from .lexical import _ARRAYS, load_engine
+
+        engine = load_engine()
+        if engine is not None:
+            for name in _ARRAYS:
+                _touch(getattr(engine, name))
+            loaded.append("bm25")
+    if CONFIG.dense_enabled:
+        from .dense import load_dense_engine
+
+        engine = load_dense_engine()
+        if engine is not None:
+            _touch(engine.vectors)
+            loaded.append("dense")
+    return None if loaded else "none"
+
+
+def _warm_search(deadline: float) -> str | None:
+    from .models import SearchRequest
+    from .retrieval import _search_uncached
+
+    # Uncached, so the probe neither needs nor pollutes the result cache.
+    _search_uncached([SearchRequest(query=_PROBE_QUERY, limit=10)])
+    return None
+
+
+def _warm_assets(deadline: float) -> str | None:
+    from .assets import bundle
+    from .web import _presets_asset
+
+    bundle()
+    _presets_asset()
+    return None
+
+
+def _warm_llm(deadline: float) -> str | None:
+    if not CONFIG.openai_api_key:
+        return "none"
+    importlib.import_module(f"{__package__}.openai_client")
+    return None
+
+
+_STEPS = (
+    ("sqlite", _warm_sqlite),
+    ("engines", _warm_engines),
+    ("search", _warm_search),
+    ("assets", _warm_assets),
+    ("llm", _warm_llm),
+)
+
+
+def warm_up(budget_sec: float | None = None) -> dict:
+    """Run the warm-up steps, then report ready. Returns the readiness state."""
+    budget = CONFIG.warmup_budget_sec if budget_sec is None else budget_sec
+    t0 = time.monotonic()
+    deadline = t0 + budget
+    _set(ready=False, state="warming", steps={}, seconds=None)
+    for name, step in _STEPS:
+        if time.monotonic() > deadline:
+            _record(name, "budget")
+            continue
+        started = time.perf_counter()
+        try:
+            outcome = step(deadline)
+        except Exception as exc:  # a cold first request beats a pod that never turns ready
+            logger.warning("warm-up step %s failed: %s", name, exc)
+            outcome = f"error: {type(exc).__name__}"
+        _record(name, outcome or round(time.perf_counter() - started, 4))
+    _set(ready=True, state="ready", seconds=round(time.monotonic() - t0, 4))
+    logger.info("warm-up finished in %.2fs: %s", time.monotonic() - t0, readiness()["steps"])
+    return readiness()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""Indexing and search benchmark on synthetic math.AG corpora.
+
+For each corpus size this generates Atom feeds shaped like the ArXiv export (titles and
+abstracts drawn from algebraic-geometry vocabulary, with a little TeX), indexes them with
+``index_all_raw`` and measures:
+
+- indexing throughput (papers/s) and on-disk index size;
+- ``/search`` throughput and p50/p95/p99 latency through the FastAPI app;
+- recall@k / hit@k on ``eval/benchmark/ag_queries_in_corpus_v1.jsonl``: a few target papers
+  per query are planted in the corpus and must come back in the top k;
+- peak RSS of the indexing/search process (and of index worker processes).
+
+Each size runs in a fresh subprocess so RSS and caches are per size. Results are written as
+JSON (``--out``) for comparison across commits:
+
+    python scripts/bench_corpus.py --sizes 10k,100k --workers 4 --out bench/results.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+ROOT = Path(__file__).resolve().parents[1]
+RECALL_QUERIES = ROOT / "eval" / "benchmark" / "ag_queries_in_corpus_v1.jsonl"
+ENTRIES_PER_FILE = 5000
+TARGETS_PER_QUERY = 3
+RECALL_KS = (1, 5, 10)
+
+_VOCAB = [
+    "birational", "minimal model", "log canonical", "klt", "flip", "Fano", "moduli", "stack",
+    "stable map", "Hilbert scheme", "Quot scheme", "derived category", "triangulated",
+    "t-structure", "stability condition", "Diophantine", "number field", "height", "L-function",
+    "Galois representation", "étale cohomology", "sheaf", "de Rham", "crystalline", "perverse sheaf",
+    "singularity", "resolution", "multiplier ideal", "Gromov-Witten", "enumerative", "intersection",
+    "Donaldson-Thomas", "curve counting", "abelian variety", "K3 surface", "Calabi-Yau",
+    "hyperkähler", "toric variety", "polytope", "tropical curve", "geometric invariant theory",
+    "quotient", "vector bundle", "Picard group", "line bundle", "divisor", "scheme", "morphism",
+    "projective variety", "coherent sheaf", "Hodge structure", "motive", "Chow group",
+]
+_FILLER = [
+    "we prove", "we show that", "as a consequence", "in particular", "this generalises",
+    "under mild hypotheses", "for smooth projective", "over an algebraically closed field",
+    "in positive characteristic", "we construct", "we compute", "an explicit description of",
+]
+_TEX = [r"$\mathcal{O}_X$", r"$H^i(X, \mathcal{F})$", r"$D^b(X)$", r"$\overline{M}_{g,n}$", r"$K_X + \Delta$"]
+_STOPWORDS = {
+    "what", "is", "the", "and", "why", "it", "in", "of", "for", "to", "a", "an", "on", "with",
+    "how", "are", "do", "does", "explain", "role", "versus", "compare", "typical", "use", "cases",
+    "key", "references", "around", "important", "papers", "books", "aimed", "at", "emphasis",
+    "give", "main", "between", "their", "its", "which", "that", "useful",
+}
+
+_ATOM_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">\n'
+    "  <opensearch:totalResults>{total}</opensearch:totalResults>\n"
+)
+_ATOM_ENTRY = (
+    "  <entry>\n"
+    "    <id>http://arxiv.org/abs/{arxiv_id}</id>\n"
+    "    <updated>{date}</updated>\n    <published>{date}</published>\n"
+    "    <title>{title}</title>\n    <summary>{summary}</summary>\n"
+    '    <category term="math.AG" scheme="http://arxiv.org/schemas/atom"/>\n'
+    "  </entry>\n"
+)
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * mult)
+
+
+def _query_terms(query: str) -> list[str]:
+    from mathfoundry.retrieval import _tokenize
+
+    return [t for t in dict.fromkeys(_tokenize(query)) if t not in _STOPWORDS]
+
+
+def _synthetic_paper(rng: random.Random) -> tuple[str, str]:
+    title = " ".join(rng.sample(_VOCAB, 3)).capitalize()
+    sentences = []
+    for _ in range(rng.randint(4, 8)):
+        words = [rng.choice(_FILLER)] + rng.sample(_VOCAB, rng.randint(2, 5))
+        if rng.random() < 0.4:
+            words.append(rng.choice(_TEX))
+        sentences.append(" ".join(words) + ".")
+    return title, " ".join(sentences)
+
+
+def _planted_papers(queries: list[dict], rng: random.Random) -> tuple[list[tuple[str, str, str]], dict]:
+    """Target papers built from each query's content words; returns (papers, relevant ids)."""
+    papers, relevant = [], {}
+    for qi, q in enumerate(queries):
+        terms = _query_terms(q["query"])
+        ids = []
+        for j in range(TARGETS_PER_QUERY):
+            arxiv_id = f"9999.{qi:03d}{j:02d}v1"
+            title = " ".join(rng.sample(terms, max(1, len(terms) - j))) if terms else q["query"]
+            summary = f"{rng.choice(_FILLER)} {' '.join(terms)}. " + _synthetic_paper(rng)[1]
+            papers.append((arxiv_id, title, summary))
+            ids.append(f"arxiv:{arxiv_id}")
+        relevant[q["id"]] = ids
+    return papers, relevant
+
+
+def generate_corpus(raw_dir: Path, size: int, queries: list[dict], seed: int = 0) -> dict:
+    """Write ``size`` synthetic papers (plus planted targets) as ``arxiv_synth_*.xml``."""
+    rng = random.Random(seed)
+    planted, relevant = _planted_papers(queries, rng)
+    raw_dir.mkdir(parents=True, exist_ok=True)
+
+    def entries():
+        for arxiv_id, title, summary in planted:
+            yield arxiv_id, title, summary
+        for n in range(size):
+            title, summary = _synthetic_paper(rng)
+            yield f"{1000 + n // 100_000}.{n % 100_000:05d}v1", title, summary
+
+    file_no, batch = 0, []
+
+    def flush():
+        nonlocal file_no, batch
+        if batch:
+            body = "".join(batch)
+            (raw_dir / f"arxiv_synth_{file_no:05d}.xml").write_text(
+                _ATOM_HEAD.format(total=len(batch)) + body + "</feed>\n", encoding="utf-8"
+            )
+            file_no += 1
+            batch = []
+
+    for i, (arxiv_id, title, summary) in enumerate(entries()):
+        date = f"20{10 + i % 15:02d}-{1 + i % 12:02d}-01T00:00:00Z"
+        batch.append(_ATOM_ENTRY.format(arxiv_id=arxiv_id, date=date, title=escape(title), summary=escape(summary)))
+        if len(batch) >= ENTRIES_PER_FILE:
+            flush()
+    flush()
+    return relevant
+
+
+def _percentiles(samples_ms: list[float]) -> dict:
+    q = statistics.quantiles(samples_ms, n=100, method="inclusive")
+    return {"p50_ms": round(q[49], 3), "p95_ms": round(q[94], 3), "p99_ms": round(q[98], 3)}
+
+
+def _rss_mb(who: int) -> float:
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)  # ru_maxrss is KiB on Linux
+
+
+def bench_search(queries: list[str], requests: int, concurrency: int, limit: int) -> dict:
+    from fastapi.testclient import TestClient
+
+    from mathfoundry.app import app
+
+    latencies: list[float] = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker(client):
+        local = []
+        for i in counter:
+            t0 = time.perf_counter()
+            r = client.post("/search", json={"query": queries[i % len(queries)], "limit": limit})
+            r.raise_for_status()
+            local.append((time.perf_counter() - t0) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    # One app lifespan for the whole run; its shutdown closes every pooled connection.
+    with TestClient(app) as client:
+        for query in queries[:20]:  # warm-up
+            client.post("/search", json={"query": query, "limit": limit})
+        threads = [threading.Thread(target=worker, args=(client,)) for _ in range(max(1, concurrency))]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    elapsed = time.perf_counter() - t0
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "throughput_qps": round(len(latencies) / elapsed, 2),
+        **_percentiles(latencies),
+    }
+
+
+def bench_recall(queries: list[dict], relevant: dict) -> dict:
+    from mathfoundry.models import SearchRequest
+    from mathfoundry.retrieval import search
+
+    recall = {k: [] for k in RECALL_KS}
+    hit = {k: [] for k in RECALL_KS}
+    for q in queries:
+        got = [r["work_id"] for r in search(SearchRequest(query=q["query"], limit=max(RECALL_KS)))]
+        targets = set(relevant[q["id"]])
+        for k in RECALL_KS:
+            found = len(targets & set(got[:k]))
+            recall[k].append(found / len(targets))
+            hit[k].append(1.0 if found else 0.0)
+    out = {}
+    for k in RECALL_KS:
+        out[f"recall@{k}"] = round(statistics.mean(recall[k]), 4)
+        out[f"hit@{k}"] = round(statistics.mean(hit[k]), 4)
+    return out
+
+
+def run_one(size: int, args: argparse.Namespace) -> dict:
+    """Benchmark a single corpus size in this process (``MATHFOUNDRY_DATA_DIR`` already set)."""
+    from mathfoundry.arxiv import dir_size_bytes
+    from mathfoundry.config import CONFIG
+    from mathfoundry.indexing import index_all_raw
+    from mathfoundry.io_utils import load_jsonl
+
+    data_dir = Path(CONFIG.data_dir)
+    recall_queries = load_jsonl(RECALL_QUERIES)
+    t0 = time.perf_counter()
+    relevant = generate_corpus(data_dir / "raw", size, recall_queries, seed=args.seed)
+    generate_sec = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    indexed = index_all_raw(workers=args.workers)
+    index_sec = time.perf_counter() - t0
+    result = {
+        "size": size,
+        "papers_indexed": indexed,
+        "generate_sec": round(generate_sec, 2),
+        "index": {
+            "workers": args.workers,
+            "seconds": round(index_sec, 2),
+            "papers_per_sec": round(indexed / index_sec, 1) if index_sec else None,
+            "raw_bytes": dir_size_bytes(data_dir / "raw"),
+            "db_bytes": dir_size_bytes(data_dir / "index"),
+            "peak_rss_mb": _rss_mb(resource.RUSAGE_SELF),
+            "peak_worker_rss_mb": _rss_mb(resource.RUSAGE_CHILDREN),
+        },
+    }
+    if CONFIG.search_backend == "bm25":
+        from mathfoundry.lexical import build_bm25_index
+
+        t0 = time.perf_counter()
+        build_bm25_index()
+        result["index"]["bm25_build_sec"] = round(time.perf_counter() - t0, 2)
+        result["index"]["db_bytes"] = dir_size_bytes(data_dir / "index")
+
+    rng = random.Random(args.seed + 1)
+    load_queries = [q["query"] for q in recall_queries] + [
+        " ".join(rng.sample(_VOCAB, rng.randint(1, 3))) for _ in range(200)
+    ]
+    result["search"] = bench_search(load_queries, args.requests, args.concurrency, args.limit)
+    result["recall"] = bench_recall(recall_queries, relevant)
+    result["peak_rss_mb"] = _rss_mb(resource.RUSAGE_SELF)
+    return result
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Benchmark indexing and /search on synthetic math.AG corpora")
+    p.add_argument("--sizes", default="10k,100k,1M", help="comma-separated corpus sizes (k/M suffixes)")
+    p.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="index_all_raw workers")
+    p.add_argument("--requests", type=int, default=2000, help="/search requests per size")
+    p.add_argument("--concurrency", type=int, default=8, help="concurrent /search clients")
+    p.add_argument("--limit", type=int, default=10)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--backend", choices=["sqlite", "bm25"], default=os.getenv("MATHFOUNDRY_SEARCH_BACKEND", "sqlite"))
+    p.add_argument("--workdir", default=None, help="keep corpora/indexes here instead of a temp dir")
+    p.add_argument("--out", default=None, help="write the JSON report here (stdout otherwise)")
+    p.add_argument("--one", type=int, default=None, help=argparse.SUPPRESS)  # child mode
+    args = p.parse_args()
+
+    if args.one is not None:
+        print(json.dumps(run_one(args.one, args)))
+        return
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "backend": args.backend,
+        "results": [],
+    }
+    base = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="mathfoundry-bench-"))
+    try:
+        for size in [parse_size(s) for s in args.sizes.split(",") if s.strip()]:
+            data_dir = base / f"corpus_{size}"
+            shutil.rmtree(data_dir, ignore_errors=True)
+            env = {**os.environ, "MATHFOUNDRY_DATA_DIR": str(data_dir), "MATHFOUNDRY_SEARCH_BACKEND": args.backend}
+            cmd = [sys.executable, __file__, "--one", str(size)] + [
+                f"--{k}={getattr(args, k)}" for k in ("workers", "requests", "concurrency", "limit", "seed")
+            ]
+            print(f"[bench] size={size} data_dir={data_dir}", file=sys.stderr)
+            out = subprocess.run(cmd, env=env, check=True, stdout=subprocess.PIPE, text=True, cwd=ROOT)
+            report["results"].append(json.loads(out.stdout.strip().splitlines()[-1]))
+            if not args.workdir:
+                shutil.rmtree(data_dir, ignore_errors=True)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(base, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
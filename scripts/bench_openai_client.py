@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Compare per-call vs pooled OpenAI clients against a local Responses API stub.
+
+The stub answers ``POST /v1/responses`` with a fixed payload after ``--latency-ms`` and
+sleeps ``--handshake-ms`` once per new connection, standing in for the TCP + TLS setup a
+fresh ``httpx.Client`` pays against api.openai.com. Prints p50/p95 per mode as JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from mathfoundry.openai_client import output_text, post_responses
+
+_PAYLOAD = json.dumps(
+    {
+        "output": [
+            {
+                "type": "message",
+                "content": [{"type": "output_text", "text": '{"answer_summary": "stub", "claims": []}'}],
+            }
+        ]
+    }
+).encode("utf-8")
+
+
+def _stub_handler(latency_s: float, handshake_s: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            time.sleep(handshake_s)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency_s)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(_PAYLOAD)))
+            self.end_headers()
+            self.wfile.write(_PAYLOAD)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def _percentiles(samples: list[float]) -> dict:
+    q = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"n": len(samples), "p50_ms": round(q[49] * 1000, 2), "p95_ms": round(q[94] * 1000, 2)}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Benchmark fresh-per-call vs pooled OpenAI HTTP clients")
+    p.add_argument("--requests", type=int, default=200)
+    p.add_argument("--latency-ms", type=float, default=20.0)
+    p.add_argument("--handshake-ms", type=float, default=30.0)
+    args = p.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _stub_handler(args.latency_ms / 1000, args.handshake_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    payload = {"model": "stub", "input": "Query: Picard group of a K3 surface"}
+
+    fresh: list[float] = []
+    for _ in range(args.requests):
+        t0 = time.perf_counter()
+        with httpx.Client(base_url=base_url) as client:  # the old per-call pattern
+            output_text(post_responses(payload, client=client))
+        fresh.append(time.perf_counter() - t0)
+
+    pooled: list[float] = []
+    with httpx.Client(base_url=base_url, limits=httpx.Limits(max_keepalive_connections=10)) as client:
+        for _ in range(args.requests):
+            t0 = time.perf_counter()
+            output_text(post_responses(payload, client=client))
+            pooled.append(time.perf_counter() - t0)
+
+    server.shutdown()
+    print(
+        json.dumps(
+            {
+                "latency_ms": args.latency_ms,
+                "handshake_ms": args.handshake_ms,
+                "fresh_client": _percentiles(fresh),
+                "pooled_client": _percentiles(pooled),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
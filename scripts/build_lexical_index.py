@@ -1,14 +1,73 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import argparse
 import json
 
-from mathfoundry.indexing import db_path, index_all_raw
+from mathfoundry.config import CONFIG
+from mathfoundry.indexing import db_path, index_all_raw, index_all_topic
 
 
 def main() -> None:
-    count = index_all_raw()
-    print(json.dumps({"indexed_rows": count, "db": str(db_path())}))
+    p = argparse.ArgumentParser(description="Index data/raw feeds into SQLite (and optionally the BM25 arrays and dense vectors)")
+    p.add_argument("--full", action="store_true", help="re-parse every raw file even if unchanged since the last run")
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=CONFIG.index_workers,
+        help="parse/tag/chunk processes; >1 enables the parallel pipeline (default MATHFOUNDRY_INDEX_WORKERS or 1)",
+    )
+    p.add_argument(
+        "--topic",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="also stream the JSONL harvests under data/topic/ (resumes from their byte checkpoints)",
+    )
+    p.add_argument(
+        "--fulltext",
+        action="store_true",
+        help="also cut full-text passages from the arXiv LaTeX sources under data/src/",
+    )
+    p.add_argument(
+        "--recompress",
+        action="store_true",
+        help="re-encode stored summaries/passages for MATHFOUNDRY_STORE_COMPRESSION and VACUUM the DB",
+    )
+    p.add_argument(
+        "--bm25",
+        action="store_true",
+        default=CONFIG.search_backend == "bm25",
+        help="also rebuild the memory-mapped BM25 index (default when MATHFOUNDRY_SEARCH_BACKEND=bm25)",
+    )
+    p.add_argument(
+        "--dense",
+        action="store_true",
+        default=CONFIG.dense_enabled,
+        help="also (re)embed passages into the dense vector index (default when MATHFOUNDRY_DENSE=1)",
+    )
+    args = p.parse_args()
+
+    count = index_all_raw(force=args.full, workers=args.workers)
+    out = {"indexed_rows": count, "db": str(db_path())}
+    if args.topic:
+        out["indexed_topic_rows"] = index_all_topic(force=args.full)
+    if args.fulltext:
+        from mathfoundry.fulltext import index_all_fulltext
+
+        out["fulltext"] = index_all_fulltext(force=args.full, workers=args.workers)
+    if args.recompress:
+        from mathfoundry.indexing import recompress_index
+
+        out["recompress"] = recompress_index()
+    if args.bm25:
+        from mathfoundry.lexical import bm25_dir, build_bm25_index
+
+        out["bm25"] = {"dir": str(bm25_dir()), **build_bm25_index()}
+    if args.dense:
+        from mathfoundry.dense import build_dense_index, dense_dir
+
+        out["dense"] = {"dir": str(dense_dir()), **build_dense_index()}
+    print(json.dumps(out))
 
 
 if __name__ == "__main__":
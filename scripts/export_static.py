@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+from mathfoundry.assets import export_static
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(
+        description="Write the content-hashed frontend assets (plus .gz/.br variants) for nginx to serve"
+    )
+    p.add_argument("--out", default="deploy/public", help="directory nginx serves; files land in <out>/static/")
+    args = p.parse_args()
+    names = export_static(Path(args.out))
+    print(json.dumps({"out": str(Path(args.out) / "static"), "assets": names}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
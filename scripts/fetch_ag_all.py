@@ -3,18 +3,29 @@
 
 Modes:
 - offset: classic start/max_results pagination on one query
-- slice: date-window slicing + pagination from start=0 per slice (avoids deep offsets)
+- slice: date-window slicing + pagination from start=0 per slice (avoids deep offsets);
+  with MATHFOUNDRY_ALL_AG_CONCURRENCY > 1, several slices are fetched concurrently over
+  one keep-alive client, paced by a global rate limiter (MATHFOUNDRY_ALL_AG_RATE_PER_SEC)
 """
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 import time
 from datetime import UTC, date, datetime, timedelta
 from pathlib import Path
 
-from mathfoundry.arxiv import dir_size_bytes, fetch_feed, parse_entries, parse_total
+from mathfoundry.arxiv import (
+    ARXIV_RATE_PER_SEC,
+    SliceWindow,
+    dir_size_bytes,
+    fetch_feed,
+    harvest_slices,
+    iter_entries,
+    parse_total,
+)
 
 
 def _date_yyyymmdd(d: date) -> str:
@@ -44,6 +55,31 @@ def _load_existing_ids(path: Path) -> set[str]:
     return seen
 
 
+class DataSize:
+    """Bytes under the data tree for the storage guard.
+
+    Walking the tree stats every file, so it is re-walked at most every *interval_sec*;
+    in between, the bytes this run appended (``add``) are counted on top of the last walk.
+    """
+
+    def __init__(self, path: Path, interval_sec: float):
+        self.path = path
+        self.interval_sec = interval_sec
+        self._walked = 0
+        self._since = 0
+        self._walked_at = float("-inf")
+
+    def add(self, n: int) -> None:
+        self._since += n
+
+    def __call__(self) -> int:
+        if time.monotonic() - self._walked_at >= self.interval_sec:
+            self._walked = dir_size_bytes(self.path)
+            self._since = 0
+            self._walked_at = time.monotonic()
+        return self._walked + self._since
+
+
 def main() -> None:
     query = os.getenv("MATHFOUNDRY_ALL_AG_QUERY", "cat:math.AG")
     mode = os.getenv("MATHFOUNDRY_ALL_AG_MODE", "offset").strip().lower()
@@ -55,6 +91,7 @@ def main() -> None:
     max_pages = int(os.getenv("MATHFOUNDRY_ALL_AG_MAX_PAGES", "1000000"))
     storage_budget_gb = int(os.getenv("MATHFOUNDRY_STORAGE_BUDGET_GB", "400"))
     stop_ratio = float(os.getenv("MATHFOUNDRY_ALL_AG_STOP_RATIO", "0.9"))
+    storage_check_sec = float(os.getenv("MATHFOUNDRY_ALL_AG_STORAGE_CHECK_SEC", "60"))
     fetch_timeout = float(os.getenv("MATHFOUNDRY_ALL_AG_FETCH_TIMEOUT_SEC", "60"))
     fetch_max_retries = int(os.getenv("MATHFOUNDRY_ALL_AG_FETCH_MAX_RETRIES", "8"))
     min_page_size = int(os.getenv("MATHFOUNDRY_ALL_AG_MIN_PAGE_SIZE", "10"))
@@ -63,6 +100,8 @@ def main() -> None:
 
     slice_days = int(os.getenv("MATHFOUNDRY_ALL_AG_SLICE_DAYS", "30"))
     slice_earliest = os.getenv("MATHFOUNDRY_ALL_AG_SLICE_EARLIEST", "19910101")
+    concurrency = int(os.getenv("MATHFOUNDRY_ALL_AG_CONCURRENCY", "1"))
+    rate_per_sec = float(os.getenv("MATHFOUNDRY_ALL_AG_RATE_PER_SEC", str(ARXIV_RATE_PER_SEC)))
 
     out_dir = Path("data/topic")
     out_dir.mkdir(parents=True, exist_ok=True)
@@ -78,6 +117,7 @@ def main() -> None:
     min_page_failures = 0
     last_checkpoint_ts = 0.0
     run_started = time.time()
+    data_size = DataSize(Path("data"), storage_check_sec)
 
     # Resume defaults
     start = 0
@@ -135,7 +175,7 @@ def main() -> None:
             "pages_done_this_run": pages_done_this_run,
             "current_page_size": current_page_size,
             "updated_at": datetime.now(UTC).isoformat(),
-            "data_dir_bytes": dir_size_bytes(Path("data")),
+            "data_dir_bytes": data_size(),
             "output": str(out_path),
             "last_error": last_error,
             "slice_days": slice_days,
@@ -151,13 +191,190 @@ def main() -> None:
 
     write_checkpoint("run_started")
 
+    # Concurrent slice mode state: windows started but not finished, keyed by end date,
+    # and the end date of the next window not started yet.
+    in_flight: dict[str, SliceWindow] = {}
+    # Windows that stopped with an error (retries exhausted, 4xx, unparseable feed); kept in
+    # the checkpoint and retried by the next run from where they stopped.
+    failed: dict[str, SliceWindow] = {}
+    slice_frontier_end = str(ck.get("slice_frontier_end", slice_cursor_end)) if ck.get("mode") == mode else slice_cursor_end
+
+    def async_state() -> dict:
+        return {
+            "slices_in_flight": {
+                end: {"start": _date_yyyymmdd(w.start), "next_start": w.next_start} for end, w in sorted(in_flight.items())
+            },
+            "slices_failed": {
+                end: {"start": _date_yyyymmdd(w.start), "next_start": w.next_start, "error": w.error}
+                for end, w in sorted(failed.items())
+            },
+            "slice_frontier_end": slice_frontier_end,
+        }
+
+    def write_async_checkpoint(event: str) -> None:
+        nonlocal slice_cursor_end, slice_next_start, start
+        # Keep the sequential fields conservative (newest unfinished window) so a
+        # sequential run can resume from this checkpoint too, refetching at worst.
+        unfinished = {**failed, **in_flight}
+        if unfinished:
+            newest = max(unfinished)
+            slice_cursor_end, slice_next_start = newest, unfinished[newest].next_start
+        else:
+            slice_cursor_end, slice_next_start = slice_frontier_end, 0
+        start = slice_next_start
+        write_checkpoint(event, async_state())
+
     with out_path.open("a", encoding="utf-8") as f:
-        if mode == "slice":
+        if mode == "slice" and concurrency > 1:
+            earliest = _parse_yyyymmdd(slice_earliest)
+            resume: list[SliceWindow] = []
+            if ck.get("mode") == mode and "slices_in_flight" in ck:
+                for end, st in {**ck.get("slices_failed", {}), **ck["slices_in_flight"]}.items():
+                    resume.append(
+                        SliceWindow(
+                            start=_parse_yyyymmdd(st["start"]),
+                            end=_parse_yyyymmdd(end),
+                            next_start=int(st["next_start"]),
+                            page_size=current_page_size,
+                        )
+                    )
+            elif slice_next_start > 0:
+                # Resuming a sequential checkpoint mid-slice.
+                end = _parse_yyyymmdd(slice_cursor_end)
+                ws = max(earliest, end - timedelta(days=max(1, slice_days) - 1))
+                resume.append(SliceWindow(start=ws, end=end, next_start=slice_next_start, page_size=current_page_size))
+                slice_frontier_end = _date_yyyymmdd(ws - timedelta(days=1))
+
+            def windows():
+                nonlocal slice_frontier_end
+                for w in resume:
+                    in_flight[_date_yyyymmdd(w.end)] = w
+                    yield w
+                cursor = _parse_yyyymmdd(slice_frontier_end)
+                while cursor >= earliest:
+                    ws = max(earliest, cursor - timedelta(days=max(1, slice_days) - 1))
+                    w = SliceWindow(start=ws, end=cursor, page_size=current_page_size)
+                    cursor = ws - timedelta(days=1)
+                    slice_frontier_end = _date_yyyymmdd(cursor)
+                    in_flight[_date_yyyymmdd(w.end)] = w
+                    print(
+                        json.dumps(
+                            {
+                                "event": "slice_start",
+                                "slice_start": _date_yyyymmdd(w.start),
+                                "slice_end": _date_yyyymmdd(w.end),
+                                "query": w.query(query),
+                            }
+                        ),
+                        flush=True,
+                    )
+                    yield w
+
+            def should_stop() -> bool:
+                if pages_done_this_run >= max_pages:
+                    return True
+                data_bytes = data_size()
+                if data_bytes >= int(storage_budget_gb * stop_ratio * (1024**3)):
+                    print(json.dumps({"event": "stop_storage_guard", "data_bytes": data_bytes}), flush=True)
+                    return True
+                return False
+
+            def on_page(w: SliceWindow, entries: list[dict]) -> None:
+                nonlocal kept, pages_done, pages_done_this_run, total_available
+                written = 0
+                dupes = 0
+                for entry in entries:
+                    wid = entry.get("work_id", "")
+                    if not wid or wid in seen_ids:
+                        dupes += 1
+                        continue
+                    seen_ids.add(wid)
+                    line = json.dumps(entry, ensure_ascii=False) + "\n"
+                    f.write(line)
+                    data_size.add(len(line.encode("utf-8")))
+                    kept += 1
+                    written += 1
+                pages_done += 1
+                pages_done_this_run += 1
+                total_available = max(total_available, kept)
+
+                elapsed = max(1e-6, time.time() - run_started)
+                print(
+                    json.dumps(
+                        {
+                            "event": "progress",
+                            "mode": "slice",
+                            "concurrency": concurrency,
+                            "slice_start": _date_yyyymmdd(w.start),
+                            "slice_end": _date_yyyymmdd(w.end),
+                            "slice_total": w.total,
+                            "slice_next_start": w.next_start,
+                            "written": written,
+                            "dupes": dupes,
+                            "kept": kept,
+                            "pages_done": pages_done,
+                            "pages_done_this_run": pages_done_this_run,
+                            "page_size_requested": w.page_size,
+                            "entries_returned": len(entries),
+                            "slices_in_flight": len(in_flight),
+                            "rate_records_per_sec": round(kept / elapsed, 3),
+                        }
+                    ),
+                    flush=True,
+                )
+                if pages_done % checkpoint_every == 0 or (time.time() - last_checkpoint_ts) >= checkpoint_interval_sec:
+                    f.flush()
+                    write_async_checkpoint("periodic")
+
+            def on_slice_done(w: SliceWindow) -> None:
+                nonlocal last_error
+                in_flight.pop(_date_yyyymmdd(w.end), None)
+                event = "slice_failed" if w.error else "slice_complete"
+                if w.error:
+                    last_error = w.error
+                    failed[_date_yyyymmdd(w.end)] = w
+                print(
+                    json.dumps(
+                        {
+                            "event": event,
+                            "slice_start": _date_yyyymmdd(w.start),
+                            "slice_end": _date_yyyymmdd(w.end),
+                            "slice_total": w.total,
+                            "slice_next_start": w.next_start,
+                            "reason": w.error or None,
+                        }
+                    ),
+                    flush=True,
+                )
+                f.flush()
+                write_async_checkpoint("slice_advance")
+
+            asyncio.run(
+                harvest_slices(
+                    query,
+                    windows(),
+                    on_page=on_page,
+                    on_slice_done=on_slice_done,
+                    should_stop=should_stop,
+                    concurrency=concurrency,
+                    rate_per_sec=rate_per_sec,
+                    max_page_size=page_size,
+                    min_page_size=min_page_size,
+                    max_min_page_failures=max_min_page_failures,
+                    cooldown_on_error_sec=cooldown_on_error_sec,
+                    max_retries=fetch_max_retries,
+                    timeout=fetch_timeout,
+                    verbose=True,
+                )
+            )
+            write_async_checkpoint("async_run_finished")
+
+        elif mode == "slice":
             earliest = _parse_yyyymmdd(slice_earliest)
             cursor_end = _parse_yyyymmdd(slice_cursor_end)
 
             while cursor_end >= earliest and pages_done_this_run < max_pages:
-                data_bytes = dir_size_bytes(Path("data"))
+                data_bytes = data_size()
                 if data_bytes >= int(storage_budget_gb * stop_ratio * (1024**3)):
                     print(json.dumps({"event": "stop_storage_guard", "data_bytes": data_bytes}), flush=True)
                     break
@@ -247,8 +464,9 @@ def main() -> None:
                         write_checkpoint("fatal_fetch_error")
                         break
 
-                    entries = parse_entries(xml)
-                    slice_total = max(slice_total, parse_total(xml))
+                    stream = iter_entries(xml.encode("utf-8"))
+                    entries = list(stream)
+                    slice_total = max(slice_total, stream.total_results or 0)
                     consecutive_failures = 0
                     min_page_failures = 0
 
@@ -275,7 +493,9 @@ def main() -> None:
                             dupes += 1
                             continue
                         seen_ids.add(wid)
-                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                        line = json.dumps(entry, ensure_ascii=False) + "\n"
+                        f.write(line)
+                        data_size.add(len(line.encode("utf-8")))
                         kept += 1
                         written += 1
 
@@ -357,7 +577,7 @@ def main() -> None:
                 total_available = parse_total(first)
 
             while start < total_available and pages_done_this_run < max_pages:
-                data_bytes = dir_size_bytes(Path("data"))
+                data_bytes = data_size()
                 if data_bytes >= int(storage_budget_gb * stop_ratio * (1024**3)):
                     print(json.dumps({"event": "stop_storage_guard", "data_bytes": data_bytes}), flush=True)
                     break
@@ -418,7 +638,7 @@ def main() -> None:
                     write_checkpoint("fatal_fetch_error")
                     break
 
-                entries = parse_entries(xml)
+                entries = list(iter_entries(xml.encode("utf-8")))
                 consecutive_failures = 0
                 min_page_failures = 0
                 if not entries:
@@ -432,7 +652,9 @@ def main() -> None:
                         dupes += 1
                         continue
                     seen_ids.add(wid)
-                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    line = json.dumps(entry, ensure_ascii=False) + "\n"
+                    f.write(line)
+                    data_size.add(len(line.encode("utf-8")))
                     kept += 1
                     written += 1
 
@@ -493,6 +715,8 @@ def main() -> None:
         "checkpoint": str(ck_path),
         "last_error": last_error,
     }
+    if mode == "slice" and concurrency > 1:
+        final.update(async_state())
     ck_path.write_text(json.dumps(final, indent=2), encoding="utf-8")
     print(json.dumps(final), flush=True)
 
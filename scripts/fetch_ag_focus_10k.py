@@ -9,7 +9,7 @@ import time
 from datetime import UTC, datetime
 from pathlib import Path
 
-from mathfoundry.arxiv import dir_size_bytes, fetch_feed, parse_entries, parse_total
+from mathfoundry.arxiv import dir_size_bytes, fetch_feed, iter_entries, parse_total
 
 FOCUS_TERMS = [
     "moduli",
@@ -61,7 +61,7 @@ def main() -> None:
                 break
 
             xml = fetch_feed(query, start=start, page_size=page_size)
-            entries = parse_entries(xml)
+            entries = list(iter_entries(xml.encode("utf-8")))
             if not entries:
                 break
 
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import dataclasses
+import sys
+
+import pytest
+
+import mathfoundry.config
+from mathfoundry import db
+
+_ATOM_HEAD = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">
+  <opensearch:totalResults>{total}</opensearch:totalResults>
+"""
+
+_ATOM_ENTRY = """  <entry>
+    <id>http://arxiv.org/abs/{arxiv_id}</id>
+    <updated>{updated}</updated>
+    <published>{updated}</published>
+    <title>{title}</title>
+    <summary>{summary}</summary>
+    <category term="math.AG" scheme="http://arxiv.org/schemas/atom"/>
+  </entry>
+"""
+
+
+def make_atom(entries: list[dict], total: int | None = None) -> str:
+    """Render a minimal ArXiv Atom feed from dicts with arxiv_id/title/summary[/updated]."""
+    body = "".join(
+        _ATOM_ENTRY.format(**{"updated": "2024-01-01T00:00:00Z", **e}) for e in entries
+    )
+    return _ATOM_HEAD.format(total=len(entries) if total is None else total) + body + "</feed>\n"
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point every loaded mathfoundry module at an empty temporary data directory."""
+    cfg = dataclasses.replace(mathfoundry.config.CONFIG, data_dir=str(tmp_path))
+    for name, mod in list(sys.modules.items()):
+        if name.startswith("mathfoundry") and hasattr(mod, "CONFIG"):
+            monkeypatch.setattr(mod, "CONFIG", cfg)
+    (tmp_path / "raw").mkdir()
+    yield tmp_path
+    db.close_all()
@@ -1,4 +1,14 @@
+import gzip
+import re
+import subprocess
+import sys
+import time
+
+from conftest import make_atom
+from mathfoundry import warmup
 from mathfoundry.app import app
+from mathfoundry.assets import export_static
+from mathfoundry.indexing import index_all_raw
 from fastapi.testclient import TestClient
 
 
@@ -9,6 +19,33 @@ def test_home_page():
     r = client.get("/")
     assert r.status_code == 200
     assert "MathFoundry" in r.text
+    assert r.headers["cache-control"] == "no-cache"
+
+
+def test_static_assets_are_hashed_cached_and_compressed(tmp_path):
+    page = client.get("/", headers={"accept-encoding": "identity"}).text
+    script = re.search(r'src="(/static/app\.[0-9a-f]{12}\.js)"', page).group(1)
+
+    r = client.get(script, headers={"accept-encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert "loadPresets" in r.text
+    r2 = client.get(script, headers={"if-none-match": r.headers["etag"]})
+    assert r2.status_code == 304 and r2.content == b""
+    assert client.get("/static/app.js").status_code == 404
+
+    names = export_static(tmp_path)
+    exported = tmp_path / "static" / names["app.js"]
+    assert f"/static/{exported.name}" == script
+    assert gzip.decompress(exported.with_name(exported.name + ".gz").read_bytes()) == exported.read_bytes()
+
+
+def test_presets_are_served_with_etag():
+    r = client.get("/presets")
+    assert r.status_code == 200
+    assert r.json()["count"] == len(r.json()["queries"]) > 0
+    assert client.get("/presets", headers={"if-none-match": r.headers["etag"]}).status_code == 304
 
 
 def test_health():
@@ -19,6 +56,30 @@ def test_health():
     assert body["primary_category"] == "math.AG"
 
 
+def test_ready_after_warm_up(data_dir):
+    papers = [{"arxiv_id": "2401.00001v1", "title": "Coherent sheaves", "summary": "Cohomology of coherent sheaves."}]
+    (data_dir / "raw" / "arxiv_warm.xml").write_text(make_atom(papers), encoding="utf-8")
+    index_all_raw()
+    warmup.reset()
+    assert client.get("/ready").status_code == 503
+
+    with TestClient(app) as c:
+        deadline = time.monotonic() + 10
+        while (r := c.get("/ready")).status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert r.status_code == 200
+        steps = r.json()["steps"]
+        assert isinstance(steps["sqlite"], float) and isinstance(steps["search"], float)
+        assert steps["engines"] == "none" and steps["llm"] == "none"
+        assert c.post("/search", json={"query": "coherent sheaves"}).json()["count"] == 1
+
+
+def test_app_import_defers_build_and_llm_modules():
+    probe = "import sys, mathfoundry.app; print(sorted(m for m in ('httpx', 'mathfoundry.arxiv', 'multiprocessing') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
+
+
 def test_qa_abstains_when_no_candidates():
     r = client.post("/qa", json={"query": "totally unrelated query zzz"})
     assert r.status_code == 200
@@ -78,3 +139,71 @@ def test_verify_flags_reference_mismatch():
     assert body["ok"] is False
     assert body["invalid_claim_indices"] == [0]
     assert any("not present in references" in x for x in body["reasons"])
+
+
+def _sse_events(text: str) -> list[tuple[str, dict]]:
+    import json
+
+    out = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+
+def test_qa_stream_sends_candidates_then_final():
+    with client.stream("POST", "/qa/stream", json={"query": "totally unrelated query zzz"}) as r:
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/event-stream")
+        events = _sse_events(r.read().decode("utf-8"))
+    assert [e for e, _ in events] == ["candidates", "final"]
+    assert events[0][1]["count"] == 0
+    assert events[-1][1]["verification"]["must_abstain"] is True
+
+
+def test_batch_endpoints_keep_query_order(monkeypatch):
+    import asyncio
+    import dataclasses
+
+    from mathfoundry import app as app_module
+    from mathfoundry.models import GroundedAnswer
+
+    r = client.post("/search/batch", json={"queries": [{"query": "cohomology"}, {"query": "zzz", "limit": 3}]})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["count"] == 2
+    assert [x["query"] for x in body["results"]] == ["cohomology", "zzz"]
+
+    monkeypatch.setattr(app_module, "CONFIG", dataclasses.replace(app_module.CONFIG, qa_batch_concurrency=2))
+    active, peak = 0, 0
+
+    async def fake_answer(query, candidates):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return GroundedAnswer(answer_summary=query)
+
+    monkeypatch.setattr(app_module, "answer_with_grounding_async", fake_answer)
+    queries = [{"query": f"q{i}"} for i in range(6)]
+    body = client.post("/qa/batch", json={"queries": queries}).json()
+    assert [x["answer_summary"] for x in body["results"]] == [q["query"] for q in queries]
+    assert all(x["verification"]["must_abstain"] for x in body["results"])
+    assert peak == 2
+
+
+def test_verify_batch_endpoint():
+    answer = {
+        "answer_summary": "x",
+        "claims": [{"text": "c", "supporting_citations": [{"work_id": "arxiv:1"}], "support_level": "direct"}],
+        "references": [{"work_id": "arxiv:1"}],
+        "confidence": "medium",
+    }
+    r = client.post("/qa/verify/batch", json={"answers": [answer, {**answer, "references": [{"work_id": "arxiv:9"}]}]})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["count"] == 2
+    assert [res["ok"] for res in body["results"]] == [True, False]
+    single = client.post("/qa/verify", json={"answer": answer}).json()
+    assert body["results"][0] == single
@@ -0,0 +1,178 @@
+import io
+
+from conftest import make_atom
+from mathfoundry.arxiv import iter_entries, parse_entries, parse_total
+
+ENTRIES = [
+    {"arxiv_id": "2401.00001v1", "title": "Derived  categories\n of K3", "summary": "A theorem."},
+    {"arxiv_id": "2401.00002v1", "title": "Stacks", "summary": "Moduli."},
+]
+
+
+def test_iter_entries_accepts_path_bytes_and_file(tmp_path):
+    xml = make_atom(ENTRIES, total=1234)
+    path = tmp_path / "feed.xml"
+    path.write_text(xml, encoding="utf-8")
+    expected = parse_entries(xml)
+    assert [e["title"] for e in expected] == ["Derived categories of K3", "Stacks"]
+    assert expected[0]["work_id"] == "arxiv:2401.00001v1"
+
+    for source in (path, str(path), xml.encode("utf-8"), io.BytesIO(xml.encode("utf-8"))):
+        stream = iter_entries(source)
+        assert list(stream) == expected
+        assert stream.total_results == 1234
+
+
+def test_total_is_known_before_first_entry():
+    stream = iter_entries(make_atom(ENTRIES, total=99).encode("utf-8"))
+    it = iter(stream)
+    next(it)
+    assert stream.total_results == 99
+    assert parse_total(make_atom([], total=7)) == 7
+
+
+def _mock_arxiv(per_slice: int, fail_first: int = 0, broken: dict | None = None):
+    """MockTransport serving `per_slice` entries for every submittedDate window."""
+    import re
+    import urllib.parse
+
+    import httpx
+
+    calls = {"n": 0, "page_sizes": []}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls["n"] += 1
+        if calls["n"] <= fail_first:
+            return httpx.Response(503)
+        params = dict(urllib.parse.parse_qsl(request.url.query.decode()))
+        day = re.search(r"submittedDate:\[(\d{8})", params["search_query"]).group(1)
+        if day in (broken or {}):
+            return broken[day]
+        start, size = int(params["start"]), int(params["max_results"])
+        calls["page_sizes"].append(size)
+        entries = [
+            {"arxiv_id": f"{day}.{i:05d}", "title": f"Paper {day} {i}", "summary": "x"}
+            for i in range(start, min(per_slice, start + size))
+        ]
+        return httpx.Response(200, text=make_atom(entries, total=per_slice))
+
+    return httpx.MockTransport(handler), calls
+
+
+def test_harvest_slices_runs_windows_concurrently():
+    import asyncio
+    from datetime import date
+
+    import httpx
+
+    from mathfoundry.arxiv import SliceWindow, harvest_slices
+
+    transport, calls = _mock_arxiv(per_slice=25)
+    windows = [SliceWindow(start=date(2024, 1, d), end=date(2024, 1, d), page_size=10) for d in (1, 2, 3)]
+    got: dict[str, int] = {}
+    done = []
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            await harvest_slices(
+                "cat:math.AG",
+                windows,
+                on_page=lambda w, entries: got.update({e["work_id"]: 1 for e in entries}),
+                on_slice_done=lambda w: done.append((w.end.day, w.next_start, w.error)),
+                concurrency=3,
+                rate_per_sec=1000,
+                max_page_size=10,
+                client=client,
+            )
+
+    asyncio.run(run())
+    assert len(got) == 75
+    assert sorted(done) == [(1, 25, ""), (2, 25, ""), (3, 25, "")]
+    assert calls["n"] == 9
+
+
+def test_harvest_slices_fails_only_the_broken_slices():
+    import asyncio
+    from datetime import date
+
+    import httpx
+
+    from mathfoundry.arxiv import SliceWindow, harvest_slices
+
+    broken = {
+        "20240102": httpx.Response(400, text="bad query"),
+        "20240103": httpx.Response(200, text="<feed xmlns='http://www.w3.org/2005/Atom'><entry><id>"),
+    }
+    transport, _calls = _mock_arxiv(per_slice=25, broken=broken)
+    windows = [SliceWindow(start=date(2024, 1, d), end=date(2024, 1, d), page_size=10) for d in (1, 2, 3)]
+    done = {}
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            await harvest_slices(
+                "cat:math.AG",
+                windows,
+                on_page=lambda w, entries: None,
+                on_slice_done=lambda w: done.update({w.end.day: (w.next_start, w.error)}),
+                concurrency=3,
+                rate_per_sec=1000,
+                max_page_size=10,
+                client=client,
+            )
+
+    asyncio.run(run())
+    assert done[1] == (25, "")
+    assert done[2][0] == 0 and done[2][1].startswith("status 400")
+    assert done[3][0] == 0 and "unparseable" in done[3][1]
+
+
+def test_harvest_slices_shrinks_page_size_on_failures():
+    import asyncio
+    from datetime import date
+
+    import httpx
+
+    from mathfoundry.arxiv import SliceWindow, harvest_slices
+
+    transport, calls = _mock_arxiv(per_slice=8, fail_first=2)
+    window = SliceWindow(start=date(2024, 1, 1), end=date(2024, 1, 1), page_size=40)
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            await harvest_slices(
+                "cat:math.AG",
+                [window],
+                on_page=lambda w, entries: None,
+                on_slice_done=lambda w: None,
+                rate_per_sec=1000,
+                max_page_size=40,
+                max_retries=2,
+                cooldown_on_error_sec=0,
+                client=client,
+            )
+
+    from unittest import mock
+
+    with mock.patch("mathfoundry.arxiv.asyncio.sleep", new=_no_sleep):
+        asyncio.run(run())
+    assert calls["page_sizes"][0] == 20
+    assert window.next_start == 8
+
+
+async def _no_sleep(_seconds):
+    return None
+
+
+def test_token_bucket_paces_requests():
+    import asyncio
+    import time
+
+    from mathfoundry.arxiv import TokenBucket
+
+    async def run():
+        bucket = TokenBucket(rate=50)
+        t0 = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(6)))
+        return time.monotonic() - t0
+
+    assert asyncio.run(run()) >= 0.09
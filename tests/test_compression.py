@@ -0,0 +1,54 @@
+import dataclasses
+
+import pytest
+from conftest import make_atom
+
+from mathfoundry import compression
+from mathfoundry.db import writer
+from mathfoundry.indexing import index_all_raw, recompress_index
+from mathfoundry.models import SearchRequest
+from mathfoundry.retrieval import search
+
+_SUMMARY = (
+    "We prove that the derived category of coherent sheaves on a K3 surface determines "
+    "the moduli space of stable sheaves, and we describe the wall-crossing of stability conditions {i}."
+)
+
+
+@pytest.fixture
+def zlib_mode(data_dir, monkeypatch):
+    monkeypatch.setattr(compression, "CONFIG", dataclasses.replace(compression.CONFIG, store_compression="zlib"))
+    monkeypatch.setattr(compression, "_MIN_TRAIN_BYTES", 1024)
+    return data_dir
+
+
+def test_zlib_dictionary_round_trip():
+    samples = [_SUMMARY.format(i=i) for i in range(50)]
+    zdict = compression.train_zlib_dict(samples)
+    assert 0 < len(zdict) <= 32 * 1024 and b"derived category" in zdict
+    with_dict = compression._compressor("zlib", zdict)(samples[0].encode())
+    assert len(with_dict) < len(compression._compressor("zlib", None)(samples[0].encode()))
+
+
+def test_compressed_store_decodes_only_for_results(zlib_mode):
+    papers = [
+        {"arxiv_id": f"2401.{i:05d}v1", "title": f"Stability conditions {i}", "summary": _SUMMARY.format(i=i)}
+        for i in range(40)
+    ]
+    (zlib_mode / "raw" / "arxiv_a.xml").write_text(make_atom(papers), encoding="utf-8")
+    assert index_all_raw() == 40
+    conn = writer()
+    kinds = conn.execute("SELECT DISTINCT typeof(summary), typeof(summary_lc) FROM papers").fetchall()
+    assert kinds == [("blob", "text")]
+    assert conn.execute("SELECT count(*) FROM text_dicts").fetchone()[0] == 1
+
+    def summaries_match(results):
+        return results and all(r["summary"] == _SUMMARY.format(i=int(r["work_id"][-7:-2])) for r in results)
+
+    assert summaries_match(search(SearchRequest(query="wall-crossing stability conditions", limit=3)))
+
+    compression.CONFIG = dataclasses.replace(compression.CONFIG, store_compression="none")
+    stats = recompress_index()
+    assert stats["papers"] == 40 and stats["codec"] == "none"
+    assert conn.execute("SELECT DISTINCT typeof(summary) FROM papers").fetchall() == [("text",)]
+    assert summaries_match(search(SearchRequest(query="moduli of stable sheaves", limit=3)))
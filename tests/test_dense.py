@@ -0,0 +1,77 @@
+import dataclasses
+
+import pytest
+
+from conftest import make_atom
+from mathfoundry.indexing import index_all_raw
+from mathfoundry.models import SearchRequest
+
+np = pytest.importorskip("numpy")
+
+from mathfoundry import dense, retrieval  # noqa: E402
+from mathfoundry.dense import HashingEmbedder, build_dense_index, load_dense_engine  # noqa: E402
+
+PAPERS = [
+    {"arxiv_id": "2401.00001v1", "title": "Derived categories of K3 surfaces", "summary": "We prove a theorem on derived categories."},
+    {"arxiv_id": "2401.00002v1", "title": "Moduli stacks of stable maps", "summary": "Moduli stacks and their cohomology."},
+    {"arxiv_id": "2401.00003v1", "title": "Toric varieties", "summary": "Fans, polytopes and toric degenerations."},
+]
+
+
+def _build(data_dir, papers=PAPERS):
+    (data_dir / "raw" / "arxiv_test.xml").write_text(make_atom(papers), encoding="utf-8")
+    index_all_raw()
+    return build_dense_index()
+
+
+def test_hashing_embedder_is_normalised_and_deterministic():
+    e = HashingEmbedder(64)
+    a, b = e.embed(["derived categories", "derived categories"]), e.embed(["toric fans"])
+    assert a.shape == (2, 64) and np.allclose(np.linalg.norm(a, axis=1), 1.0)
+    assert np.array_equal(a[0], a[1])
+    assert float(a[0] @ e.embed(["derived category"])[0]) > float(a[0] @ b[0])
+
+
+def test_build_writes_float16_memmap_and_reuses_unchanged_vectors(data_dir):
+    manifest = _build(data_dir)
+    assert (manifest["rows"], manifest["embedded"], manifest["reused"]) == (3, 3, 0)
+    engine = load_dense_engine()
+    assert isinstance(engine.vectors, np.memmap) and engine.vectors.dtype == np.float16
+    assert engine.search("stable maps moduli", 1)[0][1] == "arxiv:2401.00002v1"
+
+    changed = [dict(PAPERS[2], summary="Newton polytopes of toric varieties.")]
+    manifest = _build(data_dir, changed)
+    assert (manifest["embedded"], manifest["reused"]) == (1, 2)
+
+
+def test_search_fuses_dense_results_when_enabled(data_dir, monkeypatch):
+    _build(data_dir)
+    req = SearchRequest(query="K3 category", limit=3)
+    lexical = retrieval.search(req)
+
+    monkeypatch.setattr(retrieval, "CONFIG", dataclasses.replace(retrieval.CONFIG, dense_enabled=True))
+    fused = retrieval.search(req)
+    assert fused[0]["work_id"] == "arxiv:2401.00001v1"
+    assert fused[0]["fusion_score"] > 0 and fused[0]["dense_score"] is not None
+    assert {r["work_id"] for r in lexical} <= {r["work_id"] for r in fused}
+    assert dense._ENGINE is not None
+
+
+def test_fuse_is_reciprocal_rank_fusion():
+    lexical = [{"work_id": "a", "score": 0.9}, {"work_id": "b", "score": 0.8}]
+    dense_hits = {"b": {"work_id": "b", "score": 0.7}, "c": {"work_id": "c", "score": 0.6}}
+    fused = retrieval._fuse(SearchRequest(query="x", limit=3), lexical, dense_hits)
+    assert [r["work_id"] for r in fused] == ["b", "a", "c"]
+    assert fused[0]["score"] == 0.8  # lexical result kept for works found by both
+
+
+def test_top_rows_scores_across_chunks(monkeypatch):
+    monkeypatch.setattr(dense, "_CHUNK_ROWS", 4)
+    rng = np.random.default_rng(0)
+    engine = object.__new__(dense.DenseEngine)
+    engine.vectors = rng.standard_normal((10, 7)).astype(np.float16)
+    query_vec = rng.standard_normal(7).astype(np.float32)
+    rows, scores = engine._top_rows(query_vec, 3)
+    expected = engine.vectors.astype(np.float32) @ query_vec
+    assert rows.tolist() == np.argsort(-expected)[:3].tolist()
+    assert np.allclose(scores, expected[rows])
@@ -0,0 +1,132 @@
+import json
+import time
+
+import httpx
+
+from mathfoundry.eval_runner import Batch, RunContext, StageTimer, parse_timing, per_query, run_eval, s2_rag_verify
+
+QUERIES = [{"id": f"q{i}", "query": f"query {i}"} for i in range(6)]
+
+
+def _rows(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_run_eval_appends_rows_with_stage_latency(tmp_path):
+    out = tmp_path / "results.jsonl"
+
+    def run_one(q, timer: StageTimer):
+        with timer.stage("search"):
+            pass
+        with timer.stage("llm"):
+            # Early queries finish last; rows must still come out in input order.
+            time.sleep(0.01 * (len(QUERIES) - int(q["id"][1:])))
+        return {"id": q["id"], "query": q["query"]}
+
+    stats = run_eval(QUERIES, out, per_query(run_one), workers=3)
+    assert stats == {"skipped": 0, "written": 6, "failed": 0}
+    rows = _rows(out)
+    assert [r["id"] for r in rows] == [q["id"] for q in QUERIES]
+    assert set(rows[0]["latency_ms"]) == {"search", "llm", "total"}
+    assert rows[0]["latency_ms"]["llm"] >= 50
+    assert "batch" not in rows[0]
+
+
+def test_run_eval_resumes_and_retries_failures(tmp_path):
+    out = tmp_path / "results.jsonl"
+    calls = []
+
+    def flaky(q, timer):
+        calls.append(q["id"])
+        if q["id"] == "q3":
+            raise RuntimeError("timeout")
+        return {"id": q["id"]}
+
+    assert run_eval(QUERIES, out, per_query(flaky), workers=2)["failed"] == 1
+    # Simulate a crash mid-write: a partial trailing line must not break the resume.
+    with out.open("a", encoding="utf-8") as f:
+        f.write('{"id": "q')
+
+    calls.clear()
+    stats = run_eval(
+        QUERIES, out, per_query(lambda q, t: calls.append(q["id"]) or {"id": q["id"]}), resume=True
+    )
+    assert calls == ["q3"]
+    assert stats == {"skipped": 5, "written": 1, "failed": 0}
+    # The retried row is put back in its input position.
+    assert [r["id"] for r in _rows(out)] == [q["id"] for q in QUERIES]
+
+    # Without --resume a complete file is rewritten, not silently kept.
+    calls.clear()
+    stats = run_eval(
+        QUERIES[:2], out, per_query(lambda q, t: calls.append(q["id"]) or {"id": q["id"], "fresh": True})
+    )
+    assert sorted(calls) == ["q0", "q1"] and stats["skipped"] == 0
+    assert [r.get("fresh") for r in _rows(out)] == [True, True]
+
+
+def test_run_eval_checkpoints_per_batch_and_retries_failed_queries(tmp_path):
+    out = tmp_path / "results.jsonl"
+    batches = []
+
+    def run_batch(batch: Batch):
+        batches.append([q["id"] for q in batch.queries])
+        if batch.queries[0]["id"] == "q4":
+            raise RuntimeError("batch endpoint down")
+        with batch.latency.stage("search"):
+            time.sleep(0.02)
+        batch.server.add("search", 5.0)
+        for timer in batch.timers:
+            timer.add("llm", 1.0)
+        # q1 fails on its own; the rest of its batch is still written.
+        return [None if q["id"] == "q1" else {"id": q["id"]} for q in batch.queries]
+
+    stats = run_eval(QUERIES, out, run_batch, batch_size=2, workers=1)
+    assert batches == [["q0", "q1"], ["q2", "q3"], ["q4", "q5"]]
+    assert stats == {"skipped": 0, "written": 3, "failed": 3}
+    rows = _rows(out)
+    assert [r["id"] for r in rows] == ["q0", "q2", "q3"]
+    # Batch-wide calls stay out of the per-query stages and are recorded once per batch.
+    assert rows[0]["latency_ms"] == {"llm": 1.0}
+    assert rows[1]["batch"] == rows[2]["batch"]
+    assert rows[1]["batch"]["id"] == "q2" and rows[1]["batch"]["size"] == 2
+    assert set(rows[1]["batch"]["latency_ms"]) == {"search", "total"}
+    assert rows[1]["batch"]["latency_ms"]["search"] >= 20
+    assert rows[1]["batch"]["server_ms"] == {"search": 5.0}
+
+    batches.clear()
+    stats = run_eval(QUERIES, out, lambda b: [{"id": q["id"]} for q in b.queries], batch_size=2, resume=True)
+    assert stats == {"skipped": 3, "written": 3, "failed": 0}
+    assert [r["id"] for r in _rows(out)] == [q["id"] for q in QUERIES]
+
+
+def test_parse_timing_sums_substages():
+    header = "search.score;dur=1.5, search.fetch;dur=0.5, llm.call;dur=900, verify;dur=2, total;dur=905"
+    assert parse_timing(header) == {"search": 2.0, "llm": 900.0, "verify": 2.0, "total": 905.0}
+    assert parse_timing("") == {}
+
+
+def test_s2_rag_verify_uses_one_qa_batch_call():
+    paths = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        queries = json.loads(request.content)["queries"]
+        results = [
+            {"query": q["query"], "answer_summary": "a", "claims": [], "references": [], "verification": {"ok": True}}
+            for q in queries
+        ]
+        return httpx.Response(
+            200,
+            json={"count": len(results), "results": results},
+            headers={"X-MathFoundry-Timing": "search.score;dur=3, llm.call;dur=40, verify;dur=1, total;dur=45"},
+        )
+
+    ctx = RunContext(base_url="http://app", app_client=httpx.Client(transport=httpx.MockTransport(handler)))
+    batch = Batch(QUERIES[:3])
+    rows = s2_rag_verify(ctx)(batch)
+    assert paths == ["/qa/batch"]
+    assert [r["id"] for r in rows] == ["q0", "q1", "q2"]
+    assert all(r["verify_ok"] for r in rows)
+    assert set(batch.latency.ms) == {"qa"}
+    assert batch.server.ms == {"search": 3.0, "llm": 40.0, "verify": 1.0, "total": 45.0}
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import io
+import tarfile
+
+
+def _tarball(path, files: dict[str, str]) -> None:
+    with tarfile.open(path, "w:gz") as tar:
+        for name, text in files.items():
+            data = text.encode("utf-8")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+_MAIN = r"""\documentclass{amsart}
+\newtheorem{mainthm}{Theorem}
+\newtheorem{defn}{Definition}
+\begin{document}
+\begin{abstract}Skipped abstract.\end{abstract}
+\section{Introduction}
+Flips exist in dimension three. % a comment that must disappear
+\input{sections/defs}
+\section{Proof}
+\begin{mainthm}\label{t}Every klt pair has a flip.\end{mainthm}
+\begin{proof}Run the MMP with scaling. \begin{proof}nested\end{proof} Done.\end{proof}
+\end{document}
+"""
+
+_DEFS = r"""\begin{defn}A pair $(X,\Delta)$ is klt if its discrepancies exceed $-1$.\end{defn}
+\input{main}
+"""
+
+
+def test_cut_passages_on_environments_and_sections():
+    from mathfoundry.fulltext import cut_passages, flatten
+
+    doc = flatten({"main.tex": _MAIN, "sections/defs.tex": _DEFS}, "main.tex")
+    assert "a comment" not in doc and "klt if" in doc  # comments stripped, \input inlined once
+    passages = cut_passages(doc)
+    kinds = [(p["section_label"], p["block_type"]) for p in passages]
+    assert kinds == [
+        ("Introduction", "paragraph"),
+        ("Introduction", "definition"),
+        ("Proof", "theorem"),
+        ("Proof", "proof"),
+    ]
+    assert not any("Skipped abstract" in p["text"] for p in passages)
+    assert "nested" in passages[-1]["text"] and passages[-1]["text"].endswith(r"\end{proof}")
+    raw = doc.encode("utf-8")
+    for p in passages:
+        assert raw[p["byte_start"] : p["byte_end"]].decode("utf-8") == p["text"]
+
+
+def test_index_all_fulltext_adds_offset_passages_incrementally(data_dir):
+    from conftest import make_atom
+
+    from mathfoundry.db import writer
+    from mathfoundry.fulltext import index_all_fulltext, read_passage
+    from mathfoundry.indexing import index_all_raw
+
+    entries = [{"arxiv_id": "2401.00001v2", "title": "Flips", "summary": "We construct flips."}]
+    (data_dir / "raw" / "arxiv_a.xml").write_text(make_atom(entries), encoding="utf-8")
+    index_all_raw()
+    (data_dir / "src").mkdir()
+    _tarball(data_dir / "src" / "2401.00001.tar.gz", {"main.tex": _MAIN, "sections/defs.tex": _DEFS})
+    _tarball(data_dir / "src" / "2402.99999v1.tar.gz", {"main.tex": _MAIN})
+
+    assert index_all_fulltext() == {"papers": 1, "passages": 4, "unmatched": 1, "failed": 0}
+    rows = writer().execute(
+        "SELECT passage_id, block_type, byte_start, byte_end, text FROM passages "
+        "WHERE work_id = 'arxiv:2401.00001v2' ORDER BY passage_id"
+    ).fetchall()
+    assert [r[0] for r in rows if r[2] is None] == ["arxiv:2401.00001v2#p0"]  # abstract chunk kept
+    full = [r for r in rows if r[2] is not None]
+    assert len(full) == 4
+    for _, _, start, end, text in full:
+        assert read_passage("2401.00001", start, end) == text
+
+    # The matched source is skipped as unchanged; the unknown paper is retried.
+    assert index_all_fulltext() == {"papers": 0, "passages": 0, "unmatched": 1, "failed": 0}
+    assert index_all_fulltext(force=True, workers=2) == {"papers": 1, "passages": 4, "unmatched": 1, "failed": 0}
+
+
+def test_corrupt_source_is_counted_and_the_run_keeps_going(data_dir):
+    from conftest import make_atom
+
+    from mathfoundry.db import writer
+    from mathfoundry.fulltext import index_all_fulltext
+    from mathfoundry.indexing import index_all_raw
+
+    entries = [
+        {"arxiv_id": "2405.00001v1", "title": "Flips", "summary": "We construct flips."},
+        {"arxiv_id": "2405.00002v1", "title": "Flops", "summary": "We construct flops."},
+    ]
+    (data_dir / "raw" / "arxiv_x.xml").write_text(make_atom(entries), encoding="utf-8")
+    index_all_raw()
+    (data_dir / "src").mkdir()
+    bad = data_dir / "src" / "2405.00001v1.tar.gz"
+    _tarball(bad, {"main.tex": _MAIN + "lorem ipsum " * 2000})
+    raw = bytearray(bad.read_bytes())
+    for i in range(40, len(raw) - 20, 7):  # corrupt the deflate stream, keep the gzip header
+        raw[i] ^= 0x5A
+    bad.write_bytes(bytes(raw))
+    _tarball(data_dir / "src" / "2405.00002v1.tar.gz", {"main.tex": _MAIN, "sections/defs.tex": _DEFS})
+
+    assert index_all_fulltext() == {"papers": 1, "passages": 4, "unmatched": 0, "failed": 1}
+    n = writer().execute(
+        "SELECT count(*) FROM passages WHERE work_id = 'arxiv:2405.00002v1' AND byte_start IS NOT NULL"
+    ).fetchone()[0]
+    assert n == 4
+    # The broken source is not recorded, so it is retried on the next run.
+    assert index_all_fulltext(workers=2)["failed"] == 1
+
+
+def test_read_passage_offsets_survive_crlf_and_non_ascii(data_dir):
+    from conftest import make_atom
+
+    from mathfoundry.db import writer
+    from mathfoundry.fulltext import index_all_fulltext, read_passage
+    from mathfoundry.indexing import index_all_raw
+
+    entries = [{"arxiv_id": "2403.00001v1", "title": "Étale sheaves", "summary": "Étale cohomology."}]
+    (data_dir / "raw" / "arxiv_c.xml").write_text(make_atom(entries), encoding="utf-8")
+    index_all_raw()
+    main = (
+        "\\documentclass{amsart}\r\n\\begin{document}\r\n\\section{Intro}\r\n"
+        "Intro text here.\r\n\r\n\\begin{theorem}Étale cohomology of $\\mathbb{P}^1$ is finite.\\end{theorem}\r\n"
+        "\\end{document}\r\n"
+    )
+    (data_dir / "src").mkdir()
+    _tarball(data_dir / "src" / "2403.00001v1.tar.gz", {"main.tex": main})
+
+    assert index_all_fulltext()["passages"] == 2
+    rows = writer().execute(
+        "SELECT byte_start, byte_end, text FROM passages WHERE byte_start IS NOT NULL ORDER BY chunk_index"
+    ).fetchall()
+    assert [r[2] for r in rows][0] == "Intro text here."
+    for start, end, text in rows:
+        assert read_passage("2403.00001v1", start, end) == text
+
+
+def test_unversioned_source_attaches_to_latest_version_numerically(data_dir):
+    from conftest import make_atom
+
+    from mathfoundry.db import writer
+    from mathfoundry.fulltext import _work_id_for
+    from mathfoundry.indexing import index_all_raw
+
+    entries = [
+        {"arxiv_id": f"2404.00001v{v}", "title": f"Version {v}", "summary": "Flips in families."} for v in (2, 9, 10)
+    ]
+    (data_dir / "raw" / "arxiv_v.xml").write_text(make_atom(entries), encoding="utf-8")
+    index_all_raw()
+    conn = writer()
+    assert _work_id_for(conn, "2404.00001") == "arxiv:2404.00001v10"
+    assert _work_id_for(conn, "2404.00001v9") == "arxiv:2404.00001v9"
+    assert _work_id_for(conn, "2404.00002") is None
@@ -0,0 +1,297 @@
+import dataclasses
+import json
+
+from mathfoundry import grounding
+from mathfoundry.models import GroundedAnswer
+
+CANDIDATES = [{"work_id": "arxiv:1", "title": "Flips", "summary": "We construct flips."}]
+MODEL_JSON = {
+    "answer_summary": "Flips exist.",
+    "claims": [{"text": "Flips exist.", "supporting_citations": [{"work_id": "arxiv:1"}], "support_level": "direct"}],
+    "confidence": "medium",
+}
+
+
+def _with_key(monkeypatch):
+    cfg = dataclasses.replace(grounding.CONFIG, openai_api_key="sk-test")
+    monkeypatch.setattr(grounding, "CONFIG", cfg)
+
+
+def test_answer_cache_hits_on_repeat_and_invalidates_on_new_evidence(data_dir, monkeypatch):
+    _with_key(monkeypatch)
+    calls = []
+    monkeypatch.setattr(grounding, "_call_openai", lambda q, ctx: calls.append(q) or MODEL_JSON)
+
+    first = grounding.answer_with_grounding("Do flips exist?", CANDIDATES)
+    again = grounding.answer_with_grounding("  do FLIPS   exist? ", CANDIDATES)
+    assert isinstance(again, GroundedAnswer)
+    assert again.model_dump() == first.model_dump()
+    assert len(calls) == 1
+
+    changed = [dict(CANDIDATES[0], summary="Revised abstract.")]
+    grounding.answer_with_grounding("Do flips exist?", changed)
+    assert len(calls) == 2
+    stats = grounding.answer_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+    assert (data_dir / "cache" / "answers.db").exists()
+
+
+def test_failed_llm_calls_are_not_cached(data_dir, monkeypatch):
+    _with_key(monkeypatch)
+
+    def boom(q, ctx):
+        raise RuntimeError("down")
+
+    monkeypatch.setattr(grounding, "_call_openai", boom)
+    grounding.answer_with_grounding("Do flips exist?", CANDIDATES)
+    assert grounding.answer_cache().stats()["entries"] == 0
+
+
+def test_sqlite_cache_evicts_least_recently_used(tmp_path):
+    from mathfoundry.cache import SqliteCache
+
+    cache = SqliteCache(tmp_path / "c.db", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def _responses_body(payload: dict) -> dict:
+    return {"output": [{"type": "message", "content": [{"type": "output_text", "text": json.dumps(payload)}]}]}
+
+
+def test_post_responses_retries_429_and_5xx(monkeypatch):
+    import httpx
+
+    from mathfoundry import openai_client
+
+    monkeypatch.setattr(openai_client, "_retry_delay", lambda attempt, response: 0.0)
+    statuses = iter([429, 503, 200])
+
+    def handler(request):
+        assert request.url.path == "/v1/responses"
+        status = next(statuses)
+        return httpx.Response(status, json=_responses_body(MODEL_JSON) if status == 200 else {})
+
+    client = httpx.Client(base_url="https://stub/v1", transport=httpx.MockTransport(handler))
+    data = openai_client.post_responses({"model": "m", "input": "q"}, client=client)
+    assert openai_client.output_text(data).startswith('{"answer_summary"')
+
+    client = httpx.Client(base_url="https://stub/v1", transport=httpx.MockTransport(lambda r: httpx.Response(400)))
+    try:
+        openai_client.post_responses({"model": "m", "input": "q"}, client=client)
+    except httpx.HTTPStatusError as exc:
+        assert exc.response.status_code == 400
+    else:
+        raise AssertionError("4xx must not be retried into success")
+
+
+def test_async_answer_uses_shared_async_client(data_dir, monkeypatch):
+    import asyncio
+
+    import httpx
+
+    from mathfoundry import openai_client
+
+    _with_key(monkeypatch)
+    monkeypatch.setattr(openai_client, "_retry_delay", lambda attempt, response: 0.0)
+    seen = []
+    statuses = iter([500, 200])
+
+    def handler(request):
+        seen.append(request)
+        status = next(statuses)
+        return httpx.Response(status, json=_responses_body(MODEL_JSON) if status == 200 else {})
+
+    client = httpx.AsyncClient(base_url="https://stub/v1", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(openai_client, "get_async_client", lambda: client)
+
+    answer = asyncio.run(grounding.answer_with_grounding_async("Do flips exist?", CANDIDATES))
+    assert answer.confidence == "medium"
+    assert answer.claims[0].supporting_citations[0].work_id == "arxiv:1"
+    assert len(seen) == 2
+    again = asyncio.run(grounding.answer_with_grounding_async("Do flips exist?", CANDIDATES))
+    assert again.model_dump() == answer.model_dump() and len(seen) == 2  # served from the answer cache
+
+
+def test_stream_yields_tokens_then_verified_claims_then_final(data_dir, monkeypatch):
+    import asyncio
+
+    import httpx
+
+    from mathfoundry import openai_client
+
+    _with_key(monkeypatch)
+    model_json = dict(
+        MODEL_JSON,
+        claims=MODEL_JSON["claims"]
+        + [{"text": "Made up.", "supporting_citations": [{"work_id": "arxiv:404"}], "support_level": "direct"}],
+    )
+    text = json.dumps(model_json)
+    deltas = [text[i : i + 7] for i in range(0, len(text), 7)]
+    body = "".join(
+        f"event: response.output_text.delta\ndata: {json.dumps({'type': 'response.output_text.delta', 'delta': d})}\n\n"
+        for d in deltas
+    ) + 'event: response.completed\ndata: {"type": "response.completed"}\n\n'
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    client = httpx.AsyncClient(base_url="https://stub/v1", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(openai_client, "get_async_client", lambda: client)
+
+    async def collect():
+        return [e async for e in grounding.stream_grounded_answer("Do flips exist?", CANDIDATES)]
+
+    events = asyncio.run(collect())
+    kinds = [k for k, _ in events]
+    assert requests[0]["stream"] is True
+    assert kinds.count("token") == len(deltas)
+    assert "".join(d["text"] for k, d in events if k == "token") == text
+    claims = [d for k, d in events if k == "claim"]
+    assert [(c["index"], c["verified"]) for c in claims] == [(0, True), (1, False)]
+    # Claims are emitted while tokens are still arriving, not after the stream ends.
+    assert kinds.index("claim") < len(kinds) - 1 - kinds[::-1].index("token")
+    assert kinds[-1] == "final"
+    final = events[-1][1]
+    assert final["verification"]["invalid_claim_indices"] == [1]
+
+    # A repeat is served from the answer cache: no tokens, same claims and final payload.
+    again = asyncio.run(collect())
+    assert len(requests) == 1
+    assert [k for k, _ in again] == ["claim", "claim", "final"]
+    assert again[-1][1] == final
+
+
+def test_async_answer_keeps_cache_io_off_the_event_loop(data_dir, monkeypatch):
+    import asyncio
+    import threading
+
+    import httpx
+
+    from mathfoundry import openai_client
+    from mathfoundry.cache import SqliteCache
+
+    _with_key(monkeypatch)
+    client = httpx.AsyncClient(
+        base_url="https://stub/v1",
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json=_responses_body(MODEL_JSON))),
+    )
+    monkeypatch.setattr(openai_client, "get_async_client", lambda: client)
+    threads = []
+    for name in ("get", "set"):
+        original = getattr(SqliteCache, name)
+
+        def wrapped(self, *args, _original=original, _name=name):
+            threads.append((_name, threading.current_thread()))
+            return _original(self, *args)
+
+        monkeypatch.setattr(SqliteCache, name, wrapped)
+
+    async def run():
+        loop_thread = threading.current_thread()
+        await grounding.answer_with_grounding_async("Do flips exist?", CANDIDATES)
+        return loop_thread
+
+    loop_thread = asyncio.run(run())
+    assert [n for n, _ in threads] == ["get", "set"]
+    assert all(t is not loop_thread for _, t in threads)
+
+
+def _stream_events(monkeypatch, body: str):
+    import asyncio
+
+    import httpx
+
+    from mathfoundry import openai_client
+
+    _with_key(monkeypatch)
+    client = httpx.AsyncClient(
+        base_url="https://stub/v1",
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+        ),
+    )
+    monkeypatch.setattr(openai_client, "get_async_client", lambda: client)
+
+    async def collect():
+        return [e async for e in grounding.stream_grounded_answer("Do flips exist?", CANDIDATES)]
+
+    return asyncio.run(collect())
+
+
+def _deltas(text: str) -> str:
+    return "".join(
+        f"event: response.output_text.delta\ndata: {json.dumps({'type': 'response.output_text.delta', 'delta': text[i : i + 7]})}\n\n"
+        for i in range(0, len(text), 7)
+    )
+
+
+def test_stream_resets_when_final_parse_differs_from_streamed_claims(data_dir, monkeypatch):
+    # A repeated "claims" key: the scanner streams the first array, json.loads keeps the last.
+    draft = {"text": "Draft.", "supporting_citations": [{"work_id": "arxiv:1"}], "support_level": "direct"}
+    text = '{"claims": ' + json.dumps([draft]) + ", " + json.dumps(MODEL_JSON)[1:]
+    events = _stream_events(monkeypatch, _deltas(text) + 'data: {"type": "response.completed"}\n\n')
+
+    kinds = [k for k, _ in events]
+    reset = kinds.index("reset")
+    assert [d["claim"]["text"] for k, d in events[:reset] if k == "claim"] == ["Draft."]
+    # After the reset every final claim is sent, paired with its own index.
+    assert [(d["index"], d["claim"]["text"]) for k, d in events[reset:] if k == "claim"] == [(0, "Flips exist.")]
+    assert [c["text"] for c in events[-1][1]["claims"]] == ["Flips exist."]
+
+
+def test_stream_resets_before_fallback_after_claims_were_sent(data_dir, monkeypatch):
+    text = json.dumps(MODEL_JSON)
+    # The stream dies after the first claim has been sent: the scaffold answer replaces it.
+    cut = text.index('"direct"}') + len('"direct"}')
+    events = _stream_events(monkeypatch, _deltas(text[:cut]) + 'data: {"type": "error", "message": "boom"}\n\n')
+
+    kinds = [k for k, _ in events]
+    assert [k for k in kinds if k != "token"] == ["claim", "reset", "claim", "final"]
+    assert events[kinds.index("reset")][1] == {"reason": "fallback"}
+    last = [d for k, d in events if k == "claim"][-1]
+    assert last["index"] == 0 and last["claim"]["text"].startswith("A likely relevant starting reference")
+    assert events[-1][1]["answer_summary"].startswith("OpenAI call failed")
+
+
+def test_claim_scanner_handles_split_strings_and_braces():
+    scanner = grounding._ClaimScanner()
+    text = '{"answer_summary": "a \\"claims\\": [ {x}", "claims": [{"text": "b}{", "supporting_citations": []}, {"text": "c"}], "z": {}}'
+    found = []
+    for ch in text:
+        found.extend(scanner.feed(ch))
+    assert [json.loads(x)["text"] for x in found] == ["b}{", "c"]
+
+
+def test_verify_memo_hits_on_identical_content(monkeypatch):
+    from mathfoundry.cache import LRUCache
+
+    monkeypatch.setattr(grounding, "_verify_memo", LRUCache(16))
+    answer = GroundedAnswer(**MODEL_JSON, references=CANDIDATES)
+    first = grounding.verify_grounded_answer(answer)
+    # Summary/claim wording does not affect verification, so it shares the memo entry.
+    reworded = GroundedAnswer(**{**MODEL_JSON, "answer_summary": "Flips do exist."}, references=CANDIDATES)
+    assert grounding.verify_grounded_answer(reworded) == first
+    stats = grounding.verify_memo_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    first.reasons.append("mutated by caller")
+    assert "mutated by caller" not in grounding.verify_grounded_answer(answer).reasons
+
+
+def test_verify_many_against_shared_reference_ids():
+    answers = [
+        GroundedAnswer(**MODEL_JSON, references=CANDIDATES),
+        GroundedAnswer(**{**MODEL_JSON, "claims": [{**MODEL_JSON["claims"][0], "supporting_citations": [{"work_id": "arxiv:2"}]}]}, references=CANDIDATES),
+    ]
+    own = grounding.verify_many(answers)
+    assert [r.ok for r in own] == [True, False]
+    shared = grounding.verify_many(answers, reference_ids=["arxiv:1", "arxiv:2"])
+    assert [r.ok for r in shared] == [True, True]
+    assert own[0] == grounding.verify_grounded_answer(answers[0])
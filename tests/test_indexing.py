@@ -7,3 +7,127 @@ def test_split_passages_detects_mathy_blocks():
     assert len(passages) >= 1
     assert any(p["block_type"] in {"theorem", "proof", "example"} for p in passages)
     assert all(0.0 <= p["math_density"] <= 1.0 for p in passages)
+
+
+def _write_feed(data_dir, name, entries):
+    from conftest import make_atom
+
+    path = data_dir / "raw" / name
+    path.write_text(make_atom(entries), encoding="utf-8")
+    return path
+
+
+def test_index_all_raw_skips_unchanged_files(data_dir):
+    from mathfoundry.indexing import index_all_raw
+
+    entries = [{"arxiv_id": "2401.00001v1", "title": "Flips", "summary": "We construct flips."}]
+    _write_feed(data_dir, "arxiv_a.xml", entries)
+    assert index_all_raw() == 1
+    assert index_all_raw() == 0
+    assert index_all_raw(force=True) == 0  # re-parsed, but the paper hash is unchanged
+
+
+def test_index_rewrites_only_changed_papers_and_passages(data_dir):
+    import os
+
+    from mathfoundry.db import writer
+    from mathfoundry.indexing import index_raw_file
+
+    long_a = "First sentence about flips. " * 40
+    entries = [
+        {"arxiv_id": "2401.00001v1", "title": "Flips", "summary": long_a + "Tail."},
+        {"arxiv_id": "2401.00002v1", "title": "Stacks", "summary": "Moduli stacks."},
+    ]
+    path = _write_feed(data_dir, "arxiv_a.xml", entries)
+    assert index_raw_file(path) == 2
+    conn = writer()
+    before = dict(conn.execute("SELECT passage_id, rowid FROM passages"))
+    assert len(before) == 3
+
+    entries[0]["summary"] = long_a + "New tail."
+    path = _write_feed(data_dir, "arxiv_a.xml", entries)
+    os.utime(path, ns=(1, 1))
+    assert index_raw_file(path) == 1
+    after = dict(conn.execute("SELECT passage_id, rowid FROM passages"))
+    assert after.keys() == before.keys()
+    # The unchanged first chunk and the untouched paper keep their rows.
+    assert after["arxiv:2401.00001v1#p0"] == before["arxiv:2401.00001v1#p0"]
+    assert after["arxiv:2401.00002v1#p0"] == before["arxiv:2401.00002v1#p0"]
+    text = conn.execute("SELECT text FROM passages WHERE passage_id = 'arxiv:2401.00001v1#p1'").fetchone()[0]
+    assert text.endswith("New tail.")
+
+
+def test_parallel_build_matches_serial_and_restores_fts(data_dir):
+    from mathfoundry import db
+    from mathfoundry.indexing import index_all_raw
+    from mathfoundry.models import SearchRequest
+    from mathfoundry.retrieval import search
+
+    for i in range(6):
+        entries = [
+            {"arxiv_id": f"240{i}.{j:05d}v1", "title": f"Flips family f{i}x{j}", "summary": f"We construct flips number {j}."}
+            for j in range(5)
+        ]
+        _write_feed(data_dir, f"arxiv_{i}.xml", entries)
+
+    assert index_all_raw(workers=2) == 30
+    conn = db.writer()
+    parallel = conn.execute("SELECT * FROM passages ORDER BY passage_id").fetchall()
+    triggers = conn.execute("SELECT count(*) FROM sqlite_master WHERE type='trigger'").fetchone()[0]
+    assert triggers == 18  # 3 sync triggers per FTS table (words, formulas, substrings; papers + passages)
+    assert search(SearchRequest(query="flips f3x4"))[0]["work_id"] == "arxiv:2403.00004v1"
+    assert index_all_raw(workers=2) == 0
+
+    conn.execute("DELETE FROM passages")
+    conn.execute("DELETE FROM papers")
+    conn.execute("DELETE FROM indexed_files")
+    conn.commit()
+    assert index_all_raw() == 30
+    assert conn.execute("SELECT * FROM passages ORDER BY passage_id").fetchall() == parallel
+
+
+def test_index_jsonl_streams_and_resumes_from_checkpoint(data_dir):
+    import json
+
+    from mathfoundry.db import writer
+    from mathfoundry.indexing import index_jsonl_file
+
+    topic = data_dir / "topic"
+    topic.mkdir()
+    path = topic / "ag_all_math_ag.jsonl"
+
+    def entry(i):
+        return {"work_id": f"arxiv:2401.{i:05d}v1", "title": f"Paper {i}", "summary": "Moduli of curves.", "category": "math.AG"}
+
+    with path.open("w", encoding="utf-8") as f:
+        for i in range(5):
+            f.write(json.dumps(entry(i)) + "\n")
+        f.write('{"work_id": "arxiv:partial"')  # harvester mid-write
+    assert index_jsonl_file(path, batch_size=2) == 5
+    offset = writer().execute("SELECT byte_offset FROM indexed_files WHERE path = ?", (str(path),)).fetchone()[0]
+    assert offset == path.stat().st_size - len('{"work_id": "arxiv:partial"')
+
+    with path.open("a", encoding="utf-8") as f:
+        f.write(', "title": "Partial"}\n')
+        f.write(json.dumps(entry(5)) + "\n")
+    assert index_jsonl_file(path) == 2
+    assert index_jsonl_file(path) == 0
+    assert writer().execute("SELECT count(*) FROM papers").fetchone()[0] == 7
+
+
+def test_migrate_renames_char_offset_columns(data_dir):
+    from mathfoundry.indexing import _migrate, ensure_db
+
+    conn = ensure_db()
+    conn.execute("ALTER TABLE passages RENAME COLUMN byte_start TO char_start")
+    conn.execute("ALTER TABLE passages RENAME COLUMN byte_end TO char_end")
+    conn.execute(
+        "INSERT INTO passages(passage_id, work_id, chunk_index, text, math_density, token_est, char_start, char_end) "
+        "VALUES ('w#f0', 'w', 0, 'x', 0, 1, 3, 7)"
+    )
+    conn.commit()
+
+    _migrate(conn)
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(passages)")}
+    assert {"byte_start", "byte_end"} <= cols and not {"char_start", "char_end"} & cols
+    assert conn.execute("SELECT byte_start, byte_end FROM passages").fetchone() == (3, 7)
@@ -0,0 +1,78 @@
+import pytest
+
+from conftest import make_atom
+from mathfoundry.indexing import index_all_raw
+from mathfoundry.models import SearchRequest
+from mathfoundry.retrieval import _search_sqlite
+
+np = pytest.importorskip("numpy")
+
+from mathfoundry.lexical import build_bm25_index, load_engine  # noqa: E402
+
+PAPERS = [
+    {"arxiv_id": "2401.00001v1", "title": "Derived categories of K3 surfaces", "summary": "We prove a theorem on derived categories."},
+    {"arxiv_id": "2401.00002v1", "title": "Moduli stacks of stable maps", "summary": "Moduli stacks and their cohomology."},
+    {"arxiv_id": "2401.00003v1", "title": "Toric varieties", "summary": "Fans, polytopes and toric degenerations."},
+]
+
+
+def _build(data_dir):
+    (data_dir / "raw" / "arxiv_test.xml").write_text(make_atom(PAPERS), encoding="utf-8")
+    index_all_raw()
+    return build_bm25_index()
+
+
+def test_build_writes_csr_arrays(data_dir):
+    manifest = _build(data_dir)
+    assert manifest["docs"] == 3 and manifest["works"] == 3
+    engine = load_engine()
+    assert isinstance(engine.doc_ids, np.memmap)
+    assert engine.offsets[-1] == manifest["postings"] == len(engine.doc_ids)
+
+
+def test_bm25_matches_sqlite_top_hit(data_dir):
+    _build(data_dir)
+    engine = load_engine()
+    for query in ["derived categories K3", "moduli stacks stable maps", "toric polytopes"]:
+        req = SearchRequest(query=query, limit=3)
+        bm25 = engine.search(req)
+        sqlite = _search_sqlite(req)
+        assert bm25[0]["work_id"] == sqlite[0]["work_id"]
+        assert set(bm25[0]) >= {"title", "summary", "score", "ag_subareas", "top_block_type"}
+
+
+def test_engine_reloads_after_rebuild(data_dir):
+    _build(data_dir)
+    first = load_engine()
+    assert first.search(SearchRequest(query="tropical curves")) == []
+    PAPERS.append({"arxiv_id": "2401.00004v1", "title": "Tropical curves", "summary": "Tropical curve counting."})
+    try:
+        _build(data_dir)
+    finally:
+        PAPERS.pop()
+    engine = load_engine()
+    assert engine is not first
+    assert engine.search(SearchRequest(query="tropical curves"))[0]["work_id"] == "arxiv:2401.00004v1"
+
+
+def test_bm25_term_reorders_documents_past_the_gate(data_dir):
+    papers = [
+        # Half the query, but term-dense: higher BM25, no boost.
+        {"arxiv_id": "2402.00001v1", "title": "Gerbes", "summary": "Gerbes, gerbes and gerbes."},
+        # Half the query once in a long abstract, with the example-block boost.
+        {
+            "arxiv_id": "2402.00002v1",
+            "title": "Notes",
+            "summary": "An example where gerbes appear once among many unrelated words on curves, "
+            "surfaces, fields, rings, modules, schemes, groups and their various properties.",
+        },
+    ]
+    (data_dir / "raw" / "arxiv_test.xml").write_text(make_atom(papers), encoding="utf-8")
+    index_all_raw()
+    build_bm25_index()
+    req = SearchRequest(query="gerbes torsors", limit=2)
+    # Coverage + boosts alone put the boosted abstract first.
+    assert [r["work_id"] for r in _search_sqlite(req)] == ["arxiv:2402.00002v1", "arxiv:2402.00001v1"]
+    results = load_engine().search(req)
+    assert [r["work_id"] for r in results] == ["arxiv:2402.00001v1", "arxiv:2402.00002v1"]
+    assert results[0]["score"] > results[1]["score"]
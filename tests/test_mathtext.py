@@ -0,0 +1,65 @@
+from conftest import make_atom
+
+from mathfoundry.indexing import index_all_raw
+from mathfoundry.mathtext import analyse_text, formula_terms
+from mathfoundry.models import SearchRequest
+from mathfoundry.retrieval import _tokenize, search
+
+
+def test_formula_notations_share_terms():
+    canonical = formula_terms(r"$H^1(X,\mathcal{F})$")
+    assert {"calf", "h_sup_1", "x_calf"} <= set(canonical)
+    for variant in [r"$H^{1}(X, \mathscr F)$", "H¹(X,ℱ)", r"\(H^1\left(X,\mathcal{F}\right)\)"]:
+        assert formula_terms(variant) == canonical, variant
+    assert formula_terms(r"$\operatorname{Pic}(X)$") == formula_terms(r"$\mathrm{Pic}(X)$")
+    assert formula_terms("We study K3 surfaces, see \\cite{Huy}.") == []
+
+
+def test_normalisation_feeds_the_word_field():
+    assert _tokenize("𝒪_X ≅ Ω") == _tokenize(r"$\mathcal{O}_X \cong \Omega$")
+    assert "pic" in _tokenize(r"the group $\operatorname{Pic}(X)$")
+    assert "mathcal" not in _tokenize(r"$\mathcal{O}_X$-modules")
+    assert _tokenize(r"$X \rightarrow Y$") == _tokenize("X → Y") == ["to"]
+    plain, formula = analyse_text("We study flips."), analyse_text(r"Let $f\colon X\to Y$ be a flip.")
+    assert plain.density == 0.0 < formula.density < 1.0
+
+
+def test_formula_queries_hit_the_formula_index(data_dir):
+    papers = [
+        {"arxiv_id": "2401.00001v1", "title": "Cohomology vanishing", "summary": r"We show $H^{1}(X, \mathscr F) = 0$ for ample twists."},
+        {"arxiv_id": "2401.00002v1", "title": "Picard groups", "summary": "We compute Pic(X) ≅ ℤ² for these threefolds."},
+        {"arxiv_id": "2401.00003v1", "title": "Cohomology of curves", "summary": r"The group $H^0(C, \omega_C)$ has dimension g."},
+    ]
+    (data_dir / "raw" / "arxiv_math.xml").write_text(make_atom(papers), encoding="utf-8")
+    index_all_raw()
+    hits = search(SearchRequest(query=r"H^1(X,\mathcal{F})", limit=5))
+    assert [r["work_id"] for r in hits] == ["arxiv:2401.00001v1"]
+    assert search(SearchRequest(query=r"$\mathbb{Z}^2$", limit=5))[0]["work_id"] == "arxiv:2401.00002v1"
+    assert search(SearchRequest(query="vanishing of H¹(X,ℱ)", limit=5))[0]["work_id"] == "arxiv:2401.00001v1"
+
+
+_TYPICAL_ABSTRACT = (
+    "Let $X$ be a smooth projective surface over $\\mathbb{C}$ and $L$ an ample line bundle on $X$. "
+    "We show that $H^1(X, \\mathcal{O}_X(-L)) = 0$ and deduce a Kodaira-type vanishing result for the "
+    "sheaf $\\Omega^1_X \\otimes L$. As an application we compute the cohomology of the moduli space "
+    "$M_X(2, c_1, c_2)$ of stable sheaves."
+)
+
+
+def test_density_boost_is_calibrated_for_formula_share(data_dir):
+    from mathfoundry.retrieval import _block_boost, _density_boost
+
+    density = analyse_text(_TYPICAL_ABSTRACT).density
+    assert 0.2 < density < 0.3
+    assert round(_density_boost(density), 4) == 0.1056
+    # Only formula-heavy text reaches the cap; prose gets nothing.
+    assert _density_boost(0.6) == 0.15 and _density_boost(0.0) == 0.0
+
+    # The SQL scorer applies the same boost.
+    entries = [{"arxiv_id": "2401.00001v1", "title": "Vanishing", "summary": _TYPICAL_ABSTRACT}]
+    (data_dir / "raw" / "arxiv_d.xml").write_text(make_atom(entries), encoding="utf-8")
+    index_all_raw()
+    [hit] = search(SearchRequest(query="sheaves zzzz", limit=5))
+    coverage = 0.5
+    expected = coverage + _block_boost(hit["top_block_type"]) + _density_boost(hit["math_density"])
+    assert hit["score"] == round(expected, 4)
@@ -0,0 +1,57 @@
+import dataclasses
+
+from conftest import make_atom
+from fastapi.testclient import TestClient
+
+from mathfoundry import app as app_module
+from mathfoundry import metrics
+from mathfoundry.app import app
+from mathfoundry.indexing import index_all_raw
+
+client = TestClient(app)
+
+
+def _index(data_dir):
+    papers = [{"arxiv_id": "2401.00001v1", "title": "Derived categories of K3 surfaces", "summary": "Stability."}]
+    (data_dir / "raw" / "arxiv_test.xml").write_text(make_atom(papers), encoding="utf-8")
+    index_all_raw()
+
+
+def test_metrics_endpoint_exports_search_stages_and_counters(data_dir):
+    _index(data_dir)
+    assert client.post("/search", json={"query": "derived categories"}).json()["count"] == 1
+
+    text = client.get("/metrics").text
+    for stage in ("search.score", "search.fetch"):
+        assert f'mathfoundry_stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'mathfoundry_request_seconds_count{method="POST",route="/search"}' in text
+    assert 'mathfoundry_search_rows_passed_total{backend="sqlite"}' in text
+    assert "# TYPE mathfoundry_stage_seconds histogram" in text
+
+
+def test_timing_header_is_opt_in(data_dir, monkeypatch):
+    _index(data_dir)
+    assert "x-mathfoundry-timing" not in client.post("/search", json={"query": "derived"}).headers
+
+    monkeypatch.setattr(app_module, "CONFIG", dataclasses.replace(app_module.CONFIG, timing_header=True))
+    header = client.post("/search", json={"query": "derived categories"}).headers["x-mathfoundry-timing"]
+    stages = dict(part.split(";dur=") for part in header.split(", "))
+    assert {"search.score", "search.fetch", "total"} <= set(stages)
+    assert float(stages["total"]) >= float(stages["search.score"])
+
+
+def test_histogram_buckets_are_cumulative():
+    h = metrics.Histogram("t_seconds", "test", buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 5.0):
+        h.observe(v, stage="x")
+    lines = h.render()
+    assert 't_seconds_bucket{stage="x",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="x",le="1"} 2' in lines
+    assert 't_seconds_bucket{stage="x",le="+Inf"} 3' in lines
+    assert 't_seconds_count{stage="x"} 3' in lines
+
+
+def test_llm_usage_is_counted():
+    before = metrics.LLM_TOKENS.values.get((("kind", "output"),), 0.0)
+    metrics.record_llm_usage({"usage": {"input_tokens": 120, "output_tokens": 30}})
+    assert metrics.LLM_TOKENS.values[(("kind", "output"),)] == before + 30
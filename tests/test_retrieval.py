@@ -0,0 +1,162 @@
+from conftest import make_atom
+from mathfoundry import indexing
+from mathfoundry.indexing import ensure_db, index_all_raw
+from mathfoundry.models import SearchRequest
+from mathfoundry.retrieval import search
+
+PAPERS = [
+    {
+        "arxiv_id": "2401.00001v1",
+        "title": "Derived categories of coherent sheaves on K3 surfaces",
+        "summary": "We prove a theorem on derived categories and stability conditions for K3 surfaces.",
+        "updated": "2024-01-01T00:00:00Z",
+    },
+    {
+        "arxiv_id": "1001.00002v1",
+        "title": "Moduli stacks of stable maps",
+        "summary": "An old paper on moduli stacks of stable curves and their cohomology.",
+        "updated": "2010-01-01T00:00:00Z",
+    },
+]
+
+
+def _build(data_dir, papers=PAPERS):
+    (data_dir / "raw" / "arxiv_test.xml").write_text(make_atom(papers), encoding="utf-8")
+    return index_all_raw()
+
+
+def test_search_finds_matches_via_fts(data_dir):
+    assert _build(data_dir) == 2
+    results = search(SearchRequest(query="derived categories K3", limit=5))
+    assert [r["work_id"] for r in results][:1] == ["arxiv:2401.00001v1"]
+
+
+def test_search_reaches_old_papers(data_dir):
+    # Old papers were invisible once newer rows filled the scan window.
+    newer = [
+        {"arxiv_id": f"2402.{i:05d}v1", "title": f"Toric varieties {i}", "summary": "Toric fans.", "updated": "2024-02-01T00:00:00Z"}
+        for i in range(50)
+    ]
+    _build(data_dir, PAPERS + newer)
+    results = search(SearchRequest(query="moduli stacks stable maps", limit=3))
+    assert results and results[0]["work_id"] == "arxiv:1001.00002v1"
+
+
+def test_fts_stays_in_sync_on_reindex(data_dir):
+    _build(data_dir)
+    changed = [dict(PAPERS[0], title="Tropical curves", summary="Tropical curve counting.")]
+    _build(data_dir, changed)
+    assert search(SearchRequest(query="derived categories K3")) == []
+    assert search(SearchRequest(query="tropical curve counting"))[0]["work_id"] == "arxiv:2401.00001v1"
+
+
+def test_ensure_db_backfills_missing_fts(data_dir):
+    _build(data_dir)
+    conn = ensure_db()
+    conn.execute("DROP TABLE passages_fts")
+    conn.commit()
+    conn.close()
+    indexing._MIGRATED.clear()  # as in a freshly started process
+    ensure_db().close()
+    assert search(SearchRequest(query="derived categories K3"))
+
+
+def test_migration_backfills_lowercase_columns(data_dir):
+    _build(data_dir)
+    conn = ensure_db()
+    conn.execute("UPDATE papers SET title_lc = NULL, summary_lc = NULL")
+    conn.execute("UPDATE passages SET text_lc = NULL")
+    conn.commit()
+    conn.close()
+    indexing._MIGRATED.clear()
+    conn = ensure_db()
+    assert conn.execute("SELECT count(*) FROM papers WHERE title_lc IS NULL").fetchone()[0] == 0
+    assert conn.execute("SELECT title_lc FROM papers WHERE work_id = 'arxiv:1001.00002v1'").fetchone()[0] == (
+        "moduli stacks of stable maps"
+    )
+    conn.close()
+    assert search(SearchRequest(query="Derived Categories K3"))[0]["work_id"] == "arxiv:2401.00001v1"
+
+
+def test_reader_is_pooled_per_thread_and_read_only(data_dir):
+    import sqlite3
+    import threading
+
+    import pytest
+
+    from mathfoundry import db
+
+    assert db.reader() is None
+    _build(data_dir)
+    conn = db.reader()
+    assert conn is db.reader()
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("DELETE FROM papers")
+
+    other = []
+    t = threading.Thread(target=lambda: other.append(db.reader()))
+    t.start()
+    t.join()
+    assert other[0] is not conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_search_many_matches_single_queries(data_dir):
+    from mathfoundry.retrieval import search_many
+
+    _build(data_dir)
+    reqs = [
+        SearchRequest(query="derived categories K3", limit=5),
+        SearchRequest(query="moduli stacks", limit=1),
+        SearchRequest(query="zzz", limit=5),
+        SearchRequest(query="cohomology", limit=5),
+    ]
+    assert search_many(reqs) == [search(r) for r in reqs]
+    assert search_many(reqs)[2] == []
+
+
+def test_search_cache_hits_and_invalidates_on_reindex(data_dir, monkeypatch):
+    from mathfoundry import retrieval
+
+    monkeypatch.setattr(retrieval, "_memory_cache", None)
+    _build(data_dir)
+    first = search(SearchRequest(query="derived categories K3", limit=5))
+    # Same token set in another order is a hit.
+    assert search(SearchRequest(query="K3 categories derived", limit=5)) == first
+    stats = retrieval.search_cache_stats()["memory"]
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["approx_bytes"] > 0
+
+    # Re-indexing bumps the generation, so the cached ranking is not served.
+    changed = [dict(PAPERS[0], title="Tropical curves", summary="Tropical curve counting.")]
+    _build(data_dir, changed)
+    assert search(SearchRequest(query="derived categories K3", limit=5)) == []
+
+
+def test_search_cache_shared_on_disk(data_dir, monkeypatch):
+    import dataclasses
+
+    from mathfoundry import retrieval
+
+    monkeypatch.setattr(retrieval, "CONFIG", dataclasses.replace(retrieval.CONFIG, search_cache_disk=True))
+    monkeypatch.setattr(retrieval, "_memory_cache", None)
+    _build(data_dir)
+    first = search(SearchRequest(query="moduli stacks"))
+    retrieval._memory_cache.clear()  # as in another worker process
+    assert search(SearchRequest(query="moduli stacks")) == first
+    assert retrieval.search_cache_stats()["disk"]["hits"] == 1
+
+
+def test_search_folds_diacritics_and_matches_inside_words(data_dir):
+    papers = [
+        {
+            "arxiv_id": "2403.00003v1",
+            "title": "Étale cohomology of curves",
+            "summary": "We compare isomorphisms of étale sheaves over finite fields.",
+            "updated": "2024-03-01T00:00:00Z",
+        }
+    ]
+    _build(data_dir, PAPERS + papers)
+    for query in ("étale", "etale", "étale cohomology", "morphism"):
+        results = search(SearchRequest(query=query, limit=5))
+        assert [r["work_id"] for r in results][:1] == ["arxiv:2403.00003v1"], query
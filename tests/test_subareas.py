@@ -11,3 +11,25 @@ def test_detect_subareas_derived():
     t = "Derived categories, t-structures, and stability conditions in algebraic geometry."
     tags = detect_ag_subareas(t)
     assert "derived_and_homological_ag" in tags
+
+
+def test_keywords_match_whole_words_only():
+    assert detect_ag_subareas("We bound digit sums in infant mortality tables.") == []
+    assert detect_ag_subareas("GIT quotients and toric fans.") == ["toric_and_tropical", "geometric_invariant_theory"]
+
+
+def test_nested_keywords_still_credit_both_tags():
+    from mathfoundry.subareas import score_ag_subareas
+
+    scores = score_ag_subareas("Bridgeland stability conditions on K3 surfaces")
+    assert scores["derived_and_homological_ag"] == 1
+    assert scores["geometric_invariant_theory"] == 1  # "stability" inside "stability condition"
+    assert scores["abelian_k3_calabi_yau"] == 1
+
+
+def test_batch_api_matches_single_calls():
+    from mathfoundry.subareas import detect_ag_subareas_many
+
+    texts = ["Minimal  models and flips of Fano varieties", "Étale cohomology of perverse sheaves", "", "digits"]
+    assert detect_ag_subareas_many(texts) == [detect_ag_subareas(t) for t in texts]
+    assert detect_ag_subareas_many(texts)[0] == ["birational_geometry_mmp"]